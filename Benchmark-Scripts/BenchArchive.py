@@ -0,0 +1,71 @@
+import sys
+import os
+import shutil
+from os.path import dirname, abspath, join, isdir, getsize
+sys.path.insert(0, dirname(dirname(abspath(__file__))))     # Allow importing _libHQCam2 from the repository-root
+
+import tempfile
+import numpy as np
+from time import perf_counter
+
+from _libHQCam2.archive import ArchiveFolder, ArchiveFolderShell, zstandard
+from _libHQCam2.rawfile import WriteRawFrame, LAYOUT_SRGGB12_PACKED
+from _libHQCam2.unpack import PackedWidth
+
+
+# Directory of full-frame captures (packed raw-containers), on the RAM-disk if available
+benchDir = "/media/ramdisk" if isdir("/media/ramdisk") else tempfile.gettempdir()
+imH = 3040
+imW = 4056
+nFrames = 8
+
+
+def SyntheticFrame(rng):
+    # Smooth 12-bit scene with shot-noise, packed like SRGGB12_CSI2P (compresses like a real capture, not like random bytes)
+    y, x = np.mgrid[0:imH, 0:imW // 2]
+    scene = 800 + 600 * np.sin(x / 300.0) * np.cos(y / 200.0)
+    px = np.clip(rng.poisson(scene), 0, 0xFFF).astype(np.uint16)                # Value per pixel-pair (both pixels alike)
+    packed = np.empty((imH, PackedWidth(imW)), dtype=np.uint8)
+    packed[:, 0::3] = px >> 4
+    packed[:, 1::3] = (px >> 4) + rng.integers(0, 2, px.shape, dtype=np.uint8)
+    packed[:, 2::3] = (px & 0xF) * 0x11
+    return packed
+
+
+srcDir = join(benchDir, "BenchArchive_src")
+os.makedirs(srcDir, exist_ok=True)
+rng = np.random.default_rng(0)
+for _i in range(nFrames):
+    WriteRawFrame(join(srcDir, f"Bench_ss=1000_{_i:04d}.raw"), SyntheticFrame(rng), {"ExposureTime": 1000}, bitDepth=12, layout=LAYOUT_SRGGB12_PACKED)
+srcMB = sum([getsize(join(srcDir, _f)) for _f in os.listdir(srcDir)]) / 1e6
+
+
+def Bench(name:str, func, fName:str):
+    start = perf_counter()
+    retVal = func(fName)
+    dt = perf_counter() - start
+    if retVal != 0:
+        print(f"{name:<40}failed ({retVal})")
+        return
+    mb = getsize(fName) / 1e6
+    print(f"{name:<40}{dt:8.2f} s{srcMB / dt:10.1f} MB/s{mb:10.1f} MB ({mb / srcMB * 100:5.1f}%)")
+    os.remove(fName)
+
+
+print(f"{nFrames} full-frame captures ({srcMB:.1f} MB) in {srcDir}, {os.cpu_count()} cores")
+print(f"{'':<40}{'time':>10}{'throughput':>15}{'archive':>13}")
+hasPigz = shutil.which("pigz") is not None
+tarDst = join(benchDir, "BenchArchive")
+Bench("tar (os.system, former SRV:ARCHV)",     lambda f: ArchiveFolderShell(srcDir, f, False), tarDst + ".tar")
+Bench("tar -z (os.system, former)",            lambda f: ArchiveFolderShell(srcDir, f, True, False), tarDst + ".tar.gz")
+if hasPigz:
+    Bench("tar + pigz (os.system, former)",    lambda f: ArchiveFolderShell(srcDir, f, True, True), tarDst + ".tar.gz")
+Bench("TarArchiver uncompressed",              lambda f: ArchiveFolder(srcDir, f, "0"), tarDst + ".tar")
+Bench("TarArchiver gz:6 single core",          lambda f: ArchiveFolder(srcDir, f, "gz:6", False), tarDst + ".tar.gz")
+Bench("TarArchiver gz:6 block-parallel",       lambda f: ArchiveFolder(srcDir, f, "gz:6", True), tarDst + ".tar.gz")
+Bench("TarArchiver gz:1 block-parallel",       lambda f: ArchiveFolder(srcDir, f, "gz:1", True), tarDst + ".tar.gz")
+if zstandard is not None:
+    Bench("TarArchiver zst:3 multi-threaded",  lambda f: ArchiveFolder(srcDir, f, "zst:3", True), tarDst + ".tar.zst")
+else:
+    print("zstd skipped (zstandard-package not installed)")
+shutil.rmtree(srcDir)
@@ -0,0 +1,80 @@
+import sys
+from os.path import dirname, abspath
+sys.path.insert(0, dirname(dirname(abspath(__file__))))     # Allow importing _libHQCam2 from the repository-root
+
+import numpy as np
+from time import perf_counter
+
+from _libHQCam2.binning import Binner, BayerBinner, BIN_SUM, BIN_MEAN, BIN_MAX
+from _libHQCam2.unpack import SRGGB12Unpacker, PackedWidth
+
+
+# Unpacked mosaic (12-bit values in uint16); width cut to a multiple of 16, as the old loop needs even sizes in every iteration
+imH = 3040
+imW = 4048
+nRuns = 10
+
+
+def BinOld(raw, iters):
+    # Former loop of CaptureShutterspeedSequence (2x2 per iteration, uint16 overflows for iters >= 3)
+    satBright=0xFFF
+    satMask = (raw >= satBright)
+    for _iShrinkIter in range(iters):
+        satMask = (satMask[::2, ::2] | satMask[1::2, ::2] | satMask[::2, 1::2] | satMask[1::2, 1::2])
+        raw = (raw[::2, ::2] + raw[1::2, ::2] + raw[::2, 1::2] + raw[1::2, 1::2])
+    raw[satMask]=0xFFFF
+    return raw
+
+
+def Bench(name, func):
+    func() # Warmup
+    start = perf_counter()
+    for _ in range(nRuns):
+        func()
+    dt = (perf_counter() - start) / nRuns
+    print(f"{name:<36}{dt*1e3:10.2f} ms{mosaic.nbytes / dt / 1e6:10.1f} MB/s")
+    return dt
+
+
+mosaic = np.random.randint(0, 0x1000, (imH, imW), dtype=np.uint16)
+mosaic[::97, ::89] = 0xFFF                                  # Some saturated pixels
+
+print(f"Mosaic {imW}x{imH} ({mosaic.nbytes / 1e6:.1f} MB), {nRuns} runs")
+for _iters in range(1, 5):
+    nBin = 2 ** _iters
+    binner = Binner(mosaic.shape, nBin, nBin, BIN_SUM)
+    out = np.empty(binner.shape, dtype=binner.dtype)
+
+    old = BinOld(mosaic, _iters)
+    new = binner.Bin(mosaic, out=out)
+    h, w = binner.shape
+    overflow = not np.array_equal(old.astype(binner.dtype)[:binner.shape[0], :binner.shape[1]], new)
+    print(f"--- {nBin}x{nBin} -> {binner.dtype} ({binner.bitDepth} bit){' (old loop overflows uint16)' if overflow else ''}")
+    if binner.dtype == np.uint16 and overflow:
+        raise Exception("Binned results differ!")
+    ref = mosaic.reshape(h, nBin, w, nBin).sum(axis=(1, 3), dtype=np.uint64)
+    ref[mosaic.reshape(h, nBin, w, nBin).max(axis=(1, 3)) >= 0xFFF] = binner.satValue
+    if not np.array_equal(ref, new):
+        raise Exception("Binner result is wrong!")
+
+    dOld = Bench("2x2-loop (old)", lambda: BinOld(mosaic, _iters))
+    dNew = Bench("Binner sum (reused out)", lambda: binner.Bin(mosaic, out=out))
+    print(f"Speedup: {dOld / dNew:.2f}x")
+
+print("--- Further factors/reductions")
+for _fy, _fx, _red in [(3, 3, BIN_SUM), (4, 2, BIN_SUM), (4, 4, BIN_MEAN), (4, 4, BIN_MAX)]:
+    binner = Binner(mosaic.shape, _fy, _fx, _red)
+    out = np.empty(binner.shape, dtype=binner.dtype)
+    Bench(f"Binner {_red} {_fy}x{_fx} -> {binner.dtype}", lambda: binner.Bin(mosaic, out=out))
+
+print("--- Bayer-planes from the packed data vs. unpack + binning of the mosaic")
+packed = np.random.randint(0, 256, (imH, PackedWidth(imW)), dtype=np.uint8)
+unpacker = SRGGB12Unpacker(imH, imW)
+for _f in (1, 2, 4):
+    binner = Binner((imH, imW), 2*_f, 2*_f, BIN_SUM)
+    bayer = BayerBinner((imH, imW), _f, BIN_SUM)
+    lum = BayerBinner((imH, imW), _f, BIN_SUM, luminance=True)
+    dMosaic = Bench(f"Unpack + Binner {2*_f}x{2*_f} (mixed)", lambda: binner.Bin(unpacker.Unpack(packed)))
+    dPlanes = Bench(f"BayerBinner {_f}x{_f} per plane", lambda: bayer.Bin(packed))
+    Bench(f"BayerBinner {_f}x{_f} luminance", lambda: lum.Bin(packed))
+    print(f"Speedup planes: {dMosaic / dPlanes:.2f}x")
@@ -0,0 +1,63 @@
+import sys
+from os.path import dirname, abspath
+sys.path.insert(0, dirname(dirname(abspath(__file__))))     # Allow importing _libHQCam2 from the repository-root
+
+import zlib
+import numpy as np
+from time import perf_counter
+
+from _libHQCam2.rawcodec import RawCodec, zstandard
+from _libHQCam2.unpack import PackSRGGB12
+
+
+# Compression-ratio and single-core throughput of the raw-codecs (SRV:IMG:CODEC) for typical 12-bit frames.
+# Each codec runs in one thread, so MB/s is per core (the pipeline-threads compress several frames in parallel).
+imH = 1520                                                  # Half a full frame keeps the run short; the ratios are the same
+imW = 4056
+nRuns = 3
+rng = np.random.default_rng(0)
+
+
+def Mosaic(level:float, amplitude:float, noise:float=1.0):
+    # Smooth scene on a bayer-mosaic (different gains per colour) with shot-noise and the 12-bit saturation
+    y, x = np.mgrid[0:imH, 0:imW]
+    gain = np.where((y % 2 == 0) & (x % 2 == 0), 1.0, np.where((y % 2 == 1) & (x % 2 == 1), 0.6, 0.8))
+    scene = gain * (level + amplitude * np.sin(x / 250.0) * np.cos(y / 180.0))
+    return np.clip(rng.poisson(scene * noise) / noise, 0, 0xFFF).astype(np.uint16)
+
+
+frames = {
+    "dark":      Mosaic(256, 0),                            # Black-level with read-noise
+    "normal":    Mosaic(1200, 700),
+    "saturated": Mosaic(4000, 1500),                        # Large areas clipped at 4095
+}
+codecs = ["pack12", "shuffle:zlib:1", "delta:zlib:1", "delta:zlib:6"]
+if zstandard is not None:
+    codecs += ["shuffle:zst:1", "delta:zst:1", "delta:zst:3"]
+else:
+    print("zst skipped (zstandard-package not installed)")
+
+
+def Bench(func):
+    func() # Warmup
+    start = perf_counter()
+    for _ in range(nRuns):
+        retVal = func()
+    return (perf_counter() - start) / nRuns, retVal
+
+
+print(f"{imW}x{imH} px, {nRuns} runs, sizes relative to the packed frame (1.5 bytes per pixel)")
+print(f"{'':<10}{'codec':<16}{'ratio':>8}{'bits/px':>9}{'encode':>14}{'decode':>14}")
+for _name, _mosaic in frames.items():
+    packed = PackSRGGB12(_mosaic)
+    rawMB = packed.nbytes / 1e6
+    dt, payload = Bench(lambda: zlib.compress(packed, 1))   # Former option: generic compression of the packed bytes
+    print(f"{_name:<10}{'zlib:1 (bytes)':<16}{len(payload) / packed.nbytes:8.3f}{len(payload) * 8 / _mosaic.size:9.2f}{rawMB / dt:9.1f} MB/s")
+    for _spec in codecs:
+        codec = RawCodec.FromStr(_spec)
+        dtEnc, payload = Bench(lambda: codec.Encode(packed, 2, packed=True))
+        dtDec, restored = Bench(lambda: RawCodec.Decode(payload, packed.shape, packed.dtype, *codec.Ids, period=2, packed=True))
+        if not np.array_equal(restored, packed):
+            raise Exception(f"{_spec} is not lossless")
+        print(f"{_name:<10}{_spec:<16}{len(payload) / packed.nbytes:8.3f}{len(payload) * 8 / _mosaic.size:9.2f}"
+              f"{rawMB / dtEnc:9.1f} MB/s{rawMB / dtDec:9.1f} MB/s")
@@ -0,0 +1,71 @@
+import sys
+from os.path import dirname, abspath
+sys.path.insert(0, dirname(dirname(abspath(__file__))))     # Allow importing _libHQCam2 from the repository-root
+
+import numpy as np
+from time import perf_counter
+from threading import Thread
+
+from _libHQCam2.procpool import ProcessPool, SharedArray, UnpackBinTask, SPLIT_ROWS, SPLIT_FRAMES
+from _libHQCam2.unpack import SRGGB12Unpacker, UnpackSRGGB12, PackedWidth
+from _libHQCam2.binning import Binner, BinDtype, BIN_SUM
+
+
+# Full-frame unpack + 2x2-binning (sum) like CaptureShutterspeedSequence with SRV:IMG:BIN 2:2
+imH = 3040
+imW = 4056
+fy = fx = 2
+nFrames = 24                                                # Frames per measurement
+nCallers = 4                                                # Concurrent pipeline-threads (submit the frames)
+dtype = BinDtype(fy, fx, BIN_SUM)
+outShape = (imH // fy, imW // fx)
+
+packed = np.random.randint(0, 256, (imH, PackedWidth(imW)), dtype=np.uint8)
+ref = Binner((imH, imW), fy, fx, BIN_SUM, dtype=dtype).Bin(UnpackSRGGB12(packed))
+
+
+def RunCallers(nThreads:int, func):
+    # Each thread processes nFrames / nThreads frames with its own index (like the pipeline-threads)
+    threads = [Thread(target=lambda _i=_i: [func(_i) for _ in range(nFrames // nThreads)]) for _i in range(nThreads)]
+    start = perf_counter()
+    for _t in threads:
+        _t.start()
+    for _t in threads:
+        _t.join()
+    return (perf_counter() - start) / (nFrames // nThreads * nThreads)
+
+
+def Report(name:str, dt:float, dtBase:float):
+    print(f"{name:<36}{dt * 1e3:10.2f} ms/frame{1 / dt:10.1f} fps{dtBase / dt:8.2f}x")
+
+
+### Baseline: Pipeline-threads in this process (GIL) ###
+bufs = [(SRGGB12Unpacker(imH, imW), Binner((imH, imW), fy, fx, BIN_SUM, dtype=dtype), np.empty(outShape, dtype=dtype)) for _ in range(nCallers)]
+def ThreadFrame(i):
+    unpacker, binner, out = bufs[i]
+    binner.Bin(unpacker.Unpack(packed), out=out)
+
+print(f"Unpack + {fy}x{fx}-binning of {imW}x{imH}, {nFrames} frames")
+dtBase = RunCallers(1, ThreadFrame)
+Report("1 thread (baseline)", dtBase, dtBase)
+for _n in range(2, nCallers + 1):
+    Report(f"{_n} threads", RunCallers(_n, ThreadFrame), dtBase)
+
+### Process-pool on shared memory ###
+src = SharedArray((nCallers, imH, PackedWidth(imW)), np.uint8)
+dst = SharedArray((nCallers,) + outShape, dtype)
+task = UnpackBinTask(src.Spec(), dst.Spec(), (imH, imW), fy, fx, BIN_SUM, dtype)
+for _split in (SPLIT_ROWS, SPLIT_FRAMES):
+    for _nWorkers in range(1, 5):
+        pool = ProcessPool(_nWorkers, _split)
+        nThreads = 1 if _split == SPLIT_ROWS else _nWorkers
+        def PoolFrame(i):
+            np.copyto(src.Array[i], packed)                 # Captured frame into the shared input-slot
+            pool.Run(task, outShape[0], i, i)
+        PoolFrame(0) # Warmup (buffers of the workers)
+        if not np.array_equal(dst.Array[0], ref):
+            raise Exception("Pool result is wrong!")
+        Report(f"{_nWorkers} processes split by {_split}", RunCallers(nThreads, PoolFrame), dtBase)
+        pool.Close()
+src.Close()
+dst.Close()
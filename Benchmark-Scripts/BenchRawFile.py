@@ -0,0 +1,69 @@
+import sys
+from os.path import dirname, abspath, join, isdir
+sys.path.insert(0, dirname(dirname(abspath(__file__))))     # Allow importing _libHQCam2 from the repository-root
+
+import os
+import pickle
+import tempfile
+import numpy as np
+from time import perf_counter
+
+from _libHQCam2.rawfile import WriteRawFrame, ReadRawFrame
+
+
+# Target directory (tmpfs like the RAM-disk, if possible)
+benchDir = sys.argv[1] if len(sys.argv) > 1 else ("/dev/shm" if isdir("/dev/shm") else tempfile.gettempdir())
+nRuns = 10
+
+imH = 3040
+imW = 4056
+frames = {
+    "Packed 12-bit (uint8)" : np.random.randint(0, 256,  (imH, imW * 3 // 2), dtype=np.uint8),
+    "Packed widened (uint16)": np.random.randint(0, 256, (imH, imW * 3 // 2), dtype=np.uint16),  # Former RAW Bayer images
+    "Unpacked (uint16)"     : np.random.randint(0, 4096, (imH, imW), dtype=np.uint16),
+    "Binned 2x2 (uint16)"   : np.random.randint(0, 4096 * 4, (imH // 2, imW // 2), dtype=np.uint16),
+}
+meta = {"ExposureTime": 1000, "AnalogueGain": 1.0, "DigitalGain": 1.0, "FrameDuration": 100000, "SensorTimestamp": 0}
+
+
+def SavePickle(fName, arr):
+    f = open(fName, "wb")
+    pickle.dump(arr, f)
+    f.close()
+
+def LoadPickle(fName):
+    f = open(fName, "rb")
+    arr = pickle.load(f)
+    f.close()
+    return arr
+
+def LoadRawFull(fName):
+    return ReadRawFrame(fName, mmap=False)[0]
+
+def LoadRawROI(fName):
+    arr, _ = ReadRawFrame(fName)
+    return np.array(arr[1000:1100, 1000:1100])  # Partial read of a 100x100 ROI
+
+
+def Bench(func, *args):
+    func(*args) # Warmup
+    start = perf_counter()
+    for _ in range(nRuns):
+        func(*args)
+    return (perf_counter() - start) / nRuns
+
+
+print(f"Directory: {benchDir}, {nRuns} runs")
+print(f"{'Frame':<24}{'MB':>7}{'Pickle save':>14}{'Raw save':>14}{'Pickle load':>14}{'Raw load':>14}{'Raw ROI':>12}")
+for name, arr in frames.items():
+    fPkl = join(benchDir, "bench_pickle.raw")
+    fRaw = join(benchDir, "bench_container.raw")
+    mb = arr.nbytes / 1e6
+    dSavPkl = Bench(SavePickle, fPkl, arr)
+    dSavRaw = Bench(WriteRawFrame, fRaw, arr, meta)
+    dLdPkl = Bench(LoadPickle, fPkl)
+    dLdRaw = Bench(LoadRawFull, fRaw)
+    dLdROI = Bench(LoadRawROI, fRaw)
+    print(f"{name:<24}{mb:7.1f}{mb/dSavPkl:10.0f}MB/s{mb/dSavRaw:10.0f}MB/s{mb/dLdPkl:10.0f}MB/s{mb/dLdRaw:10.0f}MB/s{dLdROI*1e3:9.2f}ms")
+    os.remove(fPkl)
+    os.remove(fRaw)
@@ -0,0 +1,69 @@
+import sys
+from os.path import dirname, abspath
+sys.path.insert(0, dirname(dirname(abspath(__file__))))     # Allow importing _libHQCam2 from the repository-root
+
+import numpy as np
+from time import perf_counter
+
+from _libHQCam2.sensormodes import SENSOR_MODES_IMX477, SelectSensorMode, FullSensorMode, ModeBinning, ModeWindow, ModeStride, ModeFrameBytes, ModeTable
+from _libHQCam2.binning import BayerBinner, BIN_MEAN
+from _libHQCam2.unpack import PackedWidth
+
+
+# Stand-in for the camera: Delivers random raw-buffers (rows aligned like picamera2) of a sensor-mode.
+# Measured is the work per frame on the pi-side: Copy out of the camera-buffer (transfer) + bayer-binning to the same
+#  result (f x f per colour-plane, "mean"), once from the full-resolution mode and once from the selected binned mode.
+nRuns = 10
+binPerPlane = 2                                             # Requested binning per colour-plane (= 4x4 sensor-pixels)
+clipWins = [(0, 0, 4056, 3040), (0, 440, 4056, 2160), (1000, 1000, 800, 800)]
+
+
+class StandInCamera:
+    def __init__(self, mode:dict):
+        self.mode = mode
+        self.buffer = np.random.randint(0, 256, (mode["size"][1], ModeStride(mode)), dtype=np.uint8)
+
+    def Capture(self, out:np.ndarray):
+        np.copyto(out, self.buffer)                         # Transfer out of the camera-buffer
+        return out
+
+
+def Bench(func):
+    func() # Warmup
+    start = perf_counter()
+    for _ in range(nRuns):
+        func()
+    return (perf_counter() - start) / nRuns
+
+
+def Run(name:str, mode:dict, clipWin:tuple, f:int):
+    cam = StandInCamera(mode)
+    frame = np.empty_like(cam.buffer)
+    x, y, w, h = ModeWindow(mode, clipWin)
+    cx = PackedWidth(x)
+    binner = BayerBinner((h, w), f, BIN_MEAN)
+    out = np.empty(binner.shape, dtype=binner.dtype)
+
+    def Frame():
+        raw = cam.Capture(frame)
+        return binner.Bin(raw[y:y + h, cx:cx + PackedWidth(w)], out=out)
+
+    dt = Bench(Frame)
+    fps = min(mode["fps"], 1 / dt)
+    print(f"{name:<12}{mode['size'][0]:>5}x{mode['size'][1]:<5}{ModeFrameBytes(mode) / 1e6:8.2f} MB{dt * 1e3:10.2f} ms{1 / dt:10.1f}"
+          f"{mode['fps']:10.2f}{fps:10.1f} fps -> {out.shape}")
+    return fps
+
+
+print(ModeTable(SENSOR_MODES_IMX477))
+full = FullSensorMode(SENSOR_MODES_IMX477)
+for _clipWin in clipWins:
+    mode = SelectSensorMode(SENSOR_MODES_IMX477, _clipWin, binPerPlane)
+    print(f"--- Clip-window {_clipWin}, {binPerPlane}x{binPerPlane} per colour-plane ({BIN_MEAN}), {nRuns} runs")
+    print(f"{'':<12}{'mode':<11}{'frame':>11}{'pi-side':>13}{'max fps':>10}{'sensor':>10}{'achieved':>10}")
+    fpsFull = Run("full", full, _clipWin, binPerPlane)
+    if ModeBinning(mode) > 1:
+        fpsMode = Run("selected", mode, _clipWin, binPerPlane // ModeBinning(mode))
+        print(f"Speedup: {fpsMode / fpsFull:.2f}x frames/s, {ModeFrameBytes(full) / ModeFrameBytes(mode):.2f}x fewer bytes per frame")
+    else:
+        print("No binned mode covers the clip-window -> full resolution")
@@ -0,0 +1,47 @@
+import sys
+from os.path import dirname, abspath
+sys.path.insert(0, dirname(dirname(abspath(__file__))))     # Allow importing _libHQCam2 from the repository-root
+
+import numpy as np
+from time import perf_counter
+
+from _libHQCam2.unpack import SRGGB12Unpacker, PackedWidth
+
+
+# Full frame as delivered by picamera2 (SRGGB12_CSI2P, stride aligned to 32 bytes)
+imH = 3040
+imW = 4056
+stride = 6112
+nRuns = 20
+
+
+def UnpackOld(raw):
+    # Former loop of CaptureShutterspeedSequence
+    raw = raw.astype(np.uint16)
+    dMosaic = np.zeros((imH, imW), dtype=np.uint16)
+    for byte in range(2):
+        dMosaic[:, byte::2] = ( (raw[:, byte::3] << 4) | ((raw[:, 2::3] >> (byte * 4)) & 0b1111) )
+    return dMosaic
+
+
+def Bench(name, func, nBytes):
+    func() # Warmup
+    start = perf_counter()
+    for _ in range(nRuns):
+        func()
+    dt = (perf_counter() - start) / nRuns
+    print(f"{name:<30}{dt*1e3:10.2f} ms{nBytes / dt / 1e6:10.1f} MB/s")
+    return dt
+
+
+raw = np.random.randint(0, 256, (imH, stride), dtype=np.uint8)
+packed = raw[:, :PackedWidth(imW)]
+unpacker = SRGGB12Unpacker(imH, imW)
+
+if not np.array_equal(UnpackOld(packed), unpacker.Unpack(packed)):
+    raise Exception("Unpacked results differ!")
+
+print(f"Full frame {imW}x{imH} ({packed.nbytes / 1e6:.1f} MB packed), {nRuns} runs")
+dOld = Bench("astype + dMosaic (old)", lambda: UnpackOld(packed), packed.nbytes)
+dNew = Bench("SRGGB12Unpacker (reused)", lambda: unpacker.Unpack(packed), packed.nbytes)
+print(f"Speedup: {dOld / dNew:.2f}x")
@@ -0,0 +1,79 @@
+import sys
+import os
+import shutil
+from os.path import dirname, abspath, join, isdir, expanduser
+sys.path.insert(0, dirname(dirname(abspath(__file__))))     # Allow importing _libHQCam2 from the repository-root
+
+import pickle
+import tempfile
+import numpy as np
+from time import perf_counter
+
+from _libHQCam2.rawfile import WriteRawFrame, LAYOUT_SRGGB12_PACKED
+from _libHQCam2.rawwriter import RawWriter, WRITE_FILES, WRITE_APPEND
+
+
+# Target directories: tmpfs (like the RAM-disk) and a regular filesystem (e.g. the SD-card); more can be given as arguments
+benchDirs = sys.argv[1:] if len(sys.argv) > 1 else [
+    "/media/ramdisk" if isdir("/media/ramdisk") else "/dev/shm",
+    expanduser("~") if os.access(expanduser("~"), os.W_OK) else tempfile.gettempdir(),
+]
+nFrames = 20
+imH = 3040
+imW = 4056
+frame = np.random.randint(0, 256, (imH, imW * 3 // 2), dtype=np.uint8)    # Packed full frame (18.5 MB)
+meta = {"ExposureTime": 1000, "AnalogueGain": 1.0, "DigitalGain": 1.0, "FrameDuration": 100000, "SensorTimestamp": 0}
+hdrFields = dict(bitDepth=12, layout=LAYOUT_SRGGB12_PACKED, clipWin=(0, 0, imW, imH))
+
+
+def SavePickle(fName:str):
+    # Former per-frame saving inside the sequence-loop
+    f = open(fName, "wb")
+    pickle.dump(frame, f)
+    f.close()
+
+
+def SyncFiles(folder:str):
+    # Same durability as the RawWriter (fsync at the end of the sequence)
+    for _f in os.listdir(folder):
+        fd = os.open(join(folder, _f), os.O_RDONLY)
+        os.fsync(fd)
+        os.close(fd)
+
+
+def Run(name:str, folder:str, saveFunc, endFunc):
+    """Blocked: Time the capture-side waits per frame (the copy into the batch for the RawWriter); total: incl. fsync."""
+    os.makedirs(folder, exist_ok=True)
+    blocked = []
+    start = perf_counter()
+    for _i in range(nFrames):
+        sSave = perf_counter()
+        saveFunc(join(folder, f"Bench_{_i:04d}.raw"))
+        blocked.append(perf_counter() - sSave)
+    endFunc(folder)
+    total = perf_counter() - start
+    mb = frame.nbytes * nFrames / 1e6
+    print(f"{name:<32}{np.mean(blocked) * 1e3:10.2f} ms{max(blocked) * 1e3:10.2f} ms{total:9.2f} s{mb / total:10.0f} MB/s")
+    shutil.rmtree(folder)
+
+
+def RunWriter(name:str, folder:str, mode:str, **kwargs):
+    writer = RawWriter(mode, **kwargs)
+    os.makedirs(folder, exist_ok=True)
+    writer.BeginSequence(join(folder, "Bench_seq.raw"), nFrames * (frame.nbytes + 4096))
+    Run(name, folder, lambda f: writer.Write(f, frame, meta, **hdrFields), lambda _f: writer.Close())
+
+
+for _dir in benchDirs:
+    folder = join(_dir, "BenchWriter")
+    print(f"--- {_dir}: {nFrames} packed full frames ({frame.nbytes / 1e6:.1f} MB each)")
+    print(f"{'':<32}{'blocked/frame':>13}{'max':>13}{'total':>11}{'throughput':>15}")
+    Run("pickle per frame (former)",       folder, SavePickle, lambda f: None)
+    Run("pickle per frame + fsync",        folder, SavePickle, SyncFiles)
+    Run("WriteRawFrame sync + fsync",      folder, lambda f: WriteRawFrame(f, frame, meta, **hdrFields), SyncFiles)
+    RunWriter("RawWriter files",           folder, WRITE_FILES)
+    RunWriter("RawWriter files prealloc",  folder, WRITE_FILES, preallocate=True)
+    RunWriter("RawWriter files O_DIRECT",  folder, WRITE_FILES, direct=True)
+    RunWriter("RawWriter append",          folder, WRITE_APPEND)
+    RunWriter("RawWriter append prealloc", folder, WRITE_APPEND, preallocate=True)
+    RunWriter("RawWriter append O_DIRECT", folder, WRITE_APPEND, preallocate=True, direct=True)
@@ -0,0 +1,95 @@
+import sys
+import ast
+import builtins
+from os.path import dirname, abspath, join
+sys.path.insert(0, dirname(dirname(abspath(__file__))))     # Allow importing _libHQCam2 from the repository-root
+
+import numpy as np
+
+from _libHQCam2.binning import BayerBinner, BIN_SUM, BIN_MEAN, BIN_MAX, BIN_REDUCTIONS
+from _libHQCam2.unpack import PackSRGGB12, BAYER_PLANES
+
+
+# Smoke-check of the colour-plane binning (SRV:IMG:BAYBIN) without a camera:
+# 1.) The server-script can't be imported here (picamera2, sockets, RAM-disk), so its functions are checked statically
+#     for global names which are neither defined in the script nor builtins (would raise NameError at runtime, e.g. an
+#     import missing for the sequence with SRV:IMG:BAYBIN).
+# 2.) The binning of a sequence-frame (BayerBinner on the packed clip-window) runs with every reduction, with and
+#     without luminance, and is compared to a NumPy-reference on the unpacked mosaic.
+serverPath = join(dirname(dirname(abspath(__file__))), "rPiHQCamServer2.py")
+imH = 240
+imW = 320
+factors = [1, 2, 3]
+
+
+def BoundNames(node):
+    # Names bound anywhere below node (assignments, arguments, imports, defs, globals); nested scopes are included
+    names = set()
+    for _n in ast.walk(node):
+        if isinstance(_n, ast.Name) and not isinstance(_n.ctx, ast.Load):
+            names.add(_n.id)
+        elif isinstance(_n, ast.arg):
+            names.add(_n.arg)
+        elif isinstance(_n, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(_n.name)
+        elif isinstance(_n, (ast.Import, ast.ImportFrom)):
+            names.update([(_a.asname or _a.name).split(".")[0] for _a in _n.names])
+        elif isinstance(_n, ast.ExceptHandler) and _n.name:
+            names.add(_n.name)
+        elif isinstance(_n, ast.Global):
+            names.update(_n.names)
+    return names
+
+
+def UndefinedGlobals(path:str):
+    tree = ast.parse(open(path).read(), path)
+    funcs = [_n for _n in ast.walk(tree) if isinstance(_n, (ast.FunctionDef, ast.AsyncFunctionDef))]
+    moduleNames = BoundNames(tree) | set(dir(builtins))
+    undefined = []
+    for _func in funcs:
+        local = BoundNames(_func)
+        for _n in ast.walk(_func):
+            if isinstance(_n, ast.Name) and isinstance(_n.ctx, ast.Load) and _n.id not in local and _n.id not in moduleNames:
+                undefined.append(f"{_func.name}:{_n.lineno} {_n.id}")
+    return undefined
+
+
+def Reference(mosaic:np.ndarray, f:int, reduction:str, luminance:bool):
+    planes = []
+    for _, _y, _x in BAYER_PLANES:
+        plane = mosaic[_y::2, _x::2].astype(np.int64)
+        h, w = plane.shape[0] // f, plane.shape[1] // f
+        blocks = plane[:h * f, :w * f].reshape(h, f, w, f)
+        if reduction == BIN_SUM:
+            planes.append(blocks.sum(axis=(1, 3)))
+        elif reduction == BIN_MEAN:
+            planes.append(blocks.sum(axis=(1, 3)) // (f * f))
+        else:
+            planes.append(blocks.max(axis=(1, 3)))
+    planes = np.stack(planes)
+    if not luminance:
+        return planes
+    if reduction == BIN_MAX:
+        return planes.max(axis=0)
+    lum = planes.sum(axis=0)
+    return lum // len(BAYER_PLANES) if reduction == BIN_MEAN else lum
+
+
+undefined = UndefinedGlobals(serverPath)
+for _u in undefined:
+    print(f"Undefined name in rPiHQCamServer2.py: {_u}")
+
+mosaic = np.random.default_rng(0).integers(0, 0xFFF, (imH, imW), dtype=np.uint16)   # Below the saturation
+packed = PackSRGGB12(mosaic)
+failed = len(undefined)
+for _reduction in BIN_REDUCTIONS:
+    for _luminance in (False, True):
+        for _f in factors:
+            binner = BayerBinner((imH, imW), _f, _reduction, _luminance)
+            out = np.empty(binner.shape, dtype=binner.dtype)
+            ok = np.array_equal(binner.Bin(packed, out=out), Reference(mosaic, _f, _reduction, _luminance))
+            failed += not ok
+            print(f"{_reduction:<6}luminance={str(_luminance):<7}f={_f}  {binner.shape} {binner.dtype}  {'ok' if ok else 'FAILED'}")
+
+print("All checks passed" if failed == 0 else f"{failed} checks failed")
+sys.exit(1 if failed else 0)
@@ -1,6 +1,6 @@
 import numpy as np
 import subprocess
-from os.path import join, exists, isdir
+from os.path import join, exists, isdir, dirname, abspath
 from os import mkdir
 from time import sleep
 from picamera2 import Picamera2, Preview
@@ -8,6 +8,10 @@ from picamera2.controls import Controls
 import cv2 as cv
 from time import time
 
+import sys
+sys.path.insert(0, dirname(dirname(abspath(__file__))))     # Allow importing _libHQCam2 from the repository-root
+from _libHQCam2.unpack import SRGGB12Unpacker
+
 
 # List of shutters
 SSs = np.linspace(start=100, stop=1000, num=10, endpoint=True).astype(np.int32)
@@ -42,6 +46,7 @@ if not isdir(folder):
 imH = 3040
 imW = 4056
 bayW = int(imW * 1.5)
+unpacker = SRGGB12Unpacker(imH, imW)
 
 t0 = time()
 tLast = t0
@@ -64,16 +69,12 @@ for _ss in SSs:
     sleep(1.1) # Takes 0.9s @ 10FPS
     for _iImg in range(nMean):
         raw, meta = cam2.capture_arrays(["raw"])
-        raw = raw[0].astype(np.uint16)
+        raw = raw[0]
         currSS = meta["ExposureTime"]
         ag = meta["AnalogueGain"]
         dg = meta["DigitalGain"]
 
-        raw = raw[:, :bayW].astype(np.uint16)
-        dMosaic = np.zeros((imH, imW), dtype=np.uint16)
-        for byte in range(2):
-            dMosaic[:, byte::2] = ( (raw[:, byte::3] << 4) | ((raw[:, 2::3] >> (byte * 4)) & 0b1111) )
-        # raw = dMosaic
+        dMosaic = unpacker.Unpack(raw[:, :bayW])
 
         # dMosaic = np.divide(dMosaic, np.multiply(ag, dg)) # AG=DG=1.0!
         dMosaic = np.right_shift(dMosaic, 4) # Make 8-Bit image for comparison
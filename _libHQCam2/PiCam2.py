@@ -1,12 +1,17 @@
 from time import time, sleep
-from picamera2 import Picamera2, Preview
+from threading import Condition
+from copy import deepcopy
+from picamera2 import Picamera2, Preview, MappedArray
 from picamera2.controls import Controls
 from _libHQCam2.Logger import LogLineLeft, LogLineLeftRight
+from _libHQCam2.sensormodes import NormalizeSensorModes, FullSensorMode, ModeBinning, ModeFrameBytes, SENSOR_MODES_IMX477
 
 
 class PiCam2:
     __IDN__ = "PiCam2"
     __cam2__ = None
+    CtrlLatency = 2                                 # Frames until a changed control shows up in the metadata (libcamera delayed controls of the imx477)
+    __metaKeys__ = {"FrameDurationLimits": "FrameDuration"} # Controls which are reported under another metadata-key
 
     def __init__(self, fr:float=10.0, awaitWarmup:float=1.0):
         ### NOTE - Difference "configurations" and "controls" ###
@@ -36,6 +41,15 @@ class PiCam2:
         self.__cam2__ = Picamera2(tuning=_tune2)
         LogLineLeftRight("Instanciating picamera2-object:", "ok")
 
+        # Raw sensor-modes (can only be queried while the camera is not running)
+        try:
+            self.__sensorModes__ = NormalizeSensorModes(self.__cam2__.sensor_modes)
+        except Exception as e:
+            LogLineLeftRight("Reading sensor-modes:", f"failed ({e}) -> imx477-table")
+            self.__sensorModes__ = [dict(_m) for _m in SENSOR_MODES_IMX477]
+        self.__sensorMode__ = FullSensorMode(self.__sensorModes__)
+        LogLineLeftRight("Sensor-modes:", ", ".join([f"{_m['size'][0]}x{_m['size'][1]}@{_m['fps']:.0f}fps" for _m in self.__sensorModes__]))
+
         # Start internal camera-capture stream (no screen-output) -> Noted, this is not necessary!
         # self.__cam2__.start_preview(Preview.NULL)
         # LogLineLeftRight("Setting up NULL-preview:", "ok")
@@ -51,6 +65,20 @@ class PiCam2:
         self.__cam2__.configure(self._pConf2)
         LogLineLeftRight("Preview-configuration:", "ok")
 
+        # Track the metadata of every frame (single continuous request-stream instead of capture_metadata() per query)
+        self.__fd__ = _fd
+        self.__frameCond__ = Condition()
+        self.__frameSeq__ = 0
+        self.__lastMeta__ = None
+        self.__ring__ = None                        # Ring-buffer which gets every frame (see AttachRing)
+        self.__cam2__.post_callback = self.__OnFrame__
+
+        # Frame-duration changes (see SetFD)
+        self.__confCache__ = {_fd: self._pConf2}    # Prepared configurations per frame-duration
+        self.__fdLiveOk__ = {}                      # Frame-durations which can't be set as live control -> False
+        self.RestartCosts = []                      # Durations of the reconfigures in s
+        self.BracketComplete = True                 # The latest CaptureBracket got all frames of all shutterspeeds
+
         # Start the stream
         self.__cam2__.start()
         LogLineLeftRight("Camera-start:", "ok")
@@ -165,6 +193,150 @@ class PiCam2:
         return self.__IDN__
 
 
+
+
+    def __OnFrame__(self, request):
+        # Called by picamera2 for every completed request
+        meta = request.get_metadata()
+        ring = self.__ring__
+        if ring is not None:                            # Copy directly from the camera-buffer into the ring (no allocation)
+            with MappedArray(request, self.__ringStream__) as m:
+                ring.Put(m.array[self.__ringClip__], meta)
+        with self.__frameCond__:
+            self.__frameSeq__ += 1
+            self.__lastMeta__ = meta
+            self.__frameCond__.notify_all()
+
+
+    def AttachRing(self, ring, stream:str="raw", clip:tuple=(slice(None), slice(None))):
+        """Continuously captures every frame of the running stream into a ring-buffer (see _libHQCam2.ringbuffer.FrameRing).
+
+        Args:
+            ring (FrameRing): Ring-buffer or None to stop.
+            stream (str, optional): Stream which is captured. Defaults to "raw".
+            clip (tuple, optional): Slices applied to the frame-array (e.g. clip-window in packed bytes). Defaults to the entire frame.
+        """
+        self.__ringStream__ = stream
+        self.__ringClip__ = clip
+        self.__ring__ = ring
+
+
+    def GetRing(self):
+        return self.__ring__
+
+
+    def FrameSeq(self):
+        """Returns the sequence-number of the latest frame (counted by the frame-callback)."""
+        with self.__frameCond__:
+            return self.__frameSeq__
+
+
+    def GetMeta(self, newerThan:int=None, timeout:float=None):
+        """Returns the metadata of the latest frame without requesting a new one.
+
+        Args:
+            newerThan (int, optional): Waits until a frame with a higher sequence-number arrived. Defaults to None (latest frame; waits only if there is none yet).
+            timeout (float, optional): Maximum time to wait in s. Defaults to None (infinite).
+
+        Returns:
+            (int, dict): Sequence-number and metadata of the frame or (None, None) when the timeout expired.
+        """
+        newerThan = 0 if newerThan is None else newerThan
+        with self.__frameCond__:
+            if not self.__frameCond__.wait_for(lambda: self.__frameSeq__ > newerThan, timeout):
+                return None, None
+            return self.__frameSeq__, self.__lastMeta__
+
+
+    def __InRange__(self, meta:dict, ctrl:str, target, LoBnd:float, HiBnd:float):
+        cur = meta.get(self.__metaKeys__.get(ctrl, ctrl))
+        if cur is None:
+            return False
+        try:
+            target = list(target)
+        except TypeError:
+            target = [target]
+        try:
+            cur = list(cur)
+        except TypeError:
+            cur = [cur] * len(target)   # e.g. FrameDurationLimits (min, max) vs. FrameDuration
+        return all([_c >= _t * LoBnd and _c <= _t * HiBnd for _c, _t in zip(cur, target)])
+
+
+    def AwaitSettled(self, targets:dict, sinceSeq:int, LoBnd:float=0.95, HiBnd:float=1.05, MaxFrames:int=10):
+        """Waits until all targets are reflected in the metadata of the same frame.
+        All checks are done on one metadata-snapshot per frame; it returns with the first matching frame.
+
+        Args:
+            targets (dict): {control: target-value} (FrameDurationLimits is checked against FrameDuration).
+            sinceSeq (int): Sequence-number of the latest frame before the controls were set (see SetControls).
+            LoBnd (float, optional): Lower tolerance in %. Defaults to 0.95.
+            HiBnd (float, optional): Upper tolerance in %. Defaults to 1.05.
+            MaxFrames (int, optional): Deadline in frame-periods (additional to CtrlLatency). Defaults to 10.
+
+        Returns:
+            (dict, bool): Current values {control: value} of the last checked frame and if the deadline expired.
+        """
+        start = time()
+        deadline = start + (self.CtrlLatency + MaxFrames) * self.__fd__ * 1e-6
+        settled = {}                            # control: (time, frames) of the first matching frame
+        values = {}
+        seq = sinceSeq
+        timedout = True
+        while True:
+            seq, meta = self.GetMeta(newerThan=seq, timeout=max(0.0, deadline - time()))
+            if meta is None:                    # Deadline expired
+                break
+            inRange = {}
+            for _ctrl, _target in targets.items():
+                inRange[_ctrl] = self.__InRange__(meta, _ctrl, _target, LoBnd, HiBnd)
+                values[_ctrl] = meta.get(self.__metaKeys__.get(_ctrl, _ctrl))
+                if inRange[_ctrl] and _ctrl not in settled:
+                    settled[_ctrl] = (time() - start, seq - sinceSeq)
+            if all(inRange.values()):
+                timedout = False
+                break
+
+        for _ctrl in targets:                   # Time-to-settle per control
+            if _ctrl in settled:
+                LogLineLeftRight(f"Settled {_ctrl}:", f"{settled[_ctrl][0]:.3f}s ({settled[_ctrl][1]} frames)")
+            else:
+                LogLineLeftRight(f"Settled {_ctrl}:", f"timeout after {time() - start:.3f}s")
+        return values, timedout
+
+
+    def SetControls(self, ctrls:dict):
+        """Sets controls and returns the sequence-number of the latest frame before (for AwaitSettled).
+
+        Args:
+            ctrls (dict): Controls for set_controls.
+
+        Returns:
+            int: Sequence-number of the latest frame before the controls were set.
+        """
+        seq = self.FrameSeq()
+        if "FrameDurationLimits" in ctrls:      # Keep deadline and configuration (used on the next reconfigure) in sync
+            self.__fd__ = int(ctrls["FrameDurationLimits"][0])
+            self._pConf2['controls']['FrameDurationLimits'] = tuple(ctrls["FrameDurationLimits"])
+        self.__cam2__.set_controls(ctrls)
+        return seq
+
+
+    def SetAwait(self, ctrls:dict, checks:list=None, LoBnd:float=0.95, HiBnd:float=1.05, MaxFrames:int=10):
+        """Sets controls and waits until they are reflected in the metadata (see AwaitSettled).
+
+        Args:
+            ctrls (dict): Controls for set_controls.
+            checks (list, optional): Controls which are awaited. Defaults to None (all of ctrls).
+
+        Returns:
+            (dict, bool): Current values {control: value} and if the deadline expired.
+        """
+        checks = list(ctrls.keys()) if checks is None else checks
+        seq = self.SetControls(ctrls)
+        return self.AwaitSettled({_c: ctrls[_c] for _c in checks}, seq, LoBnd, HiBnd, MaxFrames)
+
+
     def CaptureMeta(self):
         return self.__cam2__.capture_metadata()
 
@@ -183,6 +355,130 @@ class PiCam2:
 
 
 
+    def GetSensorModes(self):
+        return self.__sensorModes__
+
+
+    def GetSensorMode(self):
+        return self.__sensorMode__
+
+
+    def SetSensorMode(self, mode:dict, timeout:float=2.0):
+        """Reconfigures the raw-stream to a sensor-mode (needs stop/configure/start), e.g. a 2x2-binned mode so fewer
+        bytes are read out and transferred per frame. The frame-duration and controls of the configuration are kept.
+
+        Args:
+            mode (dict): Sensor-mode (see GetSensorModes).
+            timeout (float, optional): Maximum time to wait for the first frame in s. Defaults to 2.0.
+
+        Returns:
+            bool: True when the camera was reconfigured, False when the mode was already active.
+        """
+        if mode == self.__sensorMode__:
+            return False
+        seq = self.FrameSeq()
+        start = time()
+        conf = self.__cam2__.create_preview_configuration(raw={"size": tuple(mode["size"]),
+                                                               "format": f"SRGGB{mode['bitDepth']}_CSI2P",
+                                                               },
+                                                          controls=dict(self._pConf2['controls']),
+                                                          )
+        self.__cam2__.stop()
+        self.__cam2__.configure(conf)
+        self.__cam2__.start()
+        self._pConf2 = conf
+        self.__confCache__ = {self.__fd__: conf}    # Prepared configurations of the former mode are invalid
+        self.__sensorMode__ = mode
+        self.GetMeta(newerThan=seq, timeout=timeout)
+        self.RestartCosts.append(time() - start)
+        LogLineLeftRight(f"Sensor-mode {mode['size'][0]}x{mode['size'][1]} (bin {ModeBinning(mode)}, {ModeFrameBytes(mode) / 1e6:.1f}MB/frame):",
+                         f"{self.RestartCosts[-1]:.3f}s")
+        return True
+
+
+
+
+    def CaptureBracket(self, SSs:list, nPerSS:int=1, stream:str="raw", LoBnd:float=0.95, HiBnd:float=1.05, MaxLag:int=8):
+        """Exposure-bracketing: Cycles the sensor through the shutterspeeds back-to-back and yields every frame tagged
+        with the shutterspeed it belongs to (by its actual ExposureTime from the metadata).
+        The shutterspeeds are queued frame-paced: The next one is set nPerSS frames after the previous one, so each
+        shutterspeed is active for exactly nPerSS frames (shifted by the control-latency) without waiting for it to settle.
+        Frames of the transient (ExposureTime matching no outstanding shutterspeed) are dropped. If a shutterspeed
+        is still incomplete MaxLag frames after it was due, it is set again. If not all frames arrived within the
+        maximum amount of frames, the generator ends early and BracketComplete is False.
+
+        Args:
+            SSs (list): Shutterspeeds in µs (> 0).
+            nPerSS (int, optional): Frames per shutterspeed. Defaults to 1.
+            stream (str, optional): Stream which is captured. Defaults to "raw".
+            LoBnd (float, optional): Lower tolerance in %. Defaults to 0.95.
+            HiBnd (float, optional): Upper tolerance in %. Defaults to 1.05.
+            MaxLag (int, optional): Frames (additional to nPerSS + CtrlLatency) before a shutterspeed is set again. Defaults to 8.
+
+        Raises:
+            Exception: For shutterspeeds <= 0 (auto-exposure can't be bracketed).
+
+        Yields:
+            (np.ndarray, dict, int, int): Frame, metadata, index of the shutterspeed and index of the frame for this shutterspeed.
+        """
+        if any([_ss <= 0 for _ss in SSs]):
+            raise Exception("CaptureBracket - Shutterspeeds must be > 0.")
+        self.BracketComplete = False
+        nSS = len(SSs)
+        counts = [0] * nSS
+        setAt = [0] * nSS                       # Frame-number when the shutterspeed was set (last time)
+        iCur = 0                                # First shutterspeed which is not complete
+        iSet = 0                                # Latest shutterspeed which was set
+        nFrames = 0
+        nDropped = 0
+        maxFrames = nSS * (nPerSS + self.CtrlLatency + MaxLag) + 10
+        self.__cam2__.set_controls({"AeEnable": False, "ExposureTime": SSs[0]})
+
+        start = time()
+        while iCur < nSS and nFrames < maxFrames:
+            request = self.__cam2__.capture_request()
+            try:
+                meta = request.get_metadata()
+                nFrames += 1
+                ss = meta["ExposureTime"]
+                iMatch = None
+                for _iSS in range(iCur, iSet + 1):
+                    if counts[_iSS] < nPerSS and ss >= SSs[_iSS] * LoBnd and ss <= SSs[_iSS] * HiBnd:
+                        iMatch = _iSS
+                        break
+                if iMatch is None:
+                    nDropped += 1               # Transient
+                else:
+                    frame = request.make_array(stream)
+            finally:
+                request.release()
+
+            if iMatch is not None:
+                counts[iMatch] += 1
+                yield frame, meta, iMatch, counts[iMatch] - 1
+            while iCur < nSS and counts[iCur] >= nPerSS:
+                iCur += 1
+            if iCur >= nSS:
+                break
+
+            if nFrames - setAt[iCur] > nPerSS + self.CtrlLatency + MaxLag:
+                iSet = iCur                     # Shutterspeed missed (e.g. frames dropped) -> Set it again
+            elif iSet + 1 < nSS and nFrames - setAt[iSet] >= nPerSS:
+                iSet += 1                       # Previous shutterspeed had its nPerSS frames -> Queue the next one
+            else:
+                continue
+            self.__cam2__.set_controls({"ExposureTime": SSs[iSet]})
+            setAt[iSet] = nFrames
+
+        dt = time() - start
+        LogLineLeftRight("Bracketing:", f"{sum(counts)} frames, {nDropped} dropped, {dt:.3f}s ({dt / max(1, sum(counts)):.3f}s/frame)")
+        self.BracketComplete = iCur >= nSS
+        if not self.BracketComplete:
+            LogLineLeftRight("Bracketing:", f"incomplete after {nFrames} frames (SS={SSs[iCur]} missing)")
+
+
+
+
     def SetSS(self, ss:int, Lo=0.95, Hi=1.05):
         self.__cam2__.set_controls({"AeEnable": (True, False)[ss > 0],
                                     "ExposureTime": ss,
@@ -190,7 +486,7 @@ class PiCam2:
         return 0
 
     def GetSS(self):
-        _param = self.__cam2__.capture_metadata()["ExposureTime"]
+        _param = self.GetMeta()[1]["ExposureTime"]
         return _param
 
 
@@ -201,7 +497,7 @@ class PiCam2:
         return 0
 
     def GetScalerCrop(self):
-        param = self.__cam2__.capture_metadata()["ScalerCrop"]
+        param = self.GetMeta()[1]["ScalerCrop"]
         param = list(param)
         return param
 
@@ -214,7 +510,7 @@ class PiCam2:
         return 0
 
     def GetAG(self):
-        _param = self.__cam2__.capture_metadata()["AnalogueGain"]
+        _param = self.GetMeta()[1]["AnalogueGain"]
         return _param
 
 
@@ -226,35 +522,67 @@ class PiCam2:
         return 0
 
     def GetAWB(self):
-        _param = self.__cam2__.capture_metadata()["ColourGains"]
+        _param = self.GetMeta()[1]["ColourGains"]
         return _param
 
 
 
 
     def __SetFD__(self, fd:int):
+        # Reconfigure with a prepared configuration per frame-duration (needs stop/configure/start)
         fd = int(fd)
-        self._pConf2['controls']['FrameDurationLimits'] = (fd, fd)
-        self.__cam2__.configure(self._pConf2)
+        conf = self.__confCache__.get(fd)
+        if conf is None:
+            conf = deepcopy(self._pConf2)
+            self.__confCache__[fd] = conf
+        conf['controls']['FrameDurationLimits'] = (fd, fd)
+        self.__cam2__.configure(conf)
+        self._pConf2 = conf
+        self.__fd__ = fd
         return 0
 
-    def SetFD(self, fd:int=100000):
+    def SetFD(self, fd:int=100000, live:bool=True, LoBnd:float=0.95, HiBnd:float=1.05):
+        """Adjusts the frame-duration. First it is tried as live control (no restart of the camera);
+        only if the frame-duration is not reached, the camera gets reconfigured (stop/configure/start).
+        Frame-durations which needed a reconfigure are remembered and reconfigured directly the next time.
+
+        Args:
+            fd (int, optional): Frame-duration in µs. Defaults to 100000.
+            live (bool, optional): Try to set the frame-duration as live control. Defaults to True.
+            LoBnd (float, optional): Lower tolerance in %. Defaults to 0.95.
+            HiBnd (float, optional): Upper tolerance in %. Defaults to 1.05.
+
+        Returns:
+            (dict, bool): Current value {"FrameDurationLimits": FrameDuration} and if the deadline expired.
+        """
+        fd = int(fd)
+        if live and self.__fdLiveOk__.get(fd, True):
+            vals, timedout = self.SetAwait({"FrameDurationLimits": (fd, fd)}, LoBnd=LoBnd, HiBnd=HiBnd)
+            if not timedout:
+                return vals, timedout
+            self.__fdLiveOk__[fd] = False
+            LogLineLeftRight(f"FrameDuration {fd}µs live:", "not reached -> reconfigure")
+
+        seq = self.FrameSeq()
+        start = time()
         self.__cam2__.stop()
         self.__SetFD__(fd)
         self.__cam2__.start()
-        return 0
+        vals, timedout = self.AwaitSettled({"FrameDurationLimits": fd}, seq, LoBnd, HiBnd)
+        self.RestartCosts.append(time() - start)
+        LogLineLeftRight(f"FrameDuration {fd}µs restart took:", f"{self.RestartCosts[-1]:.3f}s")
+        return vals, timedout
 
     def GetFD(self):
-        _param = self.__cam2__.capture_metadata()["FrameDuration"]
+        _param = self.GetMeta()[1]["FrameDuration"]
         return _param
 
 
 
 
-    def SetFR(self, fr:float=10.0):
+    def SetFR(self, fr:float=10.0, live:bool=True):
         _fd = 1e6 / fr
-        self.SetFD(_fd)
-        return 0
+        return self.SetFD(_fd, live=live)
 
     def GetFR(self):
         param = 1e6 / self.GetFD()
@@ -0,0 +1,134 @@
+import numpy as np
+
+from _libHQCam2.unpack import SATURATION_SRGGB12
+
+
+
+# Products of an accumulation (see FrameAccumulator.Products)
+ACCU_SUM = "sum"                    # uint32 sum of all frames (uint64 for frames wider than 16 bit)
+ACCU_MEAN = "mean"                  # float32 mean
+ACCU_VAR = "var"                    # float32 sample-variance (needs the sum of squares)
+ACCU_SAT = "sat"                    # uint16 amount of saturated frames per pixel (always stored)
+ACCU_PRODUCTS = (ACCU_SUM, ACCU_MEAN, ACCU_VAR)
+
+
+
+
+def DecodeAccuProducts(accuStr:str):
+    """Decodes the products of an accumulation, e.g. "mean:var".
+
+    Args:
+        accuStr (str): Products separated by ":" ("sum", "mean", "var") or "0"/"off" to disable the accumulation.
+
+    Raises:
+        Exception: For unknown products.
+
+    Returns:
+        list: Products (empty when disabled).
+    """
+    products = [_p for _p in accuStr.lower().split(":") if _p not in ("", "0", "off", "false", "no", "n")]
+    for _p in products:
+        if _p not in ACCU_PRODUCTS:
+            raise Exception(f"DecodeAccuProducts - Unknown product \"{_p}\" (supported: {ACCU_PRODUCTS}).")
+    return products
+
+
+
+
+class FrameAccumulator:
+    """Sums frames into a uint32-accumulator as they arrive, so only one frame has to be resident at a time.
+    Additionally the saturated frames per pixel are counted and (optionally) the sum of squares is kept for the variance.
+    All buffers are allocated once and reused after Reset().
+    """
+    def __init__(self, shape:tuple, variance:bool=False, satLevel:int=SATURATION_SRGGB12, frameDtype=np.uint16):
+        """Creates the accumulator.
+
+        Args:
+            shape (tuple): Shape of the frames.
+            variance (bool, optional): Keep the sum of squares for the variance. Defaults to False.
+            satLevel (int, optional): Pixel-values >= satLevel count as saturated. Defaults to SATURATION_SRGGB12.
+            frameDtype (np.dtype, optional): Data-type of the frames (wider than 16 bit e.g. for binned sums). Defaults to np.uint16.
+        """
+        self.shape = tuple(shape)
+        self.satLevel = satLevel
+        wide = np.dtype(frameDtype).itemsize > 2
+        self.Sum = np.zeros(self.shape, dtype=np.uint64 if wide else np.uint32)    # 2^32 / 2^16 = 65536 16-bit frames without overflow
+        self.SatCount = np.zeros(self.shape, dtype=np.uint16)
+        self.SumSq = np.zeros(self.shape, dtype=np.uint64) if variance else None
+        self.__sq__ = np.empty(self.shape, dtype=np.uint64 if wide else np.uint32) if variance else None   # Squares of one 16-bit frame fit into uint32
+        self.__mask__ = np.empty(self.shape, dtype=bool)
+        self.Count = 0
+        self.Meta = None                    # Metadata of the latest frame
+
+
+    def Reset(self):
+        self.Sum.fill(0)
+        self.SatCount.fill(0)
+        if self.SumSq is not None:
+            self.SumSq.fill(0)
+        self.Count = 0
+        self.Meta = None
+
+
+    def Add(self, frame:np.ndarray, meta:dict=None):
+        """Adds a frame (in place, no temporaries).
+
+        Args:
+            frame (np.ndarray): Frame (dtype see frameDtype).
+            meta (dict, optional): Metadata of the frame. Defaults to None.
+        """
+        np.add(self.Sum, frame, out=self.Sum)
+        np.greater_equal(frame, self.satLevel, out=self.__mask__)
+        np.add(self.SatCount, self.__mask__, out=self.SatCount)
+        if self.SumSq is not None:
+            np.multiply(frame, frame, out=self.__sq__, dtype=self.__sq__.dtype)
+            np.add(self.SumSq, self.__sq__, out=self.SumSq)
+        self.Count += 1
+        self.Meta = meta
+
+
+    def Mean(self):
+        """Returns the mean of the accumulated frames.
+
+        Returns:
+            np.ndarray: float32-mean.
+        """
+        return np.divide(self.Sum, max(1, self.Count), dtype=np.float32)
+
+
+    def Variance(self):
+        """Returns the sample-variance (ddof=1) of the accumulated frames.
+
+        Returns:
+            np.ndarray: float32-variance (0 for less than 2 frames).
+        """
+        if self.SumSq is None:
+            raise Exception("FrameAccumulator - Variance not tracked.")
+        if self.Count < 2:
+            return np.zeros(self.shape, dtype=np.float32)
+        s = self.Sum.astype(np.float64)
+        var = self.SumSq - s * s / self.Count
+        var /= self.Count - 1
+        np.maximum(var, 0.0, out=var)       # Rounding of float64 can lead to tiny negative values
+        return var.astype(np.float32)
+
+
+    def Products(self, products:list):
+        """Returns the requested products of the accumulated frames.
+
+        Args:
+            products (list): Products ACCU_SUM, ACCU_MEAN and/or ACCU_VAR.
+
+        Returns:
+            dict: {product: array} including ACCU_SAT.
+        """
+        result = {}
+        for _p in products:
+            if _p == ACCU_SUM:
+                result[_p] = self.Sum
+            elif _p == ACCU_MEAN:
+                result[_p] = self.Mean()
+            elif _p == ACCU_VAR:
+                result[_p] = self.Variance()
+        result[ACCU_SAT] = self.SatCount
+        return result
@@ -0,0 +1,181 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from _libHQCam2.Logger import LogLineLeftRight
+from _libHQCam2.protocol import CommandFramer, SplitCommand
+
+
+
+class AsyncConnAdapter:
+    """Socket-like wrapper (sendall) around an asyncio StreamWriter, so that command-handlers running in the
+    camera-thread can stream data to their client (e.g. CAP:SEQSTR).
+    """
+    def __init__(self, loop, writer:asyncio.StreamWriter, turn:asyncio.Event=None):
+        self.__loop__ = loop
+        self.__writer__ = writer
+        self.__turn__ = turn            # Set when the responses of all previous commands of the connection are sent
+
+
+    def sendall(self, data):
+        # Blocks the calling (camera-)thread until the data is handed to the kernel.
+        #  The write-buffer-limit of the transport is 0, so drain() returns only when the buffer is flushed
+        #  and the caller can reuse its buffer (e.g. a FrameSlots-slot) afterwards.
+        asyncio.run_coroutine_threadsafe(self.__Send__(data), self.__loop__).result()
+
+
+    async def __Send__(self, data):
+        if self.__turn__ is not None:
+            await self.__turn__.wait()  # Don't interleave with responses of pipelined commands sent before
+        self.__writer__.write(data)
+        await self.__writer__.drain()
+
+
+
+
+class AsyncCommandServer:
+    """asyncio-based command-server for multiple concurrent clients.
+    Read-only commands are answered immediately by the client-task. All other commands (camera or server-settings
+    mutating) are queued and executed one after another by a single camera-task in a worker-thread, so a long
+    CAP:SEQFET does not block the event-loop and other clients can still query e.g. IDN?.
+    Each connection can send several commands at once (see _libHQCam2.protocol). They are dispatched as soon as
+    they are received and their responses are sent strictly in order of reception.
+    """
+    def __init__(self, port:int, ExecuteFunc, ReadOnlyCmds, KeepRunningFunc=None, ErrorReply:str="nak", RcvBufSize:int=4096, Framing:str="auto"):
+        """Creates the server (call Run() to serve).
+
+        Args:
+            port (int): Socket-port.
+            ExecuteFunc (callable): Is called as ExecuteFunc(cmd, payload, conn) and returns the response-string.
+            ReadOnlyCmds (iterable): Commands which are executed immediately (must not block!).
+            KeepRunningFunc (callable, optional): Returns False when the server should shut down (checked after each command). Defaults to None.
+            ErrorReply (str, optional): Response when ExecuteFunc raises an exception. Defaults to "nak".
+            RcvBufSize (int, optional): Maximum amount of bytes received at once. Defaults to 4096.
+            Framing (str, optional): Command-framing of the connections (see _libHQCam2.protocol). Defaults to "auto".
+        """
+        self.__port__ = port
+        self.__execute__ = ExecuteFunc
+        self.__readOnly__ = set(ReadOnlyCmds)
+        self.__keepRunning__ = KeepRunningFunc if KeepRunningFunc is not None else (lambda: True)
+        self.__errReply__ = ErrorReply
+        self.__rcvBufSize__ = RcvBufSize
+        self.__framing__ = Framing
+        self.__camExecutor__ = ThreadPoolExecutor(max_workers=1, thread_name_prefix="Camera")
+        self.__clients__ = set()        # (writer, task) of the connected clients
+        self.__camQueue__ = None
+        self.Busy = ""                  # Command which is executed by the camera-task at the moment
+
+
+    def Status(self):
+        """Returns the current state of the server.
+
+        Returns:
+            dict: busy (command executed by the camera-task), queued (waiting camera-commands) and clients (connected clients).
+        """
+        return {"busy": self.Busy,
+                "queued": self.__camQueue__.qsize() if self.__camQueue__ is not None else 0,
+                "clients": len(self.__clients__),
+                }
+
+
+    def Run(self):
+        asyncio.run(self.__Serve__())
+        self.__camExecutor__.shutdown(wait=True)
+
+
+    async def __Serve__(self):
+        self.__loop__ = asyncio.get_running_loop()
+        self.__camQueue__ = asyncio.Queue()
+        self.__stopEvent__ = asyncio.Event()
+        camTask = asyncio.create_task(self.__CameraTask__())
+
+        server = await asyncio.start_server(self.__HandleClient__, host="", port=self.__port__, reuse_address=True)
+        LogLineLeftRight("Multi-client server listening on port:", self.__port__)
+        async with server:
+            await self.__stopEvent__.wait()
+        for _writer, _ in list(self.__clients__):
+            _writer.close()                             # Readers get EOF -> client-tasks send their outstanding responses and end
+        await asyncio.gather(*[_task for _, _task in list(self.__clients__)], return_exceptions=True)
+        camTask.cancel()
+
+
+    async def __Execute__(self, cmd:str, payload:list, conn):
+        try:
+            if cmd in self.__readOnly__:
+                return self.__execute__(cmd, payload, conn)
+            fut = self.__loop__.create_future()
+            await self.__camQueue__.put((cmd, payload, conn, fut))
+            return await fut
+        except Exception as e:
+            LogLineLeftRight("Exception occured:", e)
+            return self.__errReply__
+
+
+    async def __CameraTask__(self):
+        while True:
+            cmd, payload, conn, fut = await self.__camQueue__.get()
+            self.Busy = cmd
+            try:
+                reply = await self.__loop__.run_in_executor(self.__camExecutor__, self.__execute__, cmd, payload, conn)
+                if not fut.cancelled():
+                    fut.set_result(reply)
+            except Exception as e:
+                if not fut.cancelled():
+                    fut.set_exception(e)
+            finally:
+                self.Busy = ""
+
+
+    async def __RespondTask__(self, writer:asyncio.StreamWriter, framer:CommandFramer, pending:asyncio.Queue, peer:str):
+        # Sends the responses of a connection strictly in order of the received commands
+        while True:
+            entry = await pending.get()
+            if entry is None:
+                break
+            turn, task = entry
+            turn.set()                                      # From now on the command may stream data
+            reply = await task
+            writer.write(framer.FrameReply(reply))
+            await writer.drain()
+            LogLineLeftRight(f"Sent response to {peer}", reply)
+
+            if not self.__keepRunning__():
+                self.__stopEvent__.set()
+                break
+
+
+    async def __HandleClient__(self, reader:asyncio.StreamReader, writer:asyncio.StreamWriter):
+        peer = writer.get_extra_info("peername")
+        peer = f"{peer[0]}:{peer[1]}" if peer else "?"
+        LogLineLeftRight("Client connected:", peer)
+        writer.transport.set_write_buffer_limits(high=0)    # drain() waits until everything is sent (see AsyncConnAdapter)
+        client = (writer, asyncio.current_task())
+        self.__clients__.add(client)
+        framer = CommandFramer(self.__framing__)
+        pending = asyncio.Queue()
+        respTask = asyncio.create_task(self.__RespondTask__(writer, framer, pending, peer))
+        try:
+            while not respTask.done():
+                try:
+                    rcvd = await asyncio.wait_for(reader.read(self.__rcvBufSize__), framer.IdleTimeout)
+                except asyncio.TimeoutError:                # Idle with an undecided command (auto-framing)
+                    rcvd = None
+                if rcvd is not None and not rcvd:           # Client disconnected
+                    break
+                for msg in (framer.Idle() if rcvd is None else framer.Feed(rcvd)):
+                    LogLineLeftRight(f"Received from {peer}:", msg)
+                    cmd, payload = SplitCommand(msg)
+                    turn = asyncio.Event()
+                    conn = AsyncConnAdapter(self.__loop__, writer, turn)
+                    task = asyncio.create_task(self.__Execute__(cmd, payload, conn))  # Dispatch now, respond in order
+                    await pending.put((turn, task))
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            LogLineLeftRight(f"Connection to {peer} lost:", e)
+        finally:
+            await pending.put(None)                         # Send the outstanding responses
+            try:
+                await respTask
+            except (ConnectionError, asyncio.CancelledError) as e:
+                LogLineLeftRight(f"Connection to {peer} lost:", e)
+            self.__clients__.discard(client)
+            writer.close()
+            LogLineLeftRight("Client disconnected:", peer)
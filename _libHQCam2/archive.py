@@ -1,4 +1,31 @@
 import os
+import shlex
+import tarfile
+import zlib
+from os.path import basename, relpath
+from queue import Queue
+from threading import Thread
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from _libHQCam2.netframes import SendBytes, SendEndOfFrames
+
+try:
+    import zstandard                # Optional: zstd-compression (pip install zstandard)
+except ImportError:
+    zstandard = None
+
+
+
+# Compressions of the archive
+COMPRESS_GZIP = "gz"                # Block-parallel gzip (consecutive gzip-members, readable by gzip/tar -z)
+COMPRESS_ZSTD = "zst"               # zstd with its own worker-threads (needs the zstandard-package)
+COMPRESSIONS = (COMPRESS_GZIP, COMPRESS_ZSTD)
+COMPRESS_DEFAULT_LEVELS = {COMPRESS_GZIP: 6, COMPRESS_ZSTD: 3}
+GZIP_BLOCK_SIZE = 1024**2           # Bytes of the tar-stream which are compressed per block
+SOCKET_CHUNK_SIZE = 1024**2         # Bytes which are collected before a chunk is sent (see SocketSink)
+
+
 
 
 # def CompressFolder(compressPath:str, tarGzFName:str, Multicore=True, SuppressParents=True):
@@ -8,18 +35,279 @@ import os
 #         retVal = os.system(f"tar {compressTool} -cf \"{tarGzFName}\" -C \"{compressPath}\" .")
 #     else:
 #         retVal = os.system(f"tar {compressTool} -cf \"{tarGzFName}\" \"{compressPath}\"")
-    
+
 #     return retVal
 
 
-def ArchiveFolder(archivePath:str, tarFName:str, compress=True, multicore=True, suppressParents=True):
+def ArchiveFolderShell(archivePath:str, tarFName:str, compress=True, multicore=True, suppressParents=True):
+    """Former archiving by the external tar (and pigz). Kept for comparison (see Benchmark-Scripts/BenchArchive.py)."""
     compressTool = ""
     if compress:                                                                        # If compression is wanted
         compressTool = "--use-compress-program=pigz" if multicore == True else "-z"     #  add parameters for compression
 
     if suppressParents:
-        retVal = os.system(f"tar {compressTool} -cf \"{tarFName}\" -C \"{archivePath}\" .")
+        retVal = os.system(f"tar {compressTool} -cf {shlex.quote(tarFName)} -C {shlex.quote(archivePath)} .")
     else:
-        retVal = os.system(f"tar {compressTool} -cf \"{tarFName}\" \"{archivePath}\"")
+        retVal = os.system(f"tar {compressTool} -cf {shlex.quote(tarFName)} {shlex.quote(archivePath)}")
+
+    return retVal
+
+
+
+
+def DecodeCompression(compStr:str):
+    """Decodes the compression of an archive, e.g. "gz", "gz:1", "zst:9".
+
+    Args:
+        compStr (str): Method and optional level separated by ":"; "1"/"true" = gzip, "0"/"false" = uncompressed.
+
+    Raises:
+        Exception: For unknown methods or when zstd is requested without the zstandard-package.
+
+    Returns:
+        (str, int): Method (None = uncompressed) and level.
+    """
+    method, _, level = str(compStr).lower().partition(":")
+    if method in ("0", "false", "no", "n", "off", "none", ""):
+        return None, None
+    if method in ("1", "true", "yes", "y", "gzip"):
+        method = COMPRESS_GZIP
+    if method not in COMPRESSIONS:
+        raise Exception(f"DecodeCompression - Unknown compression \"{method}\" (supported: {COMPRESSIONS}).")
+    if method == COMPRESS_ZSTD and zstandard is None:
+        raise Exception("DecodeCompression - zstd needs the zstandard-package (pip install zstandard).")
+    return method, int(level) if level else COMPRESS_DEFAULT_LEVELS[method]
+
+
+def ArchiveExtension(method:str):
+    """Returns the file-extension of an archive with the given compression (".tar", ".tar.gz" or ".tar.zst")."""
+    return ".tar" + (f".{method}" if method else "")
+
+
+
+
+class ParallelGzipWriter:
+    """File-like gzip-compressor: The written data is cut into blocks which are compressed in parallel threads
+    (zlib releases the GIL) and written in order as consecutive gzip-members (like pigz --independent).
+    At most 2 blocks per thread are pending, so memory stays bounded.
+    """
+    def __init__(self, sink, level:int=6, nThreads:int=4, blockSize:int=GZIP_BLOCK_SIZE):
+        """Creates the compressor.
+
+        Args:
+            sink (file-like): Target of the compressed data (needs write()); it is not closed by close().
+            level (int, optional): Compression-level 1 (fast) ... 9 (small). Defaults to 6.
+            nThreads (int, optional): Amount of compression-threads. Defaults to 4.
+            blockSize (int, optional): Bytes per block. Defaults to GZIP_BLOCK_SIZE.
+        """
+        self.__sink__ = sink
+        self.__level__ = level
+        self.__blockSize__ = blockSize
+        self.__pool__ = ThreadPoolExecutor(max(1, nThreads), thread_name_prefix="GzipBlock")
+        self.__maxPending__ = 2 * max(1, nThreads)
+        self.__pending__ = deque()
+        self.__buf__ = bytearray()
+
+
+    def __Compress__(self, block:bytes):
+        comp = zlib.compressobj(self.__level__, zlib.DEFLATED, 16 + zlib.MAX_WBITS)    # gzip-container
+        return comp.compress(block) + comp.flush()
+
+
+    def __Submit__(self, block:bytes):
+        self.__pending__.append(self.__pool__.submit(self.__Compress__, block))
+        while self.__pending__ and (len(self.__pending__) > self.__maxPending__ or self.__pending__[0].done()):
+            self.__sink__.write(self.__pending__.popleft().result())
+
+
+    def write(self, data):
+        self.__buf__ += data
+        while len(self.__buf__) >= self.__blockSize__:
+            block = bytes(self.__buf__[:self.__blockSize__])
+            del self.__buf__[:self.__blockSize__]
+            self.__Submit__(block)
+        return len(data)
+
+
+    def close(self):
+        if self.__buf__:
+            self.__Submit__(bytes(self.__buf__))
+            self.__buf__ = bytearray()
+        while self.__pending__:
+            self.__sink__.write(self.__pending__.popleft().result())
+        self.__pool__.shutdown()
+
+
+
+
+class SocketSink:
+    """File-like target which sends the written bytes as length-prefixed chunks over a socket (see netframes.SendBytes).
+    close() sends the end of the stream; the client reads the chunks with netframes.RecvBytes.
+    """
+    def __init__(self, conn, chunkSize:int=SOCKET_CHUNK_SIZE):
+        self.__conn__ = conn
+        self.__chunkSize__ = chunkSize
+        self.__buf__ = bytearray()
+        self.nBytes = 0
+
+
+    def write(self, data):
+        self.__buf__ += data
+        if len(self.__buf__) >= self.__chunkSize__:
+            self.flush()
+        return len(data)
+
+
+    def flush(self):
+        self.nBytes += len(self.__buf__)
+        SendBytes(self.__conn__, self.__buf__)
+        self.__buf__ = bytearray()
+
+
+    def close(self):
+        self.flush()
+        SendEndOfFrames(self.__conn__)
+
+
+
+
+class TarArchiver:
+    """In-process tar-writer: Files are queued by Add() (e.g. right after the writer-stage saved them) and appended to
+    the tar-stream by a background-thread, so archiving overlaps with the capture. The stream is optionally compressed
+    (ParallelGzipWriter or zstd) and written into a file, a file-like object or over a socket (SocketSink).
+    """
+    def __init__(self, target, compress:str=None, level:int=None, nThreads:int=None, arcRoot:str=None, onArchived=None):
+        """Opens the archive.
+
+        Args:
+            target (str, socket or file-like): Target filepath, connected socket (or object with sendall()) or object with write().
+            compress (str, optional): COMPRESS_GZIP, COMPRESS_ZSTD or None (uncompressed). Defaults to None.
+            level (int, optional): Compression-level. Defaults to None (see COMPRESS_DEFAULT_LEVELS).
+            nThreads (int, optional): Compression-threads. Defaults to None (all cores).
+            arcRoot (str, optional): Names in the archive are relative to this folder. Defaults to None (basename).
+            onArchived (callable, optional): Is called as onArchived(path) after a file of Add() was appended. Defaults to None.
+        """
+        nThreads = os.cpu_count() if nThreads is None else max(1, int(nThreads))
+        level = COMPRESS_DEFAULT_LEVELS.get(compress) if level is None else level
+        self.arcRoot = arcRoot
+        self.__onArchived__ = onArchived
+        self.__ownSink__ = not hasattr(target, "write")
+        if isinstance(target, str):
+            self.__sink__ = open(target, "wb")
+        elif hasattr(target, "sendall") and not hasattr(target, "write"):  # Socket or socket-like (e.g. AsyncConnAdapter)
+            self.__sink__ = SocketSink(target)
+        else:
+            self.__sink__ = target
+
+        if compress == COMPRESS_GZIP:
+            self.__comp__ = ParallelGzipWriter(self.__sink__, level, nThreads)
+        elif compress == COMPRESS_ZSTD:
+            if zstandard is None:
+                raise Exception("TarArchiver - zstd needs the zstandard-package (pip install zstandard).")
+            cctx = zstandard.ZstdCompressor(level=level, threads=nThreads if nThreads > 1 else 0)
+            self.__comp__ = cctx.stream_writer(self.__sink__, closefd=False)
+        elif compress is None:
+            self.__comp__ = None
+        else:
+            raise Exception(f"TarArchiver - Unknown compression \"{compress}\" (supported: {COMPRESSIONS}).")
+        self.__tar__ = tarfile.open(fileobj=self.__comp__ if self.__comp__ is not None else self.__sink__, mode="w|", format=tarfile.PAX_FORMAT)
+
+        self.nFiles = 0
+        self.nBytes = 0                     # Uncompressed size of the archived files
+        self.__errors__ = []
+        self.__queue__ = Queue()
+        self.__thread__ = Thread(target=self.__AddLoop__, name="TarArchiver", daemon=True)
+        self.__thread__.start()
+
+
+    def __Count__(self, tarinfo:tarfile.TarInfo):
+        if tarinfo.isfile():
+            self.nFiles += 1
+            self.nBytes += tarinfo.size
+        return tarinfo
+
+
+    def __AddLoop__(self):
+        while True:
+            item = self.__queue__.get()
+            if item is None:
+                break
+            path, arcname, recursive = item
+            try:
+                self.__tar__.add(path, arcname=arcname, recursive=recursive, filter=self.__Count__)
+                if self.__onArchived__ is not None and not recursive:
+                    self.__onArchived__(path)
+            except Exception as e:
+                self.__errors__.append(e)
+
+
+    def __RaiseErrors__(self):
+        if self.__errors__:
+            raise self.__errors__[0]
+
+
+    def Add(self, path:str, arcname:str=None):
+        """Queues a file for the archive (returns immediately).
+
+        Args:
+            path (str): Filepath.
+            arcname (str, optional): Name in the archive. Defaults to None (relative to arcRoot or basename).
+        """
+        self.__RaiseErrors__()
+        if arcname is None:
+            arcname = relpath(path, self.arcRoot) if self.arcRoot is not None else basename(path)
+        self.__queue__.put((path, arcname, False))
+
+
+    def AddFolder(self, folderPath:str, suppressParents:bool=True):
+        """Queues a folder with all its contents.
+
+        Args:
+            folderPath (str): Folder which gets archived.
+            suppressParents (bool, optional): Only the contents ("./...") without the folder itself. Defaults to True.
+        """
+        self.__RaiseErrors__()
+        self.__queue__.put((folderPath, "." if suppressParents else basename(os.path.normpath(folderPath)), True))
+
+
+    def Status(self):
+        """Returns the progress: archived files, their bytes and queued entries."""
+        return {"files": self.nFiles, "bytes": self.nBytes, "queued": self.__queue__.qsize()}
+
+
+    def Close(self):
+        """Waits until all queued files are appended and finishes the archive (compression flushed, socket-stream ended).
+
+        Raises:
+            Exception: The first error of the background-thread.
+        """
+        self.__queue__.put(None)
+        self.__thread__.join()
+        self.__tar__.close()
+        if self.__comp__ is not None:
+            self.__comp__.close()
+        if self.__ownSink__:
+            self.__sink__.close()
+        self.__RaiseErrors__()
+
+
+
+
+def ArchiveFolder(archivePath:str, tarFName:str, compress=True, multicore=True, suppressParents=True):
+    """Archives a folder in-process (see TarArchiver).
+
+    Args:
+        archivePath (str): Folder which gets archived.
+        tarFName (str): Target archive filename.
+        compress (bool or str, optional): True = gzip or a compression like "gz:1"/"zst" (see DecodeCompression). Defaults to True.
+        multicore (bool, optional): Compress with all cores. Defaults to True.
+        suppressParents (bool, optional): Only archive the folder-contents. Defaults to True.
 
-    return retVal
\ No newline at end of file
+    Returns:
+        int: 0 on success (like the former tar-call).
+    """
+    method, level = DecodeCompression(compress)
+    archiver = TarArchiver(tarFName, method, level, nThreads=None if multicore else 1)
+    archiver.AddFolder(archivePath, suppressParents)
+    archiver.Close()
+    return 0
@@ -0,0 +1,234 @@
+import numpy as np
+
+from _libHQCam2.unpack import BITDEPTH_SRGGB12, SATURATION_SRGGB12, BAYER_PLANES, UnpackSRGGB12Plane
+
+
+
+# Reductions of a binning-block
+BIN_SUM = "sum"                     # Sum of the pixels (needs a wider dtype for large factors)
+BIN_MEAN = "mean"                   # Mean of the pixels (rounded down, keeps the bit-depth)
+BIN_MAX = "max"                     # Maximum of the pixels
+BIN_REDUCTIONS = (BIN_SUM, BIN_MEAN, BIN_MAX)
+
+
+
+
+def BinnedShape(shape:tuple, fy:int, fx:int):
+    """Returns the shape after binning (residual rows/columns which don't fill a block are cut off).
+
+    Args:
+        shape (tuple): Shape (height, width) of the source.
+        fy (int): Binning-factor in y.
+        fx (int): Binning-factor in x.
+
+    Returns:
+        (int, int): Binned height and width.
+    """
+    return shape[0] // fy, shape[1] // fx
+
+
+def BinnedBitDepth(fy:int, fx:int, reduction:str=BIN_SUM, bitDepth:int=BITDEPTH_SRGGB12):
+    """Returns the bit-depth of the binned values.
+
+    Args:
+        fy (int): Binning-factor in y.
+        fx (int): Binning-factor in x.
+        reduction (str, optional): BIN_SUM, BIN_MEAN or BIN_MAX. Defaults to BIN_SUM.
+        bitDepth (int, optional): Bit-depth of the source-values. Defaults to BITDEPTH_SRGGB12.
+
+    Returns:
+        int: Bits which are needed for the binned values.
+    """
+    if reduction != BIN_SUM:
+        return bitDepth
+    return bitDepth + int(np.ceil(np.log2(fy * fx)))
+
+
+def BinDtype(fy:int, fx:int, reduction:str=BIN_SUM, bitDepth:int=BITDEPTH_SRGGB12):
+    """Returns the smallest unsigned dtype which holds the binned values without overflow.
+
+    Args:
+        fy (int): Binning-factor in y.
+        fx (int): Binning-factor in x.
+        reduction (str, optional): BIN_SUM, BIN_MEAN or BIN_MAX. Defaults to BIN_SUM.
+        bitDepth (int, optional): Bit-depth of the source-values. Defaults to BITDEPTH_SRGGB12.
+
+    Returns:
+        np.dtype: uint16, uint32 or uint64.
+    """
+    bits = BinnedBitDepth(fy, fx, reduction, bitDepth)
+    for _dtype in (np.uint16, np.uint32, np.uint64):
+        if bits <= np.iinfo(_dtype).bits:
+            return np.dtype(_dtype)
+    raise Exception(f"BinDtype - {bits} bits exceed uint64.")
+
+
+
+
+class Binner:
+    """Bins 2D-arrays by arbitrary integer factors without intermediate images per 2x2-step.
+    The fy rows of a block are accumulated into a row-buffer first (fy passes over contiguous rows), then its fx columns
+    into the result (fx strided passes over the fy-times smaller row-buffer). This is much faster than reducing the small
+    axes of a (h, fy, w, fx)-view directly.
+    Blocks which contain a saturated pixel are marked with satValue (saturation propagation).
+    All buffers are allocated once, so one Binner should be used per thread.
+    """
+    def __init__(self, shape:tuple, fy:int, fx:int=None, reduction:str=BIN_SUM, dtype=None,
+                 satLevel:int=SATURATION_SRGGB12, satValue:int=None, bitDepth:int=BITDEPTH_SRGGB12):
+        """Creates the binner.
+
+        Args:
+            shape (tuple): Shape (height, width) of the source.
+            fy (int): Binning-factor in y.
+            fx (int, optional): Binning-factor in x. Defaults to None (= fy).
+            reduction (str, optional): BIN_SUM, BIN_MEAN or BIN_MAX. Defaults to BIN_SUM.
+            dtype (np.dtype, optional): Data-type of the result. Defaults to None (see BinDtype).
+            satLevel (int, optional): Source-values >= satLevel are saturated. Defaults to SATURATION_SRGGB12 (None: no saturation-marking).
+            satValue (int, optional): Marker of saturated blocks. Defaults to None (maximum of dtype).
+            bitDepth (int, optional): Bit-depth of the source-values. Defaults to BITDEPTH_SRGGB12.
+        """
+        fx = fy if fx is None else fx
+        if fy < 1 or fx < 1:
+            raise Exception(f"Binner - Factors must be >= 1 (got {fy}x{fx}).")
+        if reduction not in BIN_REDUCTIONS:
+            raise Exception(f"Binner - Unknown reduction \"{reduction}\" (supported: {BIN_REDUCTIONS}).")
+        self.fy = int(fy)
+        self.fx = int(fx)
+        self.reduction = reduction
+        self.shape = BinnedShape(shape, self.fy, self.fx)
+        self.dtype = np.dtype(dtype) if dtype is not None else BinDtype(self.fy, self.fx, reduction, bitDepth)
+        self.bitDepth = min(BinnedBitDepth(self.fy, self.fx, reduction, bitDepth), self.dtype.itemsize * 8)
+        self.satLevel = satLevel
+        self.satValue = satValue if satValue is not None else np.iinfo(self.dtype).max
+
+        h, w = self.shape
+        rowDtype = BinDtype(self.fy, 1, BIN_SUM, bitDepth) if reduction != BIN_MAX else np.uint16
+        self.__rowAcc__ = np.empty((h, w * self.fx), dtype=rowDtype)                     # Rows of a block combined
+        self.__acc__ = np.empty(self.shape, dtype=BinDtype(self.fy, self.fx, BIN_SUM, bitDepth)) if reduction == BIN_MEAN else None
+        self.__rowMax__ = None
+        self.__rowSat__ = None
+        self.__mask__ = None
+        if satLevel is not None:
+            self.__rowMax__ = np.empty((h, w * self.fx), dtype=np.uint16) if reduction != BIN_MAX else None
+            self.__rowSat__ = np.empty((h, w * self.fx), dtype=bool)
+            self.__mask__ = np.empty(self.shape, dtype=bool)
+
+
+    def __Reduce__(self, ufunc, arr:np.ndarray, rowBuf:np.ndarray, out:np.ndarray):
+        # Rows of each block into rowBuf (contiguous rows), then the columns of rowBuf into out (strided)
+        H, W = self.shape[0] * self.fy, self.shape[1] * self.fx
+        self.__Combine__(ufunc, [arr[_jy:H:self.fy, :W] for _jy in range(self.fy)], rowBuf)
+        if out is None:
+            return rowBuf
+        return self.__Combine__(ufunc, [rowBuf[:, _jx:W:self.fx] for _jx in range(self.fx)], out)
+
+
+    def __Combine__(self, ufunc, views:list, out:np.ndarray):
+        # The first two views are combined directly into out (saves the initial copy); computed in the dtype of out
+        if len(views) == 1:
+            np.copyto(out, views[0], casting="unsafe")
+            return out
+        ufunc(views[0], views[1], out=out, dtype=out.dtype, casting="unsafe")
+        for _v in views[2:]:
+            ufunc(out, _v, out=out, dtype=out.dtype, casting="unsafe")
+        return out
+
+
+    def __SatMask__(self, arr:np.ndarray):
+        # Maximum over the rows of each block, compared once, then OR over the columns (1 byte per value)
+        W = self.shape[1] * self.fx
+        rowMax = self.__Reduce__(np.maximum, arr, self.__rowMax__, None) if self.__rowMax__ is not None else self.__rowAcc__
+        np.greater_equal(rowMax, self.satLevel, out=self.__rowSat__)
+        return self.__Combine__(np.logical_or, [self.__rowSat__[:, _jx:W:self.fx] for _jx in range(self.fx)], self.__mask__)
+
+
+    def Bin(self, arr:np.ndarray, out:np.ndarray=None):
+        """Bins a 2D-array.
+
+        Args:
+            arr (np.ndarray): Source (height, width), e.g. an unpacked mosaic.
+            out (np.ndarray, optional): Preallocated result (shape, dtype). Defaults to None (allocated).
+
+        Returns:
+            np.ndarray: Binned result.
+        """
+        out = np.empty(self.shape, dtype=self.dtype) if out is None else out
+        if self.reduction == BIN_SUM:
+            self.__Reduce__(np.add, arr, self.__rowAcc__, out)
+        elif self.reduction == BIN_MEAN:
+            self.__Reduce__(np.add, arr, self.__rowAcc__, self.__acc__)
+            np.floor_divide(self.__acc__, self.fy * self.fx, out=out, casting="unsafe")
+        else:
+            self.__Reduce__(np.maximum, arr, self.__rowAcc__, out)
+
+        if self.__mask__ is not None:       # Mark blocks which contain a saturated pixel
+            np.copyto(out, self.satValue, where=self.__SatMask__(arr), casting="unsafe")
+        return out
+
+
+
+
+class BayerBinner:
+    """Bins the four colour-planes (R, Gr, Gb, B) of packed SRGGB12-data separately, so no colours are mixed.
+    Each plane is decoded directly from the packed bytes into a plane-sized buffer and binned by f x f plane-pixels
+    (= 2f x 2f sensor-pixels); the full 16-bit mosaic is never built.
+    With luminance, the four binned planes are combined into one plane (sum, mean or max of R, Gr, Gb and B).
+    """
+    def __init__(self, pxShape:tuple, f:int, reduction:str=BIN_SUM, luminance:bool=False, satLevel:int=SATURATION_SRGGB12):
+        """Creates the binner.
+
+        Args:
+            pxShape (tuple): Shape (height, width) of the mosaic in pixels.
+            f (int): Binning-factor per plane in y and x.
+            reduction (str, optional): BIN_SUM, BIN_MEAN or BIN_MAX. Defaults to BIN_SUM.
+            luminance (bool, optional): Combine the planes into one luminance-plane. Defaults to False.
+            satLevel (int, optional): Source-values >= satLevel are saturated. Defaults to SATURATION_SRGGB12.
+        """
+        self.planeShape = (pxShape[0] // 2, pxShape[1] // 2)
+        self.luminance = luminance
+        self.reduction = reduction
+        nPlanes = len(BAYER_PLANES)
+        fLum = nPlanes if luminance and reduction == BIN_SUM else 1          # Summing the planes needs 2 bits more
+        self.dtype = BinDtype(f * fLum, f, reduction)
+        self.__binner__ = Binner(self.planeShape, f, f, reduction, dtype=self.dtype, satLevel=satLevel)
+        self.bitDepth = BinnedBitDepth(f * fLum, f, reduction)
+        self.satValue = self.__binner__.satValue
+        self.shape = self.__binner__.shape if luminance else (nPlanes,) + self.__binner__.shape
+        self.__plane__ = np.empty(self.planeShape, dtype=np.uint16)
+        self.__scratch__ = np.empty(self.planeShape, dtype=np.uint8)
+        self.__binned__ = np.empty(self.__binner__.shape, dtype=self.dtype) if luminance else None
+        self.__sat__ = np.empty(self.__binner__.shape, dtype=bool) if luminance else None
+
+
+    def Bin(self, packed:np.ndarray, out:np.ndarray=None):
+        """Bins the colour-planes of packed data.
+
+        Args:
+            packed (np.ndarray): uint8 packed bayer-data (height, width*1.5), starting on an even row and a 3-byte boundary.
+            out (np.ndarray, optional): Preallocated result (shape, dtype). Defaults to None (allocated).
+
+        Returns:
+            np.ndarray: Binned planes (4, h, w) in order of BAYER_PLANES or the luminance-plane (h, w).
+        """
+        out = np.empty(self.shape, dtype=self.dtype) if out is None else out
+        for _iPlane in range(len(BAYER_PLANES)):
+            plane = UnpackSRGGB12Plane(packed, _iPlane, out=self.__plane__, scratch=self.__scratch__)
+            if not self.luminance:
+                self.__binner__.Bin(plane, out=out[_iPlane])
+                continue
+
+            binned = self.__binner__.Bin(plane, out=self.__binned__ if _iPlane > 0 else out)
+            if _iPlane == 0:
+                np.equal(out, self.satValue, out=self.__sat__)
+                continue
+            np.logical_or(self.__sat__, binned == self.satValue, out=self.__sat__)
+            if self.reduction == BIN_MAX:
+                np.maximum(out, binned, out=out)
+            else:
+                np.add(out, binned, out=out)
+
+        if self.luminance:
+            if self.reduction == BIN_MEAN:
+                np.floor_divide(out, len(BAYER_PLANES), out=out)
+            np.copyto(out, self.satValue, where=self.__sat__)    # Saturated in any plane -> saturated
+        return out
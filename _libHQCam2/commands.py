@@ -0,0 +1,169 @@
+from time import perf_counter
+from threading import Lock
+
+from _libHQCam2.Logger import LogLineLeftRight
+
+
+
+REQUIRED = object()                             # Marker for arguments without default-value
+VARARGS = "*"                                   # Argument-name which gets the entire payload (list)
+HIST_BOUNDS = [1e-3, 1e-2, 1e-1, 1e0, 1e1, 1e2] # Upper bounds [s] of the latency-histogram bins (last bin: >= 100s)
+
+
+
+
+class Arg:
+    """Argument of a command: Name of the handler-parameter, converter of the received string and optional default."""
+    def __init__(self, name:str, conv=None, default=REQUIRED):
+        self.name = name
+        self.conv = conv
+        self.default = default
+
+
+
+
+class Command:
+    """Entry of the CommandTable."""
+    def __init__(self, name:str, handler, args:list=None, readOnly:bool=False, connArg:str=None, fixed:dict=None, replyFunc=None):
+        self.name = name
+        self.handler = handler
+        self.args = [_a if isinstance(_a, Arg) else Arg(_a) for _a in (args if args is not None else [])]
+        self.readOnly = readOnly        # True: Neither camera nor server-settings are changed (can run anytime)
+        self.connArg = connArg          # Name of the handler-parameter which gets the client-connection
+        self.fixed = fixed if fixed is not None else {}
+        self.replyFunc = replyFunc      # Converts the return-value of the handler into the response
+
+
+    def BuildKwargs(self, payload:list, conn):
+        kwargs = dict(self.fixed)
+        for _iArg, _arg in enumerate(self.args):
+            if _arg.name == VARARGS:
+                return [payload], kwargs
+            if _iArg < len(payload):
+                val = payload[_iArg]
+                kwargs[_arg.name] = _arg.conv(val) if _arg.conv is not None else val
+            elif _arg.default is not REQUIRED:
+                kwargs[_arg.name] = _arg.default
+            else:
+                raise Exception(f"{self.name} - Missing argument \"{_arg.name}\" ({len(payload)} of {len(self.args)} given).")
+        if self.connArg is not None:
+            kwargs[self.connArg] = conn
+        return [], kwargs
+
+
+
+
+class CommandStats:
+    """Call-count, error-count and latency-histogram of a command."""
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.hist = [0] * (len(HIST_BOUNDS) + 1)
+
+
+    def Add(self, dt:float, failed:bool):
+        self.count += 1
+        self.errors += int(failed)
+        self.total += dt
+        self.max = max(self.max, dt)
+        iBin = 0
+        while iBin < len(HIST_BOUNDS) and dt >= HIST_BOUNDS[iBin]:
+            iBin += 1
+        self.hist[iBin] += 1
+
+
+    def __str__(self):
+        mean = self.total / self.count if self.count else 0.0
+        return f"n={self.count} err={self.errors} tot={self.total:.3f}s mean={mean:.3f}s max={self.max:.3f}s hist={'/'.join(str(_h) for _h in self.hist)}"
+
+
+
+
+class CommandTable:
+    """Registered commands of the server. Dispatch() converts the arguments, calls the handler and records
+    count, errors and latency per command.
+    """
+    def __init__(self, UnknownReply:str="Unknown Command"):
+        self.__cmds__ = {}
+        self.__stats__ = {}
+        self.__lock__ = Lock()          # Dispatch is called from the event-loop and the camera-thread
+        self.__unknownReply__ = UnknownReply
+
+
+    def Register(self, name:str, handler, args:list=None, readOnly:bool=False, connArg:str=None, fixed:dict=None, replyFunc=None):
+        """Registers a command.
+
+        Args:
+            name (str): Command as received (e.g. "CAM:CONF:SS").
+            handler (callable): Function which is executed.
+            args (list, optional): Positional payload-arguments as Arg or parameter-name (str). VARARGS passes the entire payload. Defaults to None (no arguments).
+            readOnly (bool, optional): True when the command neither changes the camera nor server-settings. Defaults to False.
+            connArg (str, optional): Name of the handler-parameter which gets the client-connection. Defaults to None.
+            fixed (dict, optional): Further keyword-arguments which are always passed. Defaults to None.
+            replyFunc (callable, optional): Converts the return-value into the response. Defaults to None (return-value is the response).
+        """
+        self.__cmds__[name] = Command(name, handler, args, readOnly, connArg, fixed, replyFunc)
+
+
+    def ReadOnlyCmds(self):
+        return [_name for _name, _cmd in self.__cmds__.items() if _cmd.readOnly]
+
+
+    def Dispatch(self, cmd:str, payload:list, conn=None):
+        """Executes a command and records its statistics.
+
+        Args:
+            cmd (str): Command.
+            payload (list): Arguments (str).
+            conn (socket, optional): Client-connection. Defaults to None.
+
+        Raises:
+            Exception: Exceptions of the handler are recorded and passed on.
+
+        Returns:
+            str: Response for the client.
+        """
+        command = self.__cmds__.get(cmd)
+        if command is None:
+            self.__Record__("<unknown>", 0.0, False)
+            return self.__unknownReply__
+
+        start = perf_counter()
+        failed = True
+        try:
+            args, kwargs = command.BuildKwargs(payload, conn)
+            reply = command.handler(*args, **kwargs)
+            if command.replyFunc is not None:
+                reply = command.replyFunc(reply)
+            failed = False
+        finally:
+            self.__Record__(cmd, perf_counter() - start, failed)
+        return reply
+
+
+    def __Record__(self, cmd:str, dt:float, failed:bool):
+        with self.__lock__:
+            if cmd not in self.__stats__:
+                self.__stats__[cmd] = CommandStats()
+            self.__stats__[cmd].Add(dt, failed)
+
+
+    def Stats(self):
+        """Returns the statistics of all called commands in one line.
+
+        Returns:
+            str: "<cmd> n=<count> err=<errors> tot=<s> mean=<s> max=<s> hist=<bins>;..." sorted by total time;
+                 hist-bins: <1ms/<10ms/<100ms/<1s/<10s/<100s/>=100s
+        """
+        with self.__lock__:
+            items = sorted(self.__stats__.items(), key=lambda _i: _i[1].total, reverse=True)
+            return ";".join([f"{_cmd} {_stats}" for _cmd, _stats in items])
+
+
+    def LogStats(self):
+        with self.__lock__:
+            items = sorted(self.__stats__.items(), key=lambda _i: _i[1].total, reverse=True)
+            for _cmd, _stats in items:
+                LogLineLeftRight(f"Stats {_cmd}:", str(_stats))
@@ -0,0 +1,105 @@
+import struct
+import numpy as np
+
+from _libHQCam2.rawfile import RawHeader, RAWFILE_HEADER_SIZE
+
+
+
+# Frame on the wire (little endian):
+#  [uint32 length of header + pixel-data][RawHeader (RAWFILE_HEADER_SIZE bytes)][Contiguous pixel-data]
+# A length of 0 marks the end of the frame-stream. Afterwards the usual text-response of the command follows.
+# Byte-streams (e.g. an archive, see SendBytes) use the same framing without the RawHeader: [uint32 length][bytes]
+__lenStruct__ = struct.Struct("<I")
+
+
+
+
+def SendFrame(conn, arr:np.ndarray, meta:dict=None, **kwargs):
+    """Sends an array as length-prefixed frame. The pixel-data is sent from the array-buffer without copy.
+
+    Args:
+        conn (socket): Connected socket.
+        arr (np.ndarray): Pixel-data (C-contiguous to avoid a copy).
+        meta (dict, optional): picamera2-metadata for the header. Defaults to None.
+        **kwargs: Further header-fields (bitDepth, layout, clipWin, binning).
+
+    Returns:
+        int: Amount of sent bytes.
+    """
+    arr = np.ascontiguousarray(arr)
+    hdr = RawHeader.FromArray(arr, meta, **kwargs).Pack()
+    conn.sendall(__lenStruct__.pack(len(hdr) + arr.nbytes) + hdr)
+    conn.sendall(memoryview(arr).cast("B"))
+    return __lenStruct__.size + len(hdr) + arr.nbytes
+
+
+def SendBytes(conn, data):
+    """Sends a chunk of a byte-stream as length-prefixed frame (without RawHeader).
+
+    Args:
+        conn (socket): Connected socket.
+        data (bytes-like): Chunk (empty chunks are skipped, as length 0 marks the end of the stream).
+
+    Returns:
+        int: Amount of sent bytes.
+    """
+    data = memoryview(data).cast("B")
+    if len(data) == 0:
+        return 0
+    conn.sendall(__lenStruct__.pack(len(data)))
+    conn.sendall(data)
+    return __lenStruct__.size + len(data)
+
+
+def SendEndOfFrames(conn):
+    """Marks the end of the frame-stream.
+
+    Args:
+        conn (socket): Connected socket.
+    """
+    conn.sendall(__lenStruct__.pack(0))
+
+
+
+
+def __RecvInto__(conn, buf):
+    view = memoryview(buf).cast("B")
+    while len(view):
+        nRcvd = conn.recv_into(view)
+        if nRcvd == 0:
+            raise ConnectionError("RecvFrame - Connection closed.")
+        view = view[nRcvd:]
+    return buf
+
+
+def RecvFrame(conn):
+    """Receives one frame of the stream (counterpart of SendFrame for the client-side).
+
+    Args:
+        conn (socket): Connected socket.
+
+    Returns:
+        (np.ndarray, RawHeader): Pixel-data and header, or (None, None) at the end of the frame-stream.
+    """
+    nBytes = __lenStruct__.unpack(__RecvInto__(conn, bytearray(__lenStruct__.size)))[0]
+    if nBytes == 0:
+        return None, None
+    hdr = RawHeader.Unpack(bytes(__RecvInto__(conn, bytearray(RAWFILE_HEADER_SIZE))))
+    arr = np.empty(hdr.shape, dtype=hdr.dtype)
+    __RecvInto__(conn, arr)                         # Receive the pixel-data directly into the array
+    return arr, hdr
+
+
+def RecvBytes(conn):
+    """Receives one chunk of a byte-stream (counterpart of SendBytes for the client-side).
+
+    Args:
+        conn (socket): Connected socket.
+
+    Returns:
+        bytearray: Chunk or None at the end of the stream.
+    """
+    nBytes = __lenStruct__.unpack(__RecvInto__(conn, bytearray(__lenStruct__.size)))[0]
+    if nBytes == 0:
+        return None
+    return __RecvInto__(conn, bytearray(nBytes))
@@ -0,0 +1,218 @@
+from time import time
+from queue import Queue
+from threading import Thread, Lock
+
+import numpy as np
+
+from _libHQCam2.misc import duration
+from _libHQCam2.procpool import SharedArray
+
+
+
+class PipelineFrame:
+    """Container of one captured frame on its way through the CapturePipeline."""
+    def __init__(self, raw, meta, fName:str, iSS:int=0, iPic:int=0, tSS:int=0, dCap:float=0.0):
+        self.raw = raw                  # Captured (packed) raw-array
+        self.meta = meta                # Metadata of the capture-request
+        self.fName = fName              # Target filepath
+        self.iSS = iSS                  # Index of the shutterspeed in the sequence
+        self.iPic = iPic                # Index of the picture for the shutterspeed
+        self.tSS = tSS                  # Target shutterspeed
+        self.result = None              # Post-processed data which gets saved
+        self.iSlot = None               # Index of the FrameSlots-slot which holds the result
+        self.out = None                 # Preallocated output (slot) for the post-processing
+        self.dCap = dCap                # Duration of the capture
+        self.dPostProcessing = 0.0      # Duration of the post-processing
+        self.dSav = 0.0                 # Duration of saving
+
+
+
+
+class FrameSlots:
+    """Preallocated block of result-slots (nSlots, height, width). A slot is acquired by the post-processing,
+    filled in place and released after it was saved. The block is reused for all shutterspeeds (and sequences)
+    with the same shape, so no per-frame result is allocated.
+    With shared, the block lies in shared memory, so worker-processes can fill the slots (see _libHQCam2.procpool).
+    """
+    def __init__(self, nSlots:int, shape:tuple, dtype=np.uint16, shared:bool=False):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.__shared__ = SharedArray((nSlots,) + self.shape, self.dtype) if shared else None
+        self.Block = self.__shared__.Array if shared else np.empty((nSlots,) + self.shape, dtype=self.dtype)
+        self.__free__ = Queue()
+        for _iSlot in range(nSlots):
+            self.__free__.put(_iSlot)
+
+
+    def __len__(self):
+        return self.Block.shape[0]
+
+
+    def __getitem__(self, iSlot:int):
+        return self.Block[iSlot]
+
+
+    @property
+    def Shared(self):
+        return self.__shared__ is not None
+
+
+    def Spec(self):
+        """Returns the SharedArray-spec of the block (only for shared slots)."""
+        return self.__shared__.Spec()
+
+
+    def Close(self):
+        """Releases the shared memory of the block (no-op for local slots)."""
+        if self.__shared__ is not None:
+            self.Block = None
+            self.__shared__.Close()
+            self.__shared__ = None
+
+
+    def Matches(self, nSlots:int, shape:tuple, dtype=np.uint16, shared:bool=False):
+        """Checks if the block can be reused for the given layout.
+
+        Returns:
+            bool: True when amount of slots, shape, dtype and the shared memory are equal.
+        """
+        return len(self) == nSlots and self.shape == tuple(shape) and self.dtype == np.dtype(dtype) and self.Shared == shared
+
+
+    def Acquire(self):
+        """Grabs a free slot. Blocks until one is released.
+
+        Returns:
+            int: Index of the slot.
+        """
+        return self.__free__.get()
+
+
+    def Release(self, iSlot:int):
+        self.__free__.put(iSlot)
+
+
+
+
+class CapturePipeline:
+    """Producer/consumer pipeline: Capture -> Post-processing -> Save.
+    The capturing thread submits frames into a bounded queue. Worker-threads post-process them (NumPy releases the GIL)
+    and hand them over to a single writer-thread. This way the camera can already settle on the next shutterspeed while
+    the previous frames are processed and written.
+    """
+    __stop__ = None     # Sentinel to shut down the stages
+
+    def __init__(self, PostProcessFunc, SaveFunc, nWorkers:int=2, QueueLen:int=4, Slots:FrameSlots=None):
+        """Creates the pipeline (call Start() to run it).
+
+        Args:
+            PostProcessFunc (callable): Is called as PostProcessFunc(frame) and has to return the data which gets saved.
+                                        When Slots are used, frame.out is the slot which has to be filled.
+            SaveFunc (callable): Is called as SaveFunc(frame) and has to write frame.result to frame.fName.
+            nWorkers (int, optional): Amount of post-processing threads. Defaults to 2.
+            QueueLen (int, optional): Maximum amount of frames waiting in each queue (back-pressure for the capture). Defaults to 4.
+            Slots (FrameSlots, optional): Preallocated result-slots. Defaults to None (PostProcessFunc allocates the results).
+        """
+        self.__postProcess__ = PostProcessFunc
+        self.__save__ = SaveFunc
+        self.__slots__ = Slots
+        self.__nWorkers__ = max(1, int(nWorkers))
+        self.__qPost__ = Queue(maxsize=QueueLen)
+        self.__qSave__ = Queue(maxsize=QueueLen)
+        self.__errLock__ = Lock()
+        self.__errors__ = []
+        self.Frames = []                # Finished frames (in order of saving)
+
+
+    def Start(self):
+        self.__workers__ = [Thread(target=self.__PostProcessLoop__, name=f"PostProcess{_i}", daemon=True) for _i in range(self.__nWorkers__)]
+        self.__writer__ = Thread(target=self.__SaveLoop__, name="Writer", daemon=True)
+        for _t in self.__workers__ + [self.__writer__]:
+            _t.start()
+        return self
+
+
+    def Submit(self, frame:PipelineFrame):
+        """Hands a captured frame over to the post-processing stage. Blocks when the queue is full.
+
+        Args:
+            frame (PipelineFrame): Captured frame.
+        """
+        self.__RaiseErrors__()
+        self.__qPost__.put(frame)
+
+
+    def Join(self):
+        """Waits until all submitted frames are saved and stops the stage-threads.
+
+        Raises:
+            Exception: The first exception which occured inside one of the stages.
+
+        Returns:
+            list: Finished frames.
+        """
+        for _ in self.__workers__:
+            self.__qPost__.put(self.__stop__)
+        for _t in self.__workers__:
+            _t.join()
+        self.__qSave__.put(self.__stop__)
+        self.__writer__.join()
+        self.__RaiseErrors__()
+        return self.Frames
+
+
+    def __StoreError__(self, e):
+        with self.__errLock__:
+            self.__errors__.append(e)
+
+
+    def __RaiseErrors__(self):
+        with self.__errLock__:
+            if self.__errors__:
+                raise self.__errors__[0]
+
+
+    def __ReleaseSlot__(self, frame:PipelineFrame):
+        frame.result = None
+        frame.out = None
+        if frame.iSlot is not None:
+            self.__slots__.Release(frame.iSlot)
+            frame.iSlot = None
+
+
+    def __PostProcessLoop__(self):
+        while True:
+            frame = self.__qPost__.get()
+            if frame is self.__stop__:
+                break
+            try:
+                if self.__slots__ is not None:
+                    frame.iSlot = self.__slots__.Acquire()      # Blocks until the writer released a slot
+                    frame.out = self.__slots__[frame.iSlot]
+                sPostProcessing = time()
+                frame.result = self.__postProcess__(frame)
+                frame.raw = None            # Release the captured data as early as possible
+                frame.dPostProcessing = duration(sPostProcessing)
+                print(f"PostProcessing {frame.fName} took {frame.dPostProcessing:.3f}")
+            except Exception as e:
+                self.__ReleaseSlot__(frame)
+                self.__StoreError__(e)
+                continue
+            self.__qSave__.put(frame)
+
+
+    def __SaveLoop__(self):
+        while True:
+            frame = self.__qSave__.get()
+            if frame is self.__stop__:
+                break
+            try:
+                sSav = time()
+                self.__save__(frame)
+                frame.dSav = duration(sSav)
+                print(f"Saving {frame.fName} took {frame.dSav:.3f}")
+                self.Frames.append(frame)
+            except Exception as e:
+                self.__StoreError__(e)
+            finally:
+                self.__ReleaseSlot__(frame)
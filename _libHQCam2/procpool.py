@@ -0,0 +1,261 @@
+from itertools import count
+from threading import Thread, Lock, Event
+from multiprocessing import get_context, shared_memory
+import numpy as np
+
+from _libHQCam2.unpack import SRGGB12Unpacker
+from _libHQCam2.binning import Binner, BIN_SUM
+
+
+
+# Distribution of a frame over the worker-processes
+SPLIT_FRAMES = "frames"             # Every frame is processed by one worker (parallel over frames, needs concurrent callers)
+SPLIT_ROWS = "rows"                 # Every frame is split into row-bands over all workers
+POOL_SPLITS = (SPLIT_FRAMES, SPLIT_ROWS)
+
+# The server-script has no __main__-guard, so "spawn"/"forkserver" would run it again in every worker.
+# Forked workers only run NumPy on shared memory (no camera, no logging).
+POOL_START_METHOD = "fork"
+POOL_POLL_INTERVAL = 1.0            # Seconds between the liveness-checks of the workers while Run() waits
+
+__attached__ = {}                   # Shared arrays attached by this process (name: SharedArray)
+
+
+
+
+class SharedArray:
+    """NumPy-array in shared memory. Other processes attach to it via Spec() (see AttachShared), so arrays are
+    exchanged by name instead of pickling the data.
+    """
+    def __init__(self, shape:tuple, dtype=np.uint8, name:str=None, create:bool=True):
+        """Creates the array (or attaches to an existing one).
+
+        Args:
+            shape (tuple): Shape of the array.
+            dtype (np.dtype, optional): Data-type. Defaults to np.uint8.
+            name (str, optional): Name of the shared memory. Defaults to None (generated).
+            create (bool, optional): False: Attach to the existing shared memory "name". Defaults to True.
+        """
+        self.shape = tuple(int(_s) for _s in shape)
+        self.dtype = np.dtype(dtype)
+        nBytes = max(1, int(np.prod(self.shape)) * self.dtype.itemsize)
+        self.__shm__ = shared_memory.SharedMemory(name=name, create=create, size=nBytes if create else 0)
+        self.__owner__ = create
+        self.Array = np.ndarray(self.shape, dtype=self.dtype, buffer=self.__shm__.buf)
+
+
+    @property
+    def Name(self):
+        return self.__shm__.name
+
+
+    def Spec(self):
+        """Returns the picklable description (name, shape, dtype-string) of the array."""
+        return self.Name, self.shape, self.dtype.str
+
+
+    def Close(self):
+        """Releases the shared memory (and removes it, when it was created by this instance)."""
+        self.Array = None
+        self.__shm__.close()
+        if self.__owner__:
+            self.__shm__.unlink()
+
+
+
+
+def AttachShared(spec:tuple):
+    """Returns the array of a SharedArray-spec (attached once per process and cached).
+
+    Args:
+        spec (tuple): See SharedArray.Spec.
+
+    Returns:
+        np.ndarray: Array in shared memory.
+    """
+    name, shape, dtype = spec
+    arr = __attached__.get(name)
+    if arr is None:
+        arr = SharedArray(shape, dtype, name=name, create=False)
+        __attached__[name] = arr
+    return arr.Array
+
+
+def DetachShared():
+    """Closes all arrays attached by AttachShared."""
+    for _arr in __attached__.values():
+        _arr.Close()
+    __attached__.clear()
+
+
+def RowBands(nRows:int, nBands:int):
+    """Splits rows into nBands contiguous bands of (almost) equal size.
+
+    Returns:
+        list: (first, last exclusive) row per band (empty bands are omitted).
+    """
+    bounds = [nRows * _i // nBands for _i in range(nBands + 1)]
+    return [(_r0, _r1) for _r0, _r1 in zip(bounds[:-1], bounds[1:]) if _r1 > _r0]
+
+
+
+
+class UnpackBinTask:
+    """Task of the ProcessPool: Unpacks packed SRGGB12-rows of a shared input-slot and bins them (fy x fx) into a
+    shared output-slot. A band is given in rows of the output, so each worker unpacks only its fy*rows input-rows.
+    Buffers are allocated per band-height on first use in the worker.
+    """
+    def __init__(self, srcSpec:tuple, dstSpec:tuple, pxShape:tuple, fy:int=1, fx:int=1, reduction:str=BIN_SUM, dtype=np.uint16):
+        """Creates the task.
+
+        Args:
+            srcSpec (tuple): SharedArray-spec of the packed input-slots (nSlots, height, width*1.5).
+            dstSpec (tuple): SharedArray-spec of the output-slots (nSlots, height/fy, width/fx).
+            pxShape (tuple): Shape (height, width) of the mosaic in pixels.
+            fy (int, optional): Binning-factor in y. Defaults to 1.
+            fx (int, optional): Binning-factor in x. Defaults to 1.
+            reduction (str, optional): Reduction of the binning (see Binner). Defaults to BIN_SUM.
+            dtype (np.dtype, optional): Data-type of the output. Defaults to np.uint16.
+        """
+        self.srcSpec = srcSpec
+        self.dstSpec = dstSpec
+        self.pxShape = tuple(pxShape)
+        self.fy = fy
+        self.fx = fx
+        self.reduction = reduction
+        self.dtype = np.dtype(dtype).str
+        self.__bufs__ = {}                  # Band-height: (unpacker, binner)
+
+
+    def Key(self):
+        return self.srcSpec, self.dstSpec, self.pxShape, self.fy, self.fx, self.reduction, self.dtype
+
+
+    def __call__(self, band:tuple, iSrc:int, iDst:int):
+        o0, o1 = band
+        src = AttachShared(self.srcSpec)[iSrc][o0 * self.fy:o1 * self.fy]
+        dst = AttachShared(self.dstSpec)[iDst][o0:o1]
+        nRows = (o1 - o0) * self.fy
+        if nRows not in self.__bufs__:
+            binning = self.fy > 1 or self.fx > 1
+            self.__bufs__[nRows] = (SRGGB12Unpacker(nRows, self.pxShape[1]),
+                                    Binner((nRows, self.pxShape[1]), self.fy, self.fx, self.reduction, dtype=self.dtype) if binning else None)
+        unpacker, binner = self.__bufs__[nRows]
+        if binner is None:
+            unpacker.Unpack(src, out=dst)
+        else:
+            binner.Bin(unpacker.Unpack(src), out=dst)
+
+
+
+
+def __WorkerLoop__(qJobs, qDone):
+    # Runs in the worker-process: Executes jobs (jobId, task, band, args) until the sentinel None arrives
+    tasks = {}                              # Key: task with its buffers (only the tasks of the latest layout are kept)
+    while True:
+        job = qJobs.get()
+        if job is None:
+            break
+        jobId, task, band, args = job
+        try:
+            key = task.Key()
+            if key not in tasks:
+                tasks.clear()
+                DetachShared()
+                tasks[key] = task
+            tasks[key](band, *args)
+            qDone.put((jobId, None))
+        except Exception as e:
+            qDone.put((jobId, f"{type(e).__name__}: {e}"))
+    DetachShared()
+
+
+
+
+class ProcessPool:
+    """Pool of worker-processes which post-process frames in shared memory (see SharedArray), so the work is spread
+    over all cores without the GIL and without pickling arrays: A job only carries the task (names and parameters)
+    and the slot-indices. Run() can be called from several threads at once.
+    """
+    def __init__(self, nWorkers:int=4, split:str=SPLIT_ROWS):
+        """Starts the worker-processes.
+
+        Args:
+            nWorkers (int, optional): Amount of worker-processes. Defaults to 4.
+            split (str, optional): SPLIT_ROWS or SPLIT_FRAMES. Defaults to SPLIT_ROWS.
+        """
+        if split not in POOL_SPLITS:
+            raise Exception(f"ProcessPool - Unknown split \"{split}\" (supported: {POOL_SPLITS}).")
+        self.nWorkers = max(1, int(nWorkers))
+        self.split = split
+        ctx = get_context(POOL_START_METHOD)
+        self.__qJobs__ = ctx.Queue()
+        self.__qDone__ = ctx.Queue()
+        self.__procs__ = [ctx.Process(target=__WorkerLoop__, args=(self.__qJobs__, self.__qDone__), name=f"PoolWorker{_i}", daemon=True)
+                          for _i in range(self.nWorkers)]
+        for _p in self.__procs__:
+            _p.start()
+        self.__ids__ = count()
+        self.__lock__ = Lock()
+        self.__pending__ = {}               # jobId: [open bands, Event, errors]
+        self.__collector__ = Thread(target=self.__CollectLoop__, name="PoolCollector", daemon=True)
+        self.__collector__.start()
+
+
+    def __CollectLoop__(self):
+        while True:
+            done = self.__qDone__.get()
+            if done is None:
+                break
+            jobId, err = done
+            with self.__lock__:
+                job = self.__pending__.get(jobId)
+                if job is None:                 # Run() gave up (a worker died)
+                    continue
+                job[0] -= 1
+                if err is not None:
+                    job[2].append(err)
+                if job[0] == 0:
+                    job[1].set()
+
+
+    def Run(self, task, nRows:int, *args):
+        """Runs a task for one frame and waits until it is done.
+
+        Args:
+            task (callable): Picklable task, called as task((first, last row), *args) in the workers (see UnpackBinTask).
+            nRows (int): Rows of the result which get split into bands (SPLIT_ROWS).
+            *args: Arguments of the task (e.g. slot-indices).
+
+        Raises:
+            Exception: The first exception of the workers or a worker-process died (e.g. killed by the OOM-killer).
+        """
+        bands = RowBands(nRows, self.nWorkers) if self.split == SPLIT_ROWS else [(0, nRows)]
+        jobId = next(self.__ids__)
+        done = Event()
+        with self.__lock__:
+            self.__pending__[jobId] = [len(bands), done, []]
+        for _band in bands:
+            self.__qJobs__.put((jobId, task, _band, args))
+        while not done.wait(POOL_POLL_INTERVAL):
+            dead = [_p.name for _p in self.__procs__ if not _p.is_alive()]
+            if dead:                            # Its band would never be reported
+                with self.__lock__:
+                    self.__pending__.pop(jobId, None)
+                raise Exception(f"ProcessPool - Worker-process died ({', '.join(dead)}).")
+        with self.__lock__:
+            errors = self.__pending__.pop(jobId)[2]
+        if errors:
+            raise Exception(f"ProcessPool - {errors[0]}")
+
+
+    def Close(self):
+        """Stops the worker-processes."""
+        for _ in self.__procs__:
+            self.__qJobs__.put(None)
+        for _p in self.__procs__:
+            _p.join(timeout=5.0)
+            if _p.is_alive():
+                _p.terminate()
+        self.__qDone__.put(None)
+        self.__collector__.join()
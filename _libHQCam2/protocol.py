@@ -0,0 +1,109 @@
+# Command-framing of a connection:
+#  - "raw":  Former behaviour. Each received chunk is one command, responses are sent without terminator.
+#  - "line": Commands are terminated by "\n" ("\r\n" is accepted as well), responses get a "\n".
+#            Any amount of commands can be sent in one go (pipelining); responses are sent strictly in order.
+#  - "auto": Buffers the received data until a "\n" arrives (-> "line") or the connection is idle for
+#            AUTO_IDLE_TIMEOUT (-> "raw": the buffered bytes are one command). Former clients never send a "\n",
+#            so they keep working (only their first command waits for the idle-timeout); the commands of line-framed
+#            clients can be of any size, also the first one.
+FRAMING_RAW = "raw"
+FRAMING_LINE = "line"
+FRAMING_AUTO = "auto"
+LINE_TERMINATOR = b"\n"
+AUTO_IDLE_TIMEOUT = 0.1             # Seconds without data after which "auto" falls back to "raw"
+
+
+
+
+def SplitCommand(msg:str):
+    """Splits a received message into command and arguments.
+
+    Args:
+        msg (str): Received message.
+
+    Returns:
+        (str, list): Command and the list of its arguments.
+    """
+    dataMessage = msg.split(" ")
+    return dataMessage[0], dataMessage[1:]
+
+
+
+
+class CommandFramer:
+    """Receive-buffer of a connection which splits the received byte-stream into commands."""
+    def __init__(self, mode:str=FRAMING_AUTO):
+        if mode not in (FRAMING_RAW, FRAMING_LINE, FRAMING_AUTO):
+            raise Exception(f"CommandFramer - Unknown framing-mode \"{mode}\".")
+        self.__mode__ = mode
+        self.__buf__ = bytearray()
+
+
+    @property
+    def Framed(self):
+        return self.__mode__ == FRAMING_LINE
+
+
+    @property
+    def IdleTimeout(self):
+        """Seconds the receiver waits for further data before it calls Idle(); None = no limit (nothing undecided buffered)."""
+        return AUTO_IDLE_TIMEOUT if self.__mode__ == FRAMING_AUTO and self.__buf__ else None
+
+
+    def Idle(self):
+        """Is called when no data arrived within IdleTimeout: In "auto"-mode the buffered bytes without "\n" are the
+        command of a former client, so the connection continues as "raw".
+
+        Returns:
+            list: The buffered command (str) or an empty list.
+        """
+        if self.__mode__ != FRAMING_AUTO or not self.__buf__:
+            return []
+        self.__mode__ = FRAMING_RAW
+        cmd = bytes(self.__buf__).decode("utf-8")
+        self.__buf__ = bytearray()
+        return [cmd]
+
+
+    def Feed(self, data:bytes):
+        """Appends received data to the buffer and returns all completed commands.
+
+        Args:
+            data (bytes): Received data.
+
+        Returns:
+            list: Completed commands (str) in order of reception.
+        """
+        if self.__mode__ == FRAMING_RAW:        # One chunk = one command
+            return [bytes(data).decode("utf-8")]
+
+        self.__buf__ += data
+        if self.__mode__ == FRAMING_AUTO:
+            if LINE_TERMINATOR not in data:     # Undecided: Wait for more data or the idle-timeout (see Idle)
+                return []
+            self.__mode__ = FRAMING_LINE
+        cmds = []
+        while True:
+            iEnd = self.__buf__.find(LINE_TERMINATOR)
+            if iEnd < 0:
+                break
+            line = bytes(self.__buf__[:iEnd]).rstrip(b"\r")
+            del self.__buf__[:iEnd + 1]
+            if line:                            # Skip empty lines
+                cmds.append(line.decode("utf-8"))
+        return cmds
+
+
+    def FrameReply(self, reply:str):
+        """Encodes a response for the connection.
+
+        Args:
+            reply (str): Response.
+
+        Returns:
+            bytes: Encoded response (with terminator in "line"-mode).
+        """
+        reply = str.encode(reply)
+        if self.Framed:
+            reply += LINE_TERMINATOR
+        return reply
@@ -1,4 +1,5 @@
 import os
+import shutil
 from os.path import join
 from subprocess import call
 import time
@@ -15,9 +16,11 @@ class RAMDisk:
     __user__ = ""
     __group__ = ""
     __mounted__ = False
+    __mbSize__ = 0
 
     def __init__(self, mntPnt:str, mbSize:int=4096, user:str="pi", group:str="pi"):
         self.__mntPnt__ = mntPnt
+        self.__mbSize__ = mbSize
         self.__user__ = user
         self.__group__ = group
 
@@ -52,6 +55,23 @@ class RAMDisk:
         return self.__mounted__
 
 
+    def SizeMB(self):
+        return self.__mbSize__
+
+
+    def Usage(self):
+        """Returns the usage of the RAM-disk.
+
+        Returns:
+            (int, int, int): Total, used and free bytes (configured size when the usage can't be read).
+        """
+        try:
+            usage = shutil.disk_usage(self.__mntPnt__)
+            return usage.total, usage.used, usage.free
+        except OSError:
+            return self.__mbSize__ * 1024**2, 0, self.__mbSize__ * 1024**2
+
+
 
 
     def Unmount(self):
@@ -0,0 +1,202 @@
+import zlib
+import numpy as np
+
+from _libHQCam2.unpack import PackSRGGB12, UnpackSRGGB12, BITDEPTH_SRGGB12
+
+try:
+    import zstandard                # Optional: zstd entropy-coder (pip install zstandard)
+except ImportError:
+    zstandard = None
+
+
+
+# Transforms of the pixel-data before the entropy-coder (id stored in the RawHeader)
+CODEC_NONE = "none"                 # Uncompressed (plain pixel-data, can be memory-mapped)
+CODEC_PACK12 = "pack12"             # 12-bit values packed into 1.5 bytes (no entropy-coder, fixed 75%)
+CODEC_SHUFFLE = "shuffle"           # Bytes of the values grouped by significance (all high-bytes, then all low-bytes)
+CODEC_DELTA = "delta"               # Difference to the previous pixel of the same bayer-colour, zigzag-mapped, then shuffled
+CODECS = (CODEC_NONE, CODEC_PACK12, CODEC_SHUFFLE, CODEC_DELTA)
+
+# Entropy-coders after the transform
+ENTROPY_NONE = "none"
+ENTROPY_ZLIB = "zlib"
+ENTROPY_ZSTD = "zst"                # Needs the zstandard-package
+ENTROPIES = (ENTROPY_NONE, ENTROPY_ZLIB, ENTROPY_ZSTD)
+ENTROPY_DEFAULT_LEVELS = {ENTROPY_NONE: 0, ENTROPY_ZLIB: 1, ENTROPY_ZSTD: 1}
+
+
+
+
+def __Shuffle__(arr:np.ndarray):
+    # (n, itemsize)-bytes -> (itemsize, n): Equal significance next to each other (high-bytes of 12-bit data are mostly small)
+    return np.ascontiguousarray(arr.reshape(-1).view(np.uint8).reshape(-1, arr.dtype.itemsize).T)
+
+
+def __Unshuffle__(buf, dtype, count:int):
+    dtype = np.dtype(dtype)
+    planes = np.frombuffer(buf, dtype=np.uint8, count=count * dtype.itemsize).reshape(dtype.itemsize, count)
+    return np.ascontiguousarray(planes.T).view(dtype).reshape(-1)
+
+
+def __Delta__(arr:np.ndarray, period:int):
+    # Residual to the pixel `period` columns left (same colour for period=2 on a mosaic), modulo 2^bits; zigzag: small |r| -> small values
+    # Floats are differenced as their bit-patterns (lossless, although less effective than for integers)
+    sdtype = np.dtype(f"i{arr.dtype.itemsize}")
+    arr = arr.view(f"u{arr.dtype.itemsize}")
+    res = np.empty(arr.shape, dtype=arr.dtype)
+    res[..., :period] = arr[..., :period]
+    np.subtract(arr[..., period:], arr[..., :-period], out=res[..., period:])
+    s = res.view(sdtype)
+    return ((s << 1) ^ (s >> (sdtype.itemsize * 8 - 1))).view(arr.dtype)
+
+
+def __Undelta__(res:np.ndarray, period:int):
+    z = res
+    s = (z >> 1) ^ (0 - (z & 1))                                    # Inverse zigzag (unsigned wrap-around)
+    if s.shape[-1] % period == 0:                                   # Running sum per phase restores the values (modulo 2^bits)
+        phases = s.reshape(*s.shape[:-1], -1, period)
+        np.cumsum(phases, axis=-2, dtype=s.dtype, out=phases)
+    else:
+        for _j in range(period):
+            np.cumsum(s[..., _j::period], axis=-1, dtype=s.dtype, out=s[..., _j::period])
+    return s
+
+
+
+
+class RawCodec:
+    """Lossless per-frame compression of pixel-data, tuned for 12-bit sensor-data in 16-bit words:
+    A transform (CODEC_*) decorrelates the values and moves the always-zero upper bits together, then a fast
+    entropy-coder (ENTROPY_*) compresses the bytes. Packed SRGGB12-data is unpacked for the transform and packed
+    again on decoding, so the stored frame is restored bit-exact.
+    """
+    def __init__(self, codec:str=CODEC_DELTA, entropy:str=ENTROPY_ZLIB, level:int=None):
+        """Creates the codec.
+
+        Args:
+            codec (str, optional): Transform (see CODECS). Defaults to CODEC_DELTA.
+            entropy (str, optional): Entropy-coder (see ENTROPIES). Defaults to ENTROPY_ZLIB.
+            level (int, optional): Level of the entropy-coder. Defaults to None (see ENTROPY_DEFAULT_LEVELS).
+        """
+        if codec not in CODECS:
+            raise Exception(f"RawCodec - Unknown codec \"{codec}\" (supported: {CODECS}).")
+        if entropy not in ENTROPIES:
+            raise Exception(f"RawCodec - Unknown entropy-coder \"{entropy}\" (supported: {ENTROPIES}).")
+        if entropy == ENTROPY_ZSTD and zstandard is None:
+            raise Exception("RawCodec - zst needs the zstandard-package (pip install zstandard).")
+        if codec in (CODEC_NONE, CODEC_PACK12):
+            entropy = ENTROPY_NONE
+        self.codec = codec
+        self.entropy = entropy
+        self.level = ENTROPY_DEFAULT_LEVELS[entropy] if level is None else int(level)
+
+
+    @classmethod
+    def FromStr(cls, codecStr:str):
+        """Decodes a codec like "delta", "delta:zst" or "shuffle:zlib:6".
+
+        Returns:
+            RawCodec: Codec or None for "none"/"0".
+        """
+        parts = codecStr.lower().split(":")
+        if parts[0] in ("0", "none", "off", ""):
+            return None
+        entropy = parts[1] if len(parts) > 1 else ENTROPY_ZLIB
+        level = int(parts[2]) if len(parts) > 2 else None
+        return cls(parts[0], entropy, level)
+
+
+    def __str__(self):
+        return f"{self.codec}:{self.entropy}:{self.level}"
+
+
+    def Supports(self, dtype, bitDepth:int, packed:bool=False):
+        """Returns if an array can be encoded losslessly (pack12 needs unsigned values with at most 12 bit).
+
+        Args:
+            dtype (np.dtype): Data-type of the array.
+            bitDepth (int): Significant bits of the values.
+            packed (bool, optional): The array holds SRGGB12_CSI2P packed rows. Defaults to False.
+        """
+        if self.codec != CODEC_PACK12 or packed:
+            return True
+        return np.dtype(dtype).kind == "u" and bitDepth <= BITDEPTH_SRGGB12
+
+
+    @property
+    def Ids(self):
+        """Returns the ids (codec, entropy) which are stored in the RawHeader."""
+        return CODECS.index(self.codec), ENTROPIES.index(self.entropy)
+
+
+    def Encode(self, arr:np.ndarray, period:int=1, packed:bool=False):
+        """Compresses an array.
+
+        Args:
+            arr (np.ndarray): Pixel-data (pack12 only for values up to 12 bit, see Supports).
+            period (int, optional): Distance of equal colours along the rows (2 for a bayer-mosaic). Defaults to 1.
+            packed (bool, optional): arr holds SRGGB12_CSI2P packed rows (uint8). Defaults to False.
+
+        Returns:
+            bytes: Payload.
+        """
+        if packed and self.codec != CODEC_PACK12:       # The transforms work on the pixel-values
+            arr = UnpackSRGGB12(arr)
+        if self.codec == CODEC_NONE:
+            return np.ascontiguousarray(arr).tobytes()
+        if self.codec == CODEC_PACK12:
+            if packed:
+                return np.ascontiguousarray(arr).tobytes()
+            flat = np.ascontiguousarray(arr, dtype=np.uint16).reshape(-1)
+            if flat.size % 2:
+                flat = np.append(flat, np.uint16(0))
+            return PackSRGGB12(flat.reshape(1, -1)).tobytes()
+        if self.codec == CODEC_DELTA:
+            arr = __Delta__(np.ascontiguousarray(arr), max(1, period))
+        data = __Shuffle__(arr)
+        if self.entropy == ENTROPY_ZLIB:
+            return zlib.compress(data, self.level)
+        if self.entropy == ENTROPY_ZSTD:
+            return zstandard.ZstdCompressor(level=self.level).compress(data)
+        return data.tobytes()
+
+
+    @staticmethod
+    def Decode(payload, shape:tuple, dtype, codecId:int, entropyId:int, period:int=1, packed:bool=False):
+        """Restores an array from its payload (see Encode).
+
+        Args:
+            payload (bytes-like): Payload.
+            shape (tuple): Shape of the stored array.
+            dtype (np.dtype): Data-type of the stored array.
+            codecId (int): Index of the codec in CODECS.
+            entropyId (int): Index of the entropy-coder in ENTROPIES.
+            period (int, optional): See Encode. Defaults to 1.
+            packed (bool, optional): The stored array holds SRGGB12_CSI2P packed rows (uint8). Defaults to False.
+
+        Returns:
+            np.ndarray: The array (bit-exact).
+        """
+        codec = CODECS[codecId]
+        entropy = ENTROPIES[entropyId]
+        dtype = np.dtype(dtype)
+        if packed and codec != CODEC_PACK12:            # Transform of the pixel-values (uint16 mosaic)
+            pxShape = (shape[0], shape[1] * 2 // 3)
+            mosaic = RawCodec.Decode(payload, pxShape, np.uint16, codecId, entropyId, period)
+            return PackSRGGB12(mosaic)
+        count = int(np.prod(shape))
+        if codec == CODEC_NONE or (codec == CODEC_PACK12 and packed):
+            return np.frombuffer(payload, dtype=dtype, count=count).reshape(shape).copy()
+        if codec == CODEC_PACK12:
+            packedRow = np.frombuffer(payload, dtype=np.uint8).reshape(1, -1)
+            return UnpackSRGGB12(packedRow).reshape(-1)[:count].astype(dtype, copy=False).reshape(shape)
+        if entropy == ENTROPY_ZLIB:
+            payload = zlib.decompress(payload)
+        elif entropy == ENTROPY_ZSTD:
+            if zstandard is None:
+                raise Exception("RawCodec - zst needs the zstandard-package (pip install zstandard).")
+            payload = zstandard.ZstdDecompressor().decompress(payload, max_output_size=count * dtype.itemsize)
+        if codec == CODEC_DELTA:
+            res = __Unshuffle__(payload, f"u{dtype.itemsize}", count).reshape(shape)
+            return __Undelta__(res, period).view(dtype)
+        return __Unshuffle__(payload, dtype, count).reshape(shape)
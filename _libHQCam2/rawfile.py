@@ -0,0 +1,348 @@
+import os
+import struct
+import pickle
+import numpy as np
+
+from _libHQCam2.rawcodec import RawCodec
+from _libHQCam2.unpack import UnpackSRGGB12, PackedWidth, PixelWidth
+
+
+
+# Layout of a raw-container file (little endian):
+#  [Header: RAWFILE_HEADER_SIZE bytes][Contiguous pixel-data (C-order) or compressed payload (codec != 0, see rawcodec)]
+# The header has a fixed size, so uncompressed pixel-data can be mapped directly via np.memmap(offset=RAWFILE_HEADER_SIZE).
+# A sequence-file (see rawwriter.WRITE_APPEND) holds several of these records, each padded to RAWSEQ_ALIGN bytes.
+RAWFILE_MAGIC = b"PCR2"
+RAWFILE_VERSION = 1
+RAWFILE_HEADER_SIZE = 128
+RAWSEQ_ALIGN = 4096                 # Records of a sequence-file start on multiples of this (allows O_DIRECT-writes)
+__headerStruct__ = struct.Struct("<4sHH"        # Magic, version, header-size
+                                 "8sBBH"        # dtype-string (np.dtype.str), bit-depth, ndim, layout
+                                 "3I"           # Shape (unused dims = 0)
+                                 "4i"           # Clip-window in px: x, y, width, height
+                                 "2H"           # Binning-factor y, x
+                                 "IffIq"        # ExposureTime [µs], AnalogueGain, DigitalGain, FrameDuration [µs], SensorTimestamp [ns]
+                                 "I"            # Amount of accumulated frames (0 = single frame; fields in the former padding read as 0 from older files)
+                                 "BBB"          # Codec, entropy-coder and delta-period of the payload (0 = uncompressed; see rawcodec)
+                                 "xI"           # Stride: Bytes per stored row incl. alignment-padding (0 = shape[-1] * itemsize)
+                                 "Q"            # Bytes of the payload (0 = uncompressed pixel-data, see RawHeader.PayloadBytes)
+                                 "HI8s"         # Index of the SS and of the image in the capture, product of an accumulation (e.g. "mean")
+                                 )
+
+# Layouts of the pixel-data
+LAYOUT_PLAIN = 0                    # Array of pixel-values
+LAYOUT_SRGGB12_PACKED = 1           # Bytes of the SRGGB12_CSI2P packing (2 pixels in 3 bytes); width in px = clipWin[2] (see DecodePackedFrame)
+LAYOUT_BAYER_PLANES = 2             # Colour-planes (R, Gr, Gb, B) stacked in the first dimension; binning in sensor-pixels
+LAYOUT_ROI_RECORD = 3               # ROIs concatenated into one record (uint8: packed bytes, uint16: pixels; see _libHQCam2.roi)
+LAYOUT_ROI_STATS = 4                # float64-rows of ROI-statistics, one row per frame (see _libHQCam2.roi.ROIStatsWriter)
+
+
+
+
+class RawHeader:
+    """Header of a raw-container file."""
+    def __init__(self, shape:tuple, dtype, bitDepth:int=16, layout:int=LAYOUT_PLAIN, clipWin=(0, 0, 0, 0), binning=(1, 1),
+                 exposureTime:int=0, analogueGain:float=0.0, digitalGain:float=0.0, frameDuration:int=0, sensorTimestamp:int=0,
+                 nAccumulated:int=0, codec:int=0, entropy:int=0, period:int=0, stride:int=0, payloadBytes:int=0,
+                 iSS:int=0, iPic:int=0, product:str=""):
+        self.shape = tuple(int(_s) for _s in shape)
+        self.dtype = np.dtype(dtype)
+        self.bitDepth = int(bitDepth)
+        self.layout = int(layout)
+        self.clipWin = tuple(int(_c) for _c in clipWin)
+        self.binning = tuple(int(_b) for _b in binning)
+        self.exposureTime = int(exposureTime)
+        self.analogueGain = float(analogueGain)
+        self.digitalGain = float(digitalGain)
+        self.frameDuration = int(frameDuration)
+        self.sensorTimestamp = int(sensorTimestamp)
+        self.nAccumulated = int(nAccumulated)
+        self.codec = int(codec)
+        self.entropy = int(entropy)
+        self.period = int(period)
+        self.stride = int(stride)
+        self.payloadBytes = int(payloadBytes)
+        self.iSS = int(iSS)                         # Identify the frame also where the filename is lost (sequence-files, streams)
+        self.iPic = int(iPic)
+        self.product = str(product)
+        self.dataOffset = RAWFILE_HEADER_SIZE
+
+
+    @classmethod
+    def FromArray(cls, arr:np.ndarray, meta:dict=None, **kwargs):
+        """Creates the header of an array and picamera2-metadata.
+
+        Args:
+            arr (np.ndarray): Pixel-data.
+            meta (dict, optional): picamera2-metadata (ExposureTime, AnalogueGain, ...). Defaults to None.
+            **kwargs: Further header-fields (bitDepth, layout, clipWin, binning, nAccumulated, codec, entropy, period, stride, payloadBytes,
+                      iSS, iPic, product).
+
+        Returns:
+            RawHeader: Header describing the array.
+        """
+        meta = meta if meta is not None else {}
+        return cls(arr.shape, arr.dtype,
+                   exposureTime=meta.get("ExposureTime", 0),
+                   analogueGain=meta.get("AnalogueGain", 0.0),
+                   digitalGain=meta.get("DigitalGain", 0.0),
+                   frameDuration=meta.get("FrameDuration", 0),
+                   sensorTimestamp=meta.get("SensorTimestamp", 0),
+                   **kwargs)
+
+
+    @property
+    def nBytes(self):
+        return int(np.prod(self.shape)) * self.dtype.itemsize
+
+
+    @property
+    def PayloadBytes(self):
+        """Bytes stored after the header (compressed size or nBytes)."""
+        return self.payloadBytes if self.payloadBytes > 0 else self.nBytes
+
+
+    def Pack(self):
+        """Serializes the header.
+
+        Returns:
+            bytes: Header with RAWFILE_HEADER_SIZE bytes.
+        """
+        ndim = len(self.shape)
+        if ndim > 3:
+            raise Exception(f"RawHeader - Only up to 3 dimensions supported (got {ndim}).")
+        shape = list(self.shape) + [0] * (3 - ndim)
+        hdr = __headerStruct__.pack(RAWFILE_MAGIC, RAWFILE_VERSION, RAWFILE_HEADER_SIZE,
+                                    self.dtype.str.encode("ascii"), self.bitDepth, ndim, self.layout,
+                                    *shape, *self.clipWin, *self.binning,
+                                    self.exposureTime, self.analogueGain, self.digitalGain, self.frameDuration, self.sensorTimestamp,
+                                    self.nAccumulated, self.codec, self.entropy, self.period, self.stride, self.payloadBytes,
+                                    self.iSS, self.iPic, self.product.encode("ascii"))
+        return hdr.ljust(RAWFILE_HEADER_SIZE, b"\0")
+
+
+    @classmethod
+    def Unpack(cls, buf:bytes):
+        """Deserializes a header.
+
+        Args:
+            buf (bytes): At least RAWFILE_HEADER_SIZE bytes.
+
+        Raises:
+            Exception: When the magic or version does not match.
+
+        Returns:
+            RawHeader: Decoded header.
+        """
+        if len(buf) < __headerStruct__.size or buf[:4] != RAWFILE_MAGIC:
+            raise Exception("RawHeader - Not a raw-container.")
+        (_magic, version, hdrSize, dtype, bitDepth, ndim, layout,
+         s0, s1, s2, cx, cy, cw, ch, by, bx,
+         expTime, ag, dg, fd, ts, nAcc, codec, entropy, period, stride, payloadBytes,
+         iSS, iPic, product) = __headerStruct__.unpack_from(buf)
+        if version > RAWFILE_VERSION:
+            raise Exception(f"RawHeader - Unsupported version {version}.")
+        hdr = cls((s0, s1, s2)[:ndim], dtype.rstrip(b"\0").decode("ascii"), bitDepth, layout, (cx, cy, cw, ch), (by, bx),
+                  expTime, ag, dg, fd, ts, nAcc, codec, entropy, period, stride, payloadBytes,
+                  iSS, iPic, product.rstrip(b"\0").decode("ascii"))
+        hdr.dataOffset = hdrSize
+        return hdr
+
+
+
+
+def __WriteAll__(fd:int, bufs:list):
+    # os.writev is a single syscall for header + pixel-data; loop only in case of partial writes
+    bufs = [memoryview(_b).cast("B") for _b in bufs]
+    while bufs:
+        written = os.writev(fd, bufs)
+        while bufs and written >= len(bufs[0]):
+            written -= len(bufs[0])
+            bufs.pop(0)
+        if bufs:
+            bufs[0] = bufs[0][written:]
+
+
+
+
+def CodecPeriod(layout:int, binning=(1, 1)):
+    """Returns the distance of equal bayer-colours along a row for the delta-codec (1 for colour-planes or binned images)."""
+    if layout in (LAYOUT_PLAIN, LAYOUT_SRGGB12_PACKED) and max(binning) == 1:
+        return 2
+    return 1
+
+
+
+
+def EncodeRawFrame(arr:np.ndarray, meta:dict=None, codec:RawCodec=None, **kwargs):
+    """Builds header and payload of a raw-container (see WriteRawFrame).
+
+    Returns:
+        (bytes, bytes-like): Packed header and payload (the C-contiguous array itself when uncompressed).
+    """
+    arr = np.ascontiguousarray(arr)
+    payload = arr
+    layout = kwargs.get("layout", LAYOUT_PLAIN)
+    if codec is not None and not codec.Supports(arr.dtype, kwargs.get("bitDepth", 16), layout == LAYOUT_SRGGB12_PACKED):
+        codec = None                                # e.g. pack12 for 16-bit sums: stored uncompressed
+    if codec is not None:
+        period = CodecPeriod(layout, kwargs.get("binning", (1, 1)))
+        payload = codec.Encode(arr, period, packed=layout == LAYOUT_SRGGB12_PACKED)
+        kwargs["codec"], kwargs["entropy"] = codec.Ids
+        kwargs["period"] = period
+        kwargs["payloadBytes"] = len(payload)
+    if layout == LAYOUT_SRGGB12_PACKED and arr.ndim == 2:
+        kwargs.setdefault("stride", arr.shape[1] * arr.itemsize)
+    return RawHeader.FromArray(arr, meta, **kwargs).Pack(), payload
+
+
+
+
+def WriteRawFrame(fName:str, arr:np.ndarray, meta:dict=None, codec:RawCodec=None, **kwargs):
+    """Writes an array as raw-container (header + contiguous pixel-data) with a single write.
+
+    Args:
+        fName (str): Target filepath.
+        arr (np.ndarray): Pixel-data (gets written without copy when C-contiguous and uncompressed).
+        meta (dict, optional): picamera2-metadata for the header. Defaults to None.
+        codec (RawCodec, optional): Compresses the pixel-data (see rawcodec). Defaults to None (uncompressed).
+        **kwargs: Further header-fields (bitDepth, layout, clipWin, binning).
+
+    Returns:
+        int: Amount of written bytes.
+    """
+    hdr, payload = EncodeRawFrame(arr, meta, codec, **kwargs)
+    fd = os.open(fName, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        __WriteAll__(fd, [hdr, payload])
+    finally:
+        os.close(fd)
+    return len(hdr) + len(memoryview(payload).cast("B"))
+
+
+
+
+def ReadRawHeader(fName:str):
+    """Reads only the header of a raw-container.
+
+    Args:
+        fName (str): Filepath.
+
+    Returns:
+        RawHeader: Decoded header.
+    """
+    with open(fName, "rb") as f:
+        return RawHeader.Unpack(f.read(RAWFILE_HEADER_SIZE))
+
+
+
+
+def ReadRawFrame(fName:str, mmap:bool=True):
+    """Reads a raw-container. Files of the former format (pickled np.ndarray) are also supported.
+
+    Args:
+        fName (str): Filepath.
+        mmap (bool, optional): Map the pixel-data read-only instead of reading it into memory (allows partial reads).
+            Compressed files are always decoded into memory. Defaults to True.
+
+    Returns:
+        (np.ndarray, RawHeader): Pixel-data and header (None for pickled files).
+    """
+    with open(fName, "rb") as f:
+        buf = f.read(RAWFILE_HEADER_SIZE)
+        if buf[:4] != RAWFILE_MAGIC:                # Former format
+            f.seek(0)
+            return pickle.load(f), None
+        hdr = RawHeader.Unpack(buf)
+        if hdr.codec != 0:
+            f.seek(hdr.dataOffset)
+            arr = RawCodec.Decode(f.read(hdr.PayloadBytes), hdr.shape, hdr.dtype, hdr.codec, hdr.entropy, hdr.period,
+                                  packed=hdr.layout == LAYOUT_SRGGB12_PACKED)
+            return arr, hdr
+        if not mmap:
+            f.seek(hdr.dataOffset)
+            arr = np.fromfile(f, dtype=hdr.dtype, count=int(np.prod(hdr.shape))).reshape(hdr.shape)
+            return arr, hdr
+    arr = np.memmap(fName, dtype=hdr.dtype, mode="r", offset=hdr.dataOffset, shape=hdr.shape)
+    return arr, hdr
+
+
+
+
+def DecodePackedFrame(arr:np.ndarray, hdr:RawHeader=None):
+    """Unpacks a stored SRGGB12_CSI2P frame on the host into the 16-bit bayer-mosaic (the pi stores the packed bytes as-is).
+    Alignment-padding at the end of the rows (stride) is skipped. Also decodes files of the former format, where the
+    packed bytes were widened to uint16.
+
+    Args:
+        arr (np.ndarray): Pixel-data of ReadRawFrame or RecvFrame.
+        hdr (RawHeader, optional): Header of the frame. Defaults to None (former pickled files: width from the row-length).
+
+    Returns:
+        np.ndarray: uint16 mosaic (height, width); other layouts are returned unchanged.
+    """
+    if hdr is not None and hdr.layout != LAYOUT_SRGGB12_PACKED:
+        return arr
+    if arr.dtype != np.uint8:                       # Former format: One packed byte per uint16
+        arr = arr.astype(np.uint8)
+    if hdr is not None and hdr.stride and arr.ndim == 1:
+        arr = arr.reshape(-1, hdr.stride)
+    width = hdr.clipWin[2] if hdr is not None and hdr.clipWin[2] > 0 else PixelWidth(arr.shape[1])
+    return UnpackSRGGB12(arr[:, :PackedWidth(width)])
+
+
+
+
+def ReadBayerFrame(fName:str):
+    """Reads a raw-container (or former pickled file) and returns its 16-bit bayer-mosaic (see DecodePackedFrame).
+
+    Args:
+        fName (str): Filepath.
+
+    Returns:
+        (np.ndarray, RawHeader): Mosaic (unpacked if the file holds packed bytes) and header (None for pickled files, which
+                                 are returned as stored: their layout is unknown, use DecodePackedFrame(arr) for packed ones).
+    """
+    arr, hdr = ReadRawFrame(fName)
+    if hdr is None:
+        return arr, None
+    return DecodePackedFrame(arr, hdr), hdr
+
+
+
+
+def ReadRawSequence(fName:str):
+    """Iterates over the frames of a sequence-file (records of header + payload, see rawwriter.WRITE_APPEND).
+    The records are in the order they were written (post-processed frames can finish out of capture-order): Each frame
+    is identified by iSS, iPic and product of its header.
+
+    Args:
+        fName (str): Filepath.
+
+    Yields:
+        (np.ndarray, RawHeader): Pixel-data (decoded if compressed) and header of each frame.
+    """
+    with open(fName, "rb") as f:
+        offset = 0
+        while True:
+            f.seek(offset)
+            buf = f.read(RAWFILE_HEADER_SIZE)
+            if len(buf) < RAWFILE_HEADER_SIZE or buf[:4] != RAWFILE_MAGIC:
+                break
+            hdr = RawHeader.Unpack(buf)
+            f.seek(offset + hdr.dataOffset)
+            payload = f.read(hdr.PayloadBytes)
+            if hdr.codec != 0:
+                arr = RawCodec.Decode(payload, hdr.shape, hdr.dtype, hdr.codec, hdr.entropy, hdr.period,
+                                      packed=hdr.layout == LAYOUT_SRGGB12_PACKED)
+            else:
+                arr = np.frombuffer(payload, dtype=hdr.dtype).reshape(hdr.shape)
+            yield arr, hdr
+            offset += RawRecordBytes(hdr.dataOffset + hdr.PayloadBytes)
+
+
+
+
+def RawRecordBytes(nBytes:int):
+    """Returns the size of a record in a sequence-file (nBytes of header + payload padded to RAWSEQ_ALIGN)."""
+    return -(-int(nBytes) // RAWSEQ_ALIGN) * RAWSEQ_ALIGN
@@ -0,0 +1,295 @@
+import os
+import mmap
+from os.path import dirname
+from queue import Queue
+from threading import Thread, Event
+from time import time
+import numpy as np
+
+from _libHQCam2.rawfile import EncodeRawFrame, RawRecordBytes
+
+
+
+# Modes of the RawWriter
+WRITE_SYNC = "sync"                 # Every frame is written by WriteRawFrame in the calling thread (former behaviour, no RawWriter)
+WRITE_FILES = "files"               # One raw-container per frame, written by the writer-thread
+WRITE_APPEND = "append"             # All frames of a sequence appended to one sequence-file (see rawfile.ReadRawSequence)
+WRITE_MODES = (WRITE_SYNC, WRITE_FILES, WRITE_APPEND)
+
+WRITER_BUFFERS = 2                  # Batches in flight: One is filled while the other one is written
+O_DIRECT = getattr(os, "O_DIRECT", 0)   # Linux only
+
+
+
+
+class WriteBatch:
+    """Page-aligned buffer (anonymous mmap) which collects records (header + payload, each padded to RAWSEQ_ALIGN),
+    so a batch can be written with few large writes, also with O_DIRECT.
+    """
+    def __init__(self, nBytes:int):
+        self.size = RawRecordBytes(nBytes)
+        self.__buf__ = mmap.mmap(-1, self.size)
+        self.view = memoryview(self.__buf__)
+        self.used = 0
+        self.records = []                   # (fName, offset, bytes without padding)
+
+
+    def Fits(self, nBytes:int):
+        return self.used + RawRecordBytes(nBytes) <= self.size
+
+
+    def Append(self, fName:str, hdr:bytes, payload):
+        payload = memoryview(payload).cast("B")
+        off = self.used
+        nHdr = len(hdr)
+        self.view[off:off + nHdr] = hdr
+        self.view[off + nHdr:off + nHdr + len(payload)] = payload
+        nBytes = nHdr + len(payload)
+        padded = RawRecordBytes(nBytes)
+        self.view[off + nBytes:off + padded] = bytes(padded - nBytes)   # Deterministic padding
+        self.records.append((fName, off, nBytes))
+        self.used += padded
+
+
+    def Reset(self):
+        self.used = 0
+        self.records = []
+
+
+    def Close(self):
+        self.view.release()
+        self.__buf__.close()
+
+
+
+
+def __WriteView__(fd:int, view:memoryview):
+    # Loop only in case of partial writes (slices of the aligned buffer stay aligned for O_DIRECT in practice)
+    while len(view):
+        view = view[os.write(fd, view):]
+
+
+
+
+class RawWriter:
+    """Asynchronous writer of raw-containers: Write() encodes a frame and copies it into the current batch (the caller
+    can reuse its buffer right away); full batches are written by a dedicated thread while the next batch is filled.
+    Options: Preallocation of the files (posix_fallocate), one sequence-file per sequence (WRITE_APPEND), O_DIRECT
+    (bypasses the page-cache, e.g. for SD-cards; falls back to buffered writes where unsupported, e.g. tmpfs).
+    Files are only fsync'ed at the end of a sequence (EndSequence).
+    """
+    def __init__(self, mode:str=WRITE_FILES, batchMB:int=32, preallocate:bool=False, direct:bool=False, onWritten=None):
+        """Starts the writer-thread.
+
+        Args:
+            mode (str, optional): WRITE_FILES or WRITE_APPEND. Defaults to WRITE_FILES.
+            batchMB (int, optional): Size of a batch (grows for larger frames). Defaults to 32.
+            preallocate (bool, optional): Reserve the space of the files before writing (posix_fallocate). Defaults to False.
+            direct (bool, optional): Write with O_DIRECT. Defaults to False.
+            onWritten (callable, optional): Is called as onWritten(fName) by the writer-thread after a file is complete
+                                            (WRITE_APPEND: the sequence-file at EndSequence). Defaults to None.
+        """
+        if mode not in (WRITE_FILES, WRITE_APPEND):
+            raise Exception(f"RawWriter - Unknown mode \"{mode}\" (supported: {WRITE_FILES}, {WRITE_APPEND}).")
+        self.mode = mode
+        self.preallocate = preallocate and hasattr(os, "posix_fallocate")
+        self.direct = direct and O_DIRECT != 0
+        self.__batchBytes__ = int(batchMB) * 1024**2
+        self.__onWritten__ = onWritten
+        self.__free__ = Queue()
+        for _ in range(WRITER_BUFFERS):
+            self.__free__.put(WriteBatch(self.__batchBytes__))
+        self.__batch__ = self.__free__.get()
+        self.__jobs__ = Queue()
+        self.__errors__ = []
+        self.__seqFd__ = None               # Sequence-file (WRITE_APPEND)
+        self.__seqFName__ = None
+        self.__seqBytes__ = 0
+        self.__unsynced__ = []              # Files written since the last fsync (WRITE_FILES)
+        self.stats = {"frames": 0, "bytes": 0, "batches": 0, "writes": 0, "tWrite": 0.0, "tSync": 0.0}
+        self.__thread__ = Thread(target=self.__WriteLoop__, name="RawWriter", daemon=True)
+        self.__thread__.start()
+
+
+    ####### Writer-thread #######
+    def __Open__(self, fName:str, nBytes:int):
+        flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+        try:
+            fd = os.open(fName, flags | (O_DIRECT if self.direct else 0), 0o644)
+        except OSError:
+            if not self.direct:
+                raise
+            print(f"RawWriter - O_DIRECT not supported on {dirname(fName)}, falling back to buffered writes.")
+            self.direct = False
+            fd = os.open(fName, flags, 0o644)
+        if self.preallocate and nBytes > 0:
+            os.posix_fallocate(fd, 0, nBytes)
+        return fd
+
+
+    def __WriteBatch__(self, batch:WriteBatch):
+        start = time()
+        if self.mode == WRITE_APPEND:       # The whole batch at once (records are already aligned)
+            __WriteView__(self.__seqFd__, batch.view[:batch.used])
+            self.__seqBytes__ += batch.used
+            self.stats["writes"] += 1
+        else:
+            for _fName, _off, _nBytes in batch.records:
+                padded = RawRecordBytes(_nBytes) if self.direct else _nBytes   # O_DIRECT needs aligned lengths
+                fd = self.__Open__(_fName, _nBytes)
+                try:
+                    __WriteView__(fd, batch.view[_off:_off + padded])
+                    if padded != _nBytes:
+                        os.ftruncate(fd, _nBytes)
+                finally:
+                    os.close(fd)
+                self.__unsynced__.append(_fName)
+                self.stats["writes"] += 1
+                if self.__onWritten__ is not None:
+                    self.__onWritten__(_fName)
+        self.stats["batches"] += 1
+        self.stats["tWrite"] += time() - start
+
+
+    def __Sync__(self):
+        start = time()
+        if self.__seqFd__ is not None:
+            if self.preallocate:
+                os.ftruncate(self.__seqFd__, self.__seqBytes__)     # Unused preallocation
+            os.fsync(self.__seqFd__)
+            os.close(self.__seqFd__)
+            self.__seqFd__ = None
+            synced = [self.__seqFName__]
+            if self.__onWritten__ is not None:
+                self.__onWritten__(self.__seqFName__)
+        else:
+            synced = self.__unsynced__
+            for _fName in synced:            # Data is in the page-cache already; fsync only flushes it
+                fd = os.open(_fName, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            self.__unsynced__ = []
+        for _dir in set([dirname(_f) for _f in synced]):            # Directory-entries of new files
+            fd = os.open(_dir, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        self.stats["tSync"] += time() - start
+
+
+    def __WriteLoop__(self):
+        while True:
+            job = self.__jobs__.get()
+            if job is None:
+                break
+            kind, arg = job
+            try:
+                if kind == "batch":
+                    if not self.__errors__:
+                        self.__WriteBatch__(arg)
+                elif kind == "begin":
+                    self.__seqFName__, expected = arg
+                    self.__seqBytes__ = 0
+                    self.__seqFd__ = self.__Open__(self.__seqFName__, expected)
+                elif kind == "end":
+                    if not self.__errors__:
+                        self.__Sync__()
+            except Exception as e:
+                self.__errors__.append(e)
+            finally:
+                if kind == "batch":
+                    arg.Reset()
+                    self.__free__.put(arg)
+                elif kind == "end":
+                    arg.set()
+
+
+    def __RaiseErrors__(self):
+        if self.__errors__:
+            raise Exception(f"RawWriter - {self.__errors__[0]}")
+
+
+    ####### Caller-side #######
+    def BeginSequence(self, seqFName:str=None, expectedBytes:int=0):
+        """Starts a sequence (WRITE_APPEND: opens the sequence-file).
+
+        Args:
+            seqFName (str, optional): Sequence-file (only WRITE_APPEND). Defaults to None.
+            expectedBytes (int, optional): Expected size of the sequence-file for the preallocation. Defaults to 0.
+        """
+        if self.mode == WRITE_APPEND:
+            self.__jobs__.put(("begin", (seqFName, int(expectedBytes))))
+
+
+    def Write(self, fName:str, arr:np.ndarray, meta:dict=None, codec=None, **kwargs):
+        """Encodes a frame (see rawfile.EncodeRawFrame) and copies it into the current batch. Blocks only when all
+        batches are in flight (back-pressure).
+
+        Args:
+            fName (str): Target filepath (ignored in WRITE_APPEND).
+            arr (np.ndarray): Pixel-data (not referenced after the call).
+            meta (dict, optional): picamera2-metadata for the header. Defaults to None.
+            codec (RawCodec, optional): Compression of the pixel-data. Defaults to None.
+            **kwargs: Further header-fields (bitDepth, layout, clipWin, binning, nAccumulated, iSS, iPic, product).
+
+        Returns:
+            int: Bytes of the record (without padding).
+        """
+        self.__RaiseErrors__()
+        hdr, payload = EncodeRawFrame(arr, meta, codec, **kwargs)
+        nBytes = len(hdr) + len(memoryview(payload).cast("B"))
+        if not self.__batch__.Fits(nBytes):
+            if self.__batch__.used > 0:
+                self.Flush()
+            if not self.__batch__.Fits(nBytes):     # Frame larger than a batch: Batch gets replaced by a larger one
+                self.__batch__.Close()
+                self.__batch__ = WriteBatch(max(nBytes, self.__batchBytes__))
+        self.__batch__.Append(fName, hdr, payload)
+        self.stats["frames"] += 1
+        self.stats["bytes"] += nBytes
+        return nBytes
+
+
+    def Flush(self):
+        """Hands the current batch over to the writer-thread (blocks until a free batch is available)."""
+        if self.__batch__.used == 0:
+            return
+        self.__jobs__.put(("batch", self.__batch__))
+        self.__batch__ = self.__free__.get()
+
+
+    def EndSequence(self):
+        """Writes all pending frames and fsyncs the files of the sequence (waits until done).
+
+        Raises:
+            Exception: The first error of the writer-thread.
+        """
+        self.Flush()
+        done = Event()
+        self.__jobs__.put(("end", done))
+        done.wait()
+        self.__RaiseErrors__()
+
+
+    def Status(self):
+        """Returns the counters: frames, bytes, batches, writes, MB/s of the writes and fsync-time."""
+        stats = dict(self.stats)
+        stats["MBps"] = round(stats["bytes"] / stats["tWrite"] / 1024**2, 1) if stats["tWrite"] > 0 else 0.0
+        stats["tSync"] = round(stats["tSync"], 3)
+        stats["tWrite"] = round(stats["tWrite"], 3)
+        return stats
+
+
+    def Close(self):
+        """Ends the sequence (see EndSequence) and stops the writer-thread."""
+        try:
+            self.EndSequence()
+        finally:
+            self.__jobs__.put(None)
+            self.__thread__.join()
+            self.__batch__.Close()
+            while not self.__free__.empty():
+                self.__free__.get().Close()
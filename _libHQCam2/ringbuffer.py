@@ -0,0 +1,189 @@
+from threading import Condition
+from multiprocessing import shared_memory
+import numpy as np
+
+
+
+MEMINFO_PATH = "/proc/meminfo"
+
+
+
+
+def MemInfo():
+    """Reads the memory-state of the system.
+
+    Returns:
+        dict: Fields of /proc/meminfo in bytes (e.g. MemTotal, MemAvailable, Shmem).
+    """
+    info = {}
+    with open(MEMINFO_PATH, "r") as f:
+        for _line in f:
+            key, val = _line.split(":", 1)
+            val = val.split()
+            info[key] = int(val[0]) * (1024 if len(val) > 1 and val[1] == "kB" else 1)
+    return info
+
+
+def RingMemoryBudget(nBytes:int, ramdisk=None, ReserveMB:int=256):
+    """Checks if a ring-buffer fits into the RAM next to the RAM-disk.
+    A tmpfs-RAM-disk takes its memory only when it gets filled, so its residual free space is accounted as used.
+
+    Args:
+        nBytes (int): Size of the ring-buffer.
+        ramdisk (RAMDisk, optional): Mounted RAM-disk. Defaults to None.
+        ReserveMB (int, optional): Memory which is kept free for the system and the capture-pipeline. Defaults to 256.
+
+    Returns:
+        (bool, dict): If the ring-buffer fits and the accounting (bytes) ring, available, ramdiskFree, reserve, residual.
+    """
+    available = MemInfo().get("MemAvailable", 0)
+    ramdiskFree = ramdisk.Usage()[2] if ramdisk is not None and ramdisk.IsMounted() else 0
+    budget = {"ring": int(nBytes),
+              "available": available,
+              "ramdiskFree": ramdiskFree,
+              "reserve": ReserveMB * 1024**2,
+              }
+    budget["residual"] = available - ramdiskFree - budget["reserve"] - budget["ring"]
+    return budget["residual"] >= 0, budget
+
+
+
+
+class FrameRing:
+    """Fixed-size ring-buffer of frames in shared memory (readable by other processes via Name).
+    Put() copies a frame into the next slot without any allocation. A trigger holds the last nBefore and the
+    following nAfter frames; held slots are not overwritten (frames are dropped instead) until Release().
+    """
+    def __init__(self, nFrames:int, shape:tuple, dtype=np.uint8, name:str=None, create:bool=True):
+        """Creates the ring-buffer (or attaches to an existing one).
+
+        Args:
+            nFrames (int): Capacity in frames.
+            shape (tuple): Shape of a frame.
+            dtype (np.dtype, optional): Data-type of a frame. Defaults to np.uint8 (packed raw-data).
+            name (str, optional): Name of the shared memory. Defaults to None (generated).
+            create (bool, optional): False: Attach to the existing shared memory "name". Defaults to True.
+        """
+        self.nFrames = int(nFrames)
+        self.shape = tuple(int(_s) for _s in shape)
+        self.dtype = np.dtype(dtype)
+        nBytes = self.nFrames * int(np.prod(self.shape)) * self.dtype.itemsize
+        self.__shm__ = shared_memory.SharedMemory(name=name, create=create, size=nBytes if create else 0)
+        self.__owner__ = create
+        self.Block = np.ndarray((self.nFrames,) + self.shape, dtype=self.dtype, buffer=self.__shm__.buf)
+
+        self.__cond__ = Condition()
+        self.__meta__ = [None] * self.nFrames   # Metadata per slot
+        self.__seq__ = [0] * self.nFrames       # Sequence-number per slot (0 = empty)
+        self.__head__ = 0                       # Next slot to write
+        self.__held__ = set()                   # Slots which must not be overwritten
+        self.__holdList__ = None                # Slots of the current trigger (in order)
+        self.__holdAfter__ = 0                  # Frames still to be held after the trigger
+        self.Written = 0
+        self.Dropped = 0
+
+
+    @property
+    def Name(self):
+        return self.__shm__.name
+
+
+    @property
+    def nBytes(self):
+        return self.Block.nbytes
+
+
+    def Close(self):
+        """Releases the shared memory (and removes it, when it was created by this instance)."""
+        self.Block = None
+        self.__shm__.close()
+        if self.__owner__:
+            self.__shm__.unlink()
+
+
+    def Put(self, frame:np.ndarray, meta:dict=None):
+        """Copies a frame into the next slot.
+
+        Args:
+            frame (np.ndarray): Frame (can be a larger array, it gets clipped to the shape of the ring).
+            meta (dict, optional): Metadata of the frame. Defaults to None.
+
+        Returns:
+            int: Sequence-number of the frame or None when it was dropped (next slot is held).
+        """
+        with self.__cond__:
+            iSlot = self.__head__
+            if iSlot in self.__held__:
+                self.Dropped += 1
+                return None
+            self.__seq__[iSlot] = 0             # Invalid while being written
+        np.copyto(self.Block[iSlot], frame[tuple(slice(0, _s) for _s in self.shape)])   # Outside the lock, the slot belongs to the writer
+        with self.__cond__:
+            self.Written += 1
+            self.__seq__[iSlot] = self.Written
+            self.__meta__[iSlot] = meta
+            self.__head__ = (iSlot + 1) % self.nFrames
+            if self.__holdAfter__ > 0:
+                self.__held__.add(iSlot)
+                self.__holdList__.append(iSlot)
+                self.__holdAfter__ -= 1
+            self.__cond__.notify_all()
+            return self.Written
+
+
+    def Trigger(self, nBefore:int, nAfter:int, timeout:float=None):
+        """Holds the last nBefore frames and waits for the next nAfter frames.
+
+        Args:
+            nBefore (int): Frames before the trigger.
+            nAfter (int): Frames after the trigger.
+            timeout (float, optional): Maximum time to wait for the nAfter frames in s. Defaults to None (infinite).
+
+        Raises:
+            Exception: When more frames are requested than the ring can hold or another trigger is still held.
+
+        Returns:
+            (list, int, bool): Held slots in order of capture, amount of them before the trigger and if the timeout expired
+                               (list contains the frames captured so far).
+        """
+        if nBefore + nAfter > self.nFrames:
+            raise Exception(f"FrameRing - {nBefore}+{nAfter} frames requested, but capacity is {self.nFrames}.")
+        with self.__cond__:
+            if self.__holdList__ is not None:
+                raise Exception("FrameRing - Previous trigger not released.")
+            before = [(self.__head__ - 1 - _i) % self.nFrames for _i in range(min(nBefore, self.Written))]
+            before = [_s for _s in reversed(before) if self.__seq__[_s] > 0]
+            self.__held__.update(before)
+            self.__holdList__ = list(before)
+            self.__holdAfter__ = nAfter
+            done = self.__cond__.wait_for(lambda: self.__holdAfter__ == 0, timeout)
+            self.__holdAfter__ = 0
+            return list(self.__holdList__), len(before), not done
+
+
+    def Release(self):
+        """Releases the held frames of the trigger, so that they can be overwritten."""
+        with self.__cond__:
+            self.__held__.clear()
+            self.__holdList__ = None
+            self.__holdAfter__ = 0
+
+
+    def __getitem__(self, iSlot:int):
+        """Returns (frame, metadata, sequence-number) of a slot (the frame is a view into the ring)."""
+        return self.Block[iSlot], self.__meta__[iSlot], self.__seq__[iSlot]
+
+
+    def Status(self):
+        """Returns the state of the ring-buffer.
+
+        Returns:
+            dict: frames (capacity), bytes, written, dropped and held frames.
+        """
+        with self.__cond__:
+            return {"frames": self.nFrames,
+                    "bytes": self.nBytes,
+                    "written": self.Written,
+                    "dropped": self.Dropped,
+                    "held": len(self.__held__),
+                    }
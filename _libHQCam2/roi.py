@@ -0,0 +1,276 @@
+import numpy as np
+
+from _libHQCam2.unpack import PackedWidth, UnpackSRGGB12, SATURATION_SRGGB12
+from _libHQCam2.rawfile import RawHeader, RAWFILE_HEADER_SIZE, LAYOUT_ROI_STATS
+
+
+
+# Record of a frame: The regions of interest (ROIs) concatenated in order of the ROI-list, each in C-order.
+#  Packed:   (h, w*1.5) bytes of the SRGGB12_CSI2P packing per ROI (uint8)
+#  Unpacked: (h, w) pixels per ROI (uint16)
+ROI_TABLE_HEADER = "x;y;w;h;offset;size"
+
+
+
+
+def ParseROI(roiStr:str):
+    """Decodes a ROI "x:y:w:h" in sensor-pixels. Values are rounded down to even numbers, so every ROI starts on
+    a bayer-cell and a 3-byte group of the packing.
+
+    Args:
+        roiStr (str): ROI as "x:y:w:h".
+
+    Raises:
+        Exception: When not 4 values are given or width/height are < 2.
+
+    Returns:
+        (int, int, int, int): x, y, w, h.
+    """
+    vals = [int(_v) for _v in roiStr.split(":")]
+    if len(vals) != 4:
+        raise Exception(f"ParseROI - \"{roiStr}\" needs to be x:y:w:h.")
+    vals = [_v - (_v % 2) for _v in vals]
+    if vals[2] < 2 or vals[3] < 2:
+        raise Exception(f"ParseROI - \"{roiStr}\" is smaller than one bayer-cell.")
+    return tuple(vals)
+
+
+
+
+class ROIList:
+    """List of ROIs which are extracted from each captured frame into one compact record.
+    The packed columns of a ROI are mapped like the clip-window (x * 1.5), so the packed bytes are copied
+    without unpacking the entire frame.
+    """
+    def __init__(self, rois:list):
+        """Creates the list.
+
+        Args:
+            rois (list): ROIs (x, y, w, h) in sensor-pixels (even values, see ParseROI).
+        """
+        self.rois = [tuple(int(_v) for _v in _roi) for _roi in rois]
+        self.packedShapes = [(_h, PackedWidth(_w)) for _x, _y, _w, _h in self.rois]
+        self.pxShapes = [(_h, _w) for _x, _y, _w, _h in self.rois]
+        self.nBytes = sum([_h * _w for _h, _w in self.packedShapes])
+        self.nPixels = sum([_h * _w for _h, _w in self.pxShapes])
+
+
+    def __len__(self):
+        return len(self.rois)
+
+
+    def BoundingBox(self):
+        """Returns the bounding box (x, y, w, h) of all ROIs."""
+        x1 = min([_x for _x, _y, _w, _h in self.rois])
+        y1 = min([_y for _x, _y, _w, _h in self.rois])
+        x2 = max([_x + _w for _x, _y, _w, _h in self.rois])
+        y2 = max([_y + _h for _x, _y, _w, _h in self.rois])
+        return x1, y1, x2 - x1, y2 - y1
+
+
+    def RecordShape(self, unpack:bool=False):
+        return (self.nPixels,) if unpack else (self.nBytes,)
+
+
+    def Split(self, record:np.ndarray):
+        """Returns the ROIs of a record as views (no copy).
+
+        Args:
+            record (np.ndarray): Packed (uint8) or unpacked (uint16) record.
+
+        Returns:
+            list: Arrays of the ROIs (packed: (h, w*1.5), unpacked: (h, w)).
+        """
+        shapes = self.packedShapes if record.dtype == np.uint8 else self.pxShapes
+        views = []
+        offset = 0
+        for _h, _w in shapes:
+            views.append(record[offset:offset + _h*_w].reshape(_h, _w))
+            offset += _h * _w
+        return views
+
+
+    def Extract(self, raw:np.ndarray, out:np.ndarray=None, unpack:bool=False):
+        """Extracts the ROIs of a captured frame into a record.
+
+        Args:
+            raw (np.ndarray): Captured packed raw-array of the entire sensor (rows, stride).
+            out (np.ndarray, optional): Preallocated record (see RecordShape). Defaults to None (allocated).
+            unpack (bool, optional): Decode the ROIs into 16-bit pixels. Defaults to False (packed bytes).
+
+        Returns:
+            np.ndarray: Record of the frame.
+        """
+        out = np.empty(self.RecordShape(unpack), dtype=np.uint16 if unpack else np.uint8) if out is None else out
+        for _roi, _pShape, _view in zip(self.rois, self.packedShapes, self.Split(out)):
+            x, y, _w, h = _roi
+            cx = PackedWidth(x)             # x * 1.5 (12bit / 8bit)
+            packed = raw[y:y + h, cx:cx + _pShape[1]]
+            if unpack:
+                UnpackSRGGB12(packed, out=_view)
+            else:
+                np.copyto(_view, packed)
+        return out
+
+
+    def Table(self, unpack:bool=False):
+        """Returns the ROI-table of the records (one line per ROI with its offset and size in elements of the record).
+
+        Args:
+            unpack (bool, optional): Offsets of unpacked records. Defaults to False.
+
+        Returns:
+            str: ROI_TABLE_HEADER followed by "x;y;w;h;offset;size" per ROI.
+        """
+        lines = [ROI_TABLE_HEADER]
+        offset = 0
+        for _roi, _shape in zip(self.rois, self.pxShapes if unpack else self.packedShapes):
+            size = _shape[0] * _shape[1]
+            lines.append(";".join([str(_v) for _v in _roi + (offset, size)]))
+            offset += size
+        return "\n".join(lines) + "\n"
+
+
+    def __str__(self):
+        return " ".join([":".join([str(_v) for _v in _roi]) for _roi in self.rois])
+
+
+
+
+# Statistics per ROI and frame (see ROIStats)
+ROI_STATS_FIELDS = ("sum", "peak", "cx", "cy", "sat")   # Integrated intensity, peak, intensity-weighted centroid (sensor-px), saturated pixels
+ROI_STATS_FRAME_FIELDS = ("iSS", "iPic", "ExposureTime", "SensorTimestamp")   # Leading columns of each row
+ROI_STATS_CSV = "csv"               # Text-file with ";"-separated columns and a header-line
+ROI_STATS_BIN = "bin"               # Raw-container of float64-rows (LAYOUT_ROI_STATS), readable via ReadRawFrame
+ROI_STATS_FORMATS = (ROI_STATS_CSV, ROI_STATS_BIN)
+
+
+
+
+class ROIStats:
+    """Reduces the ROIs of a frame to ROI_STATS_FIELDS with vectorized NumPy over all ROIs at once:
+    The ROIs are unpacked into one pixel-record and every statistic is a single ufunc.reduceat over the ROI-segments.
+    All buffers are allocated once, so one ROIStats should be used per thread.
+    """
+    def __init__(self, rois:ROIList, satLevel:int=SATURATION_SRGGB12):
+        """Creates the reduction.
+
+        Args:
+            rois (ROIList): ROIs.
+            satLevel (int, optional): Pixel-values >= satLevel are saturated. Defaults to SATURATION_SRGGB12.
+        """
+        self.rois = rois
+        self.satLevel = satLevel
+        sizes = [_h * _w for _h, _w in rois.pxShapes]
+        self.__offsets__ = np.cumsum([0] + sizes[:-1]).astype(np.intp)
+        self.__xs__ = np.concatenate([np.tile(np.arange(_x, _x + _w, dtype=np.int64), _h) for _x, _y, _w, _h in rois.rois])
+        self.__ys__ = np.concatenate([np.repeat(np.arange(_y, _y + _h, dtype=np.int64), _w) for _x, _y, _w, _h in rois.rois])
+        self.__rec__ = np.empty(rois.RecordShape(unpack=True), dtype=np.uint16)
+        self.__prod__ = np.empty(rois.nPixels, dtype=np.int64)
+        self.__mask__ = np.empty(rois.nPixels, dtype=bool)
+        self.__sum__ = np.empty(len(rois), dtype=np.int64)
+        self.__tmp__ = np.empty(len(rois), dtype=np.int64)
+
+
+    @property
+    def shape(self):
+        return (len(self.rois), len(ROI_STATS_FIELDS))
+
+
+    def Compute(self, raw:np.ndarray, out:np.ndarray=None):
+        """Computes the statistics of all ROIs of a captured frame.
+
+        Args:
+            raw (np.ndarray): Captured packed raw-array of the entire sensor (rows, stride).
+            out (np.ndarray, optional): float64-result (nROIs, len(ROI_STATS_FIELDS)). Defaults to None (allocated).
+
+        Returns:
+            np.ndarray: Statistics per ROI in order of ROI_STATS_FIELDS (centroid NaN for ROIs without intensity).
+        """
+        out = np.empty(self.shape, dtype=np.float64) if out is None else out
+        rec = self.rois.Extract(raw, out=self.__rec__, unpack=True)
+        offsets = self.__offsets__
+
+        np.add.reduceat(rec, offsets, dtype=np.int64, out=self.__sum__)
+        out[:, 0] = self.__sum__
+        np.maximum.reduceat(rec, offsets, out=out[:, 1])
+        for _iCol, _coords in ((2, self.__xs__), (3, self.__ys__)):
+            np.multiply(rec, _coords, out=self.__prod__)
+            np.add.reduceat(self.__prod__, offsets, out=self.__tmp__)
+            np.divide(self.__tmp__, self.__sum__, out=out[:, _iCol], where=self.__sum__ > 0)
+            out[self.__sum__ <= 0, _iCol] = np.nan
+        np.greater_equal(rec, self.satLevel, out=self.__mask__)
+        np.add.reduceat(self.__mask__, offsets, dtype=np.int64, out=self.__tmp__)
+        out[:, 4] = self.__tmp__
+        return out
+
+
+
+
+class ROIStatsWriter:
+    """Appends one row of ROI-statistics per frame to a file, so long captures only produce a few bytes per frame.
+    A row consists of ROI_STATS_FRAME_FIELDS followed by ROI_STATS_FIELDS of every ROI.
+    The binary format is a raw-container; its header (amount of rows) is written by Close().
+    """
+    def __init__(self, fName:str, rois:ROIList, fmt:str=ROI_STATS_CSV):
+        """Creates the file.
+
+        Args:
+            fName (str): Target filepath (None: the rows are only assembled, e.g. for streaming).
+            rois (ROIList): ROIs of the statistics.
+            fmt (str, optional): ROI_STATS_CSV or ROI_STATS_BIN. Defaults to ROI_STATS_CSV.
+        """
+        if fmt not in ROI_STATS_FORMATS:
+            raise Exception(f"ROIStatsWriter - Unknown format \"{fmt}\" (supported: {ROI_STATS_FORMATS}).")
+        self.fmt = fmt
+        self.rois = rois
+        self.columns = list(ROI_STATS_FRAME_FIELDS) + [f"{_field}{_iROI}" for _iROI in range(len(rois)) for _field in ROI_STATS_FIELDS]
+        self.nRows = 0
+        self.__row__ = np.empty(len(self.columns), dtype=np.float64)
+        if fName is None:
+            self.__f__ = None
+        elif fmt == ROI_STATS_CSV:
+            self.__f__ = open(fName, "w")
+            self.__f__.write(";".join(self.columns) + "\n")
+        else:
+            self.__f__ = open(fName, "wb")
+            self.__f__.write(bytes(RAWFILE_HEADER_SIZE))     # Placeholder of the header
+
+
+    def Row(self, stats:np.ndarray, meta:dict, iSS:int=0, iPic:int=0):
+        """Assembles the row of a frame (the returned buffer is reused by the next call).
+
+        Args:
+            stats (np.ndarray): Result of ROIStats.Compute.
+            meta (dict): picamera2-metadata of the frame.
+            iSS (int, optional): Index of the SS. Defaults to 0.
+            iPic (int, optional): Index of the picture. Defaults to 0.
+
+        Returns:
+            np.ndarray: float64-row (SensorTimestamp is exact up to 2^53 ns).
+        """
+        nFrame = len(ROI_STATS_FRAME_FIELDS)
+        self.__row__[:nFrame] = (iSS, iPic, meta.get("ExposureTime", 0), meta.get("SensorTimestamp", 0))
+        self.__row__[nFrame:] = stats.ravel()
+        return self.__row__
+
+
+    def Write(self, stats:np.ndarray, meta:dict, iSS:int=0, iPic:int=0):
+        """Appends the row of a frame (see Row)."""
+        row = self.Row(stats, meta, iSS, iPic)
+        if self.fmt == ROI_STATS_CSV:
+            self.__f__.write(";".join([str(int(_v)) if _v.is_integer() else f"{_v:.6f}" for _v in row.tolist()]) + "\n")
+        else:
+            self.__f__.write(row.tobytes())
+        self.nRows += 1
+
+
+    def Close(self):
+        """Closes the file (binary: the header with the final amount of rows is written)."""
+        if self.__f__ is None:
+            return
+        if self.fmt == ROI_STATS_BIN:
+            hdr = RawHeader((self.nRows, len(self.columns)), np.float64, bitDepth=64, layout=LAYOUT_ROI_STATS, clipWin=self.rois.BoundingBox())
+            self.__f__.seek(0)
+            self.__f__.write(hdr.Pack())
+        self.__f__.close()
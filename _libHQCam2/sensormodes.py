@@ -0,0 +1,116 @@
+from _libHQCam2.unpack import BITDEPTH_SRGGB12
+
+
+
+# Raw sensor-modes of the imx477 (HQ-camera) as reported by Picamera2.sensor_modes.
+#  size:    Px-width and -height of the raw-frames
+#  crop:    Area of the sensor (x, y, w, h in sensor-pixels) which is read out; crop-width / width = binning
+#  fps:     Maximum framerate
+# 2x2-binned modes average 2x2 pixels of the same colour, so the output is again a bayer-mosaic.
+# The 10-bit mode (SRGGB10_CSI2P) can't be unpacked by _libHQCam2.unpack.
+SENSOR_MODES_IMX477 = [
+    {"size": (1332,  990), "bitDepth": 10, "crop": (696, 528, 2664, 1980), "fps": 120.03},
+    {"size": (2028, 1080), "bitDepth": 12, "crop": (  0, 440, 4056, 2160), "fps":  50.03},
+    {"size": (2028, 1520), "bitDepth": 12, "crop": (  0,   0, 4056, 3040), "fps":  40.01},
+    {"size": (4056, 3040), "bitDepth": 12, "crop": (  0,   0, 4056, 3040), "fps":  10.00},
+]
+ROW_ALIGNMENT = 32                  # Rows of the raw-buffers are aligned to 32 bytes
+
+
+
+
+def NormalizeSensorModes(picam2Modes:list):
+    """Converts the modes of Picamera2.sensor_modes into the format of SENSOR_MODES_IMX477.
+
+    Args:
+        picam2Modes (list): Dicts with "size", "bit_depth", "crop_limits" and "fps".
+
+    Returns:
+        list: Sensor-modes.
+    """
+    return [{"size": tuple(_m["size"]),
+             "bitDepth": int(_m["bit_depth"]),
+             "crop": tuple(_m["crop_limits"]),
+             "fps": float(_m["fps"]),
+             } for _m in picam2Modes]
+
+
+def ModeBinning(mode:dict):
+    """Returns the binning-factor of a sensor-mode (sensor-pixels per raw-pixel in x)."""
+    return max(1, mode["crop"][2] // mode["size"][0])
+
+
+def ModeStride(mode:dict):
+    """Returns the bytes per row of the raw-buffer of a sensor-mode (packed CSI2P, aligned to ROW_ALIGNMENT)."""
+    rowBytes = mode["size"][0] * mode["bitDepth"] // 8
+    return -(-rowBytes // ROW_ALIGNMENT) * ROW_ALIGNMENT
+
+
+def ModeFrameBytes(mode:dict):
+    """Returns the bytes of one raw-frame of a sensor-mode."""
+    return ModeStride(mode) * mode["size"][1]
+
+
+def ModeWindow(mode:dict, clipWin:tuple):
+    """Maps a window in sensor-pixels into the raw-pixels of a sensor-mode.
+
+    Args:
+        mode (dict): Sensor-mode.
+        clipWin (tuple): Window (x, y, w, h) in sensor-pixels.
+
+    Returns:
+        (int, int, int, int): Window (x, y, w, h) in raw-pixels of the mode or None when it is not covered by the mode
+                              or doesn't start and end on a bayer-cell of the mode.
+    """
+    b = ModeBinning(mode)
+    cx, cy, cw, ch = mode["crop"]
+    x, y, w, h = clipWin
+    if x < cx or y < cy or x + w > cx + cw or y + h > cy + ch:
+        return None
+    if any([(_v % (2 * b)) != 0 for _v in (x - cx, y - cy, w, h)]):
+        return None
+    return (x - cx) // b, (y - cy) // b, w // b, h // b
+
+
+def SelectSensorMode(modes:list, clipWin:tuple, binning:int=1, bitDepth:int=BITDEPTH_SRGGB12):
+    """Selects the sensor-mode with the fewest bytes per frame, which covers the window and whose binning is
+    part of the requested binning (the residual binning is done in software).
+
+    Args:
+        modes (list): Sensor-modes (see SENSOR_MODES_IMX477).
+        clipWin (tuple): Window (x, y, w, h) in sensor-pixels.
+        binning (int, optional): Requested binning per colour-plane (modes with a binning which divides it are allowed). Defaults to 1.
+        bitDepth (int, optional): Bit-depth of the raw-data. Defaults to BITDEPTH_SRGGB12.
+
+    Returns:
+        dict: Sensor-mode or None when no mode fits.
+    """
+    candidates = [_m for _m in modes if _m["bitDepth"] == bitDepth
+                                     and binning % ModeBinning(_m) == 0
+                                     and ModeWindow(_m, clipWin) is not None]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda _m: (ModeFrameBytes(_m), -_m["fps"]))
+
+
+def FullSensorMode(modes:list, bitDepth:int=BITDEPTH_SRGGB12):
+    """Returns the unbinned mode with the largest area (full resolution)."""
+    full = [_m for _m in modes if _m["bitDepth"] == bitDepth and ModeBinning(_m) == 1]
+    return max(full, key=lambda _m: _m["size"][0] * _m["size"][1]) if full else None
+
+
+def ModeTable(modes:list):
+    """Returns a table of the sensor-modes with their frame-sizes and achievable rates.
+
+    Args:
+        modes (list): Sensor-modes.
+
+    Returns:
+        str: One line per mode "size;bitDepth;binning;crop;fps;MB/frame;MB/s".
+    """
+    lines = ["size;bitDepth;binning;crop;fps;MB/frame;MB/s"]
+    for _m in modes:
+        mb = ModeFrameBytes(_m) / 1e6
+        lines.append(";".join([f"{_m['size'][0]}x{_m['size'][1]}", str(_m["bitDepth"]), str(ModeBinning(_m)),
+                               ":".join([str(_c) for _c in _m["crop"]]), f"{_m['fps']:.2f}", f"{mb:.2f}", f"{mb * _m['fps']:.1f}"]))
+    return "\n".join(lines)
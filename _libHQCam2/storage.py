@@ -0,0 +1,357 @@
+import os
+import shutil
+from os.path import join, relpath, dirname, getsize
+from collections import OrderedDict, deque
+from threading import Thread, Condition
+from time import time, sleep
+
+
+
+SPILL_CHUNK_SIZE = 8 * 1024**2      # Bytes per read/write while spilling (large sequential writes)
+THROUGHPUT_WINDOW = 5.0             # Seconds over which the write-throughput is averaged
+MANAGER_INTERVAL = 0.5              # Seconds between the usage-checks of the manager-thread
+
+# States of a file on the storage
+FILE_STORED = "stored"              # On the (RAM-)disk
+FILE_ARCHIVED = "archived"          # On the (RAM-)disk and in an archive (can be evicted)
+FILE_SPILLED = "spilled"            # Moved to the spill-directory
+FILE_EVICTED = "evicted"            # Deleted from the (RAM-)disk
+
+
+
+
+class StoredFile:
+    """Saved file which is tracked by the StorageManager."""
+    def __init__(self, path:str, size:int, archivePending:bool=False):
+        self.path = path
+        self.size = size
+        self.state = FILE_STORED
+        self.archivePending = archivePending    # Queued in a live-archive: Must stay in place until it was archived
+
+
+
+
+class StoredSequence:
+    """Files of one capture (prefix), in order of saving."""
+    def __init__(self, prefix:str):
+        self.prefix = prefix
+        self.files = []
+        self.done = False                       # All files saved (only completed sequences are spilled without need)
+        self.fetched = False                    # The client fetched the files (evicted right away)
+
+
+
+
+class StorageManager:
+    """Keeps the (RAM-)disk of the captures from filling up: Every saved file is registered per sequence. A background-
+    thread watches the usage and, above highPct, frees space down to lowPct: First files which are archived or fetched
+    by the client are evicted, then completed sequences (oldest first) are spilled to the spill-directory with large
+    sequential writes. A writer which needs more space than is free waits in WaitForSpace() (back-pressure): The bounded
+    queues of the capture-pipeline fill up and the capture pauses until the space is freed, instead of failing.
+    """
+    def __init__(self, rootPath:str, ramdisk=None, spillPath:str=None, highPct:float=85.0, lowPct:float=70.0, reserveMB:int=64):
+        """Starts the manager.
+
+        Args:
+            rootPath (str): Folder of the captures on the (RAM-)disk.
+            ramdisk (RAMDisk, optional): Mounted RAM-disk (its usage is used). Defaults to None (usage of rootPath).
+            spillPath (str, optional): Target-folder of spilled files, e.g. on the SD-card; ignored on the filesystem
+                                       of rootPath. Defaults to None (no spilling).
+            highPct (float, optional): Usage in % above which space is freed. Defaults to 85.0.
+            lowPct (float, optional): Usage in % down to which space is freed. Defaults to 70.0.
+            reserveMB (int, optional): Space which WaitForSpace keeps free. Defaults to 64.
+        """
+        self.rootPath = rootPath
+        self.spillPath = self.__CheckSpillPath__(spillPath)
+        self.highPct = float(highPct)
+        self.lowPct = float(lowPct)
+        self.reserve = int(reserveMB) * 1024**2
+        self.__ramdisk__ = ramdisk
+        self.__seqs__ = OrderedDict()               # Prefix: StoredSequence (oldest first)
+        self.__files__ = {}                         # Path: StoredFile
+        self.__cond__ = Condition()
+        self.__needBytes__ = 0                      # Space awaited by WaitForSpace
+        self.__running__ = True
+        self.__written__ = deque()                  # (time, bytes) of the latest files (write-throughput)
+        self.__stats__ = {"written": 0, "spilled": 0, "spilledFiles": 0, "evicted": 0, "evictedFiles": 0,
+                          "tSpill": 0.0, "waits": 0, "tWait": 0.0, "errors": 0}
+        self.__thread__ = Thread(target=self.__ManageLoop__, name="StorageManager", daemon=True)
+        self.__thread__.start()
+
+
+    def Usage(self):
+        """Returns the usage of the storage.
+
+        Returns:
+            (int, int, int): Total, used and free bytes.
+        """
+        if self.__ramdisk__ is not None and self.__ramdisk__.IsMounted():
+            return self.__ramdisk__.Usage()
+        usage = shutil.disk_usage(self.rootPath)
+        return usage.total, usage.used, usage.free
+
+
+    def __CheckSpillPath__(self, spillPath:str):
+        # Spilling onto the filesystem of rootPath frees nothing (e.g. without RAM-disk: SD-card onto SD-card) and
+        # could copy a file onto itself: Spilling is disabled then
+        if not spillPath:
+            return None
+        def Existing(path:str):
+            path = os.path.realpath(path)
+            while not os.path.exists(path):         # The spill-directory is created on the first spill
+                path = dirname(path)
+            return path
+        spillReal = os.path.realpath(spillPath)
+        rootReal = os.path.realpath(self.rootPath)
+        if spillReal == rootReal or os.stat(Existing(spillPath)).st_dev == os.stat(Existing(self.rootPath)).st_dev:
+            print(f"StorageManager - Spilling disabled: {spillPath} is on the same filesystem as {self.rootPath}.")
+            return None
+        return spillPath
+
+
+    def Configure(self, spillPath:str=None, highPct:float=None, lowPct:float=None):
+        """Changes spill-directory (None = no spilling; ignored on the filesystem of rootPath) and thresholds (None = unchanged)."""
+        spillPath = self.__CheckSpillPath__(spillPath)
+        with self.__cond__:
+            self.spillPath = spillPath
+            self.highPct = self.highPct if highPct is None else float(highPct)
+            self.lowPct = self.lowPct if lowPct is None else float(lowPct)
+            self.__cond__.notify_all()
+
+
+    ####### Registration of the saved files #######
+    def BeginSequence(self, prefix:str):
+        """Starts (or continues) the sequence of a capture."""
+        with self.__cond__:
+            seq = self.__seqs__.get(prefix)
+            if seq is None:
+                self.__seqs__[prefix] = StoredSequence(prefix)
+            else:
+                seq.done = False
+
+
+    def EndSequence(self, prefix:str):
+        """Marks a sequence as completed (can be spilled)."""
+        with self.__cond__:
+            if prefix in self.__seqs__:
+                self.__seqs__[prefix].done = True
+                self.__cond__.notify_all()
+
+
+    def AddFile(self, path:str, prefix:str, archivePending:bool=False):
+        """Registers a saved file.
+
+        Args:
+            path (str): Filepath.
+            prefix (str): Sequence of the file (see BeginSequence).
+            archivePending (bool, optional): The file is queued in a live-archive (see MarkArchived). Defaults to False.
+        """
+        size = getsize(path)
+        with self.__cond__:
+            seq = self.__seqs__.get(prefix)
+            if seq is None:
+                seq = self.__seqs__[prefix] = StoredSequence(prefix)
+                seq.done = True                     # Single file outside of a capture
+            old = self.__files__.get(path)
+            if old is not None and old.state == FILE_STORED:    # Overwritten file
+                old.size = size
+                old.archivePending = archivePending
+                return
+            sf = StoredFile(path, size, archivePending)
+            self.__files__[path] = sf
+            seq.files.append(sf)
+            now = time()
+            self.__stats__["written"] += size
+            self.__written__.append((now, size))
+            while self.__written__ and self.__written__[0][0] < now - THROUGHPUT_WINDOW:
+                self.__written__.popleft()
+
+
+    def MarkArchived(self, path:str):
+        """Marks a file as archived, e.g. by a live-archive (can be evicted)."""
+        with self.__cond__:
+            sf = self.__files__.get(path)
+            if sf is not None and sf.state == FILE_STORED:
+                sf.state = FILE_ARCHIVED
+                sf.archivePending = False
+
+
+    def MarkArchivedFolder(self, folderPath:str):
+        """Marks all files inside a folder as archived (after the folder was archived)."""
+        folderPath = os.path.normpath(folderPath) + os.sep
+        with self.__cond__:
+            for _path, _sf in self.__files__.items():
+                if _path.startswith(folderPath) and _sf.state == FILE_STORED and not _sf.archivePending:
+                    _sf.state = FILE_ARCHIVED
+
+
+    def MarkFetched(self, prefix:str):
+        """Marks a sequence as fetched by the client: Its files on the (RAM-)disk are evicted right away.
+
+        Returns:
+            bool: False if the sequence is unknown.
+        """
+        with self.__cond__:
+            seq = self.__seqs__.get(prefix)
+            if seq is None:
+                return False
+            seq.fetched = True
+            for _sf in seq.files:
+                if _sf.state in (FILE_STORED, FILE_ARCHIVED) and not _sf.archivePending:
+                    self.__Evict__(_sf)
+            self.__Forget__(seq)
+            self.__cond__.notify_all()
+        return True
+
+
+    ####### Back-pressure #######
+    def WaitForSpace(self, nBytes:int, timeout:float=60.0):
+        """Blocks until nBytes (plus the reserve) are free. The manager frees space meanwhile (evicting/spilling).
+
+        Args:
+            nBytes (int): Bytes which are going to be written.
+            timeout (float, optional): Maximum wait in s. Defaults to 60.0.
+
+        Raises:
+            Exception: When the space is not freed in time (nothing left to evict or spill).
+
+        Returns:
+            float: Waited time in s.
+        """
+        if self.Usage()[2] - self.reserve >= nBytes:
+            return 0.0
+        start = time()
+        with self.__cond__:
+            self.__stats__["waits"] += 1
+            self.__needBytes__ = max(self.__needBytes__, int(nBytes) + self.reserve)
+            self.__cond__.notify_all()
+            while self.Usage()[2] - self.reserve < nBytes:
+                if time() - start > timeout:
+                    self.__needBytes__ = 0
+                    raise Exception(f"StorageManager - No space for {nBytes / 1024**2:.1f}MB on {self.rootPath} (nothing left to evict or spill).")
+                self.__cond__.wait(MANAGER_INTERVAL)
+            self.__needBytes__ = 0
+            waited = time() - start
+            self.__stats__["tWait"] += waited
+        return waited
+
+
+    ####### Manager-thread #######
+    def __Evict__(self, sf:StoredFile):
+        try:
+            os.remove(sf.path)
+        except FileNotFoundError:
+            pass
+        sf.state = FILE_EVICTED
+        self.__stats__["evicted"] += sf.size
+        self.__stats__["evictedFiles"] += 1
+
+
+    def __Forget__(self, seq:StoredSequence):
+        # Sequences without files on the (RAM-)disk are not tracked anymore
+        if all(_sf.state in (FILE_SPILLED, FILE_EVICTED) for _sf in seq.files):
+            self.__seqs__.pop(seq.prefix, None)
+            for _sf in seq.files:
+                self.__files__.pop(_sf.path, None)
+
+
+    def __Spill__(self, sf:StoredFile, buf:bytearray):
+        # Moves a file to the spill-directory (outside of the lock, the file is not changed anymore)
+        dst = join(self.spillPath, relpath(sf.path, self.rootPath) if sf.path.startswith(self.rootPath) else os.path.basename(sf.path))
+        os.makedirs(dirname(dst), exist_ok=True)
+        view = memoryview(buf)
+        with open(sf.path, "rb", buffering=0) as fSrc, open(dst, "wb", buffering=0) as fDst:
+            while True:
+                n = fSrc.readinto(buf)
+                if not n:
+                    break
+                fDst.write(view[:n])
+            os.fsync(fDst.fileno())         # On the SD-card before the RAM-copy is deleted
+        os.remove(sf.path)
+
+
+    def __Candidates__(self, pressure:bool):
+        # Files to free in order: archived/fetched ones (evict), completed sequences (spill), running sequences under back-pressure (spill)
+        evict = [_sf for _seq in self.__seqs__.values() for _sf in _seq.files if _sf.state == FILE_ARCHIVED]
+        spill = []
+        if self.spillPath:
+            for _done in (True, False):
+                if _done is False and not pressure:
+                    break
+                spill += [_sf for _seq in self.__seqs__.values() if _seq.done == _done
+                          for _sf in _seq.files if _sf.state == FILE_STORED and not _sf.archivePending]
+        return evict, spill
+
+
+    def __ManageLoop__(self):
+        buf = bytearray(SPILL_CHUNK_SIZE)
+        while self.__running__:
+            with self.__cond__:
+                self.__cond__.wait(MANAGER_INTERVAL)
+                total, used, free = self.Usage()
+                pressure = self.__needBytes__ > free
+                if not pressure and used * 100 < self.highPct * total:
+                    continue
+                target = max(used - self.lowPct * total / 100, self.__needBytes__ - free)
+                evict, spill = self.__Candidates__(pressure)
+                for _sf in evict:                   # Deleting is immediate
+                    if target <= 0:
+                        break
+                    self.__Evict__(_sf)
+                    target -= _sf.size
+                spill = spill if target > 0 else []
+                self.__cond__.notify_all()
+            for _sf in spill:                       # Spilling takes time: Writers can register new files meanwhile
+                if target <= 0 or not self.__running__:
+                    break
+                if _sf.state != FILE_STORED:        # Evicted meanwhile (fetched)
+                    continue
+                sSpill = time()
+                try:
+                    self.__Spill__(_sf, buf)
+                except FileNotFoundError:
+                    continue
+                except Exception as e:
+                    print(f"StorageManager - Spilling {_sf.path} failed: {e}")
+                    self.__stats__["errors"] += 1
+                    sleep(MANAGER_INTERVAL)
+                    break
+                target -= _sf.size
+                with self.__cond__:
+                    _sf.state = FILE_SPILLED
+                    self.__stats__["spilled"] += _sf.size
+                    self.__stats__["spilledFiles"] += 1
+                    self.__stats__["tSpill"] += time() - sSpill
+                    self.__cond__.notify_all()
+            with self.__cond__:
+                for _seq in list(self.__seqs__.values()):
+                    if _seq.done:
+                        self.__Forget__(_seq)
+
+
+    def Status(self):
+        """Returns usage and throughput: Bytes total/used/free, used %, tracked files/sequences, written MB/s (latest
+        THROUGHPUT_WINDOW s), spilled/evicted bytes and files, spill MB/s, back-pressure waits and waited seconds.
+        """
+        total, used, free = self.Usage()
+        with self.__cond__:
+            stats = dict(self.__stats__)
+            onDisk = [_sf for _sf in self.__files__.values() if _sf.state in (FILE_STORED, FILE_ARCHIVED)]
+            window = [_b for _t, _b in self.__written__ if _t >= time() - THROUGHPUT_WINDOW]
+            nSeqs = len(self.__seqs__)
+        return {"total": total, "used": used, "free": free, "usedPct": round(used * 100 / total, 1) if total else 0.0,
+                "files": len(onDisk), "sequences": nSeqs,
+                "writeMBps": round(sum(window) / THROUGHPUT_WINDOW / 1024**2, 1), "written": stats["written"],
+                "spilled": stats["spilled"], "spilledFiles": stats["spilledFiles"],
+                "spillMBps": round(stats["spilled"] / stats["tSpill"] / 1024**2, 1) if stats["tSpill"] > 0 else 0.0,
+                "evicted": stats["evicted"], "evictedFiles": stats["evictedFiles"],
+                "waits": stats["waits"], "waitS": round(stats["tWait"], 3), "spillPath": self.spillPath or "none",
+                "errors": stats["errors"]}
+
+
+    def Close(self):
+        """Stops the manager-thread (files stay where they are)."""
+        self.__running__ = False
+        with self.__cond__:
+            self.__cond__.notify_all()
+        self.__thread__.join()
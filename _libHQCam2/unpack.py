@@ -0,0 +1,171 @@
+import numpy as np
+
+
+
+# SRGGB12_CSI2P layout: 2 pixels are packed into 3 bytes
+#  Byte 0: P0[11:4]
+#  Byte 1: P1[11:4]
+#  Byte 2: P1[3:0] << 4 | P0[3:0]
+BITDEPTH_SRGGB12 = 12
+SATURATION_SRGGB12 = (1 << BITDEPTH_SRGGB12) - 1         # 0xFFF = Maximum sensor-value
+
+# Colour-planes of the RGGB-mosaic: (name, row-offset, column-offset) within a 2x2-cell
+BAYER_PLANES = (("R", 0, 0), ("Gr", 0, 1), ("Gb", 1, 0), ("B", 1, 1))
+
+
+
+
+def PackedWidth(pxWidth:int):
+    """Returns the amount of bytes a row of pxWidth 12-bit pixels uses in packed format.
+
+    Args:
+        pxWidth (int): Width in pixels (needs to be even).
+
+    Returns:
+        int: Width in bytes (pxWidth * 1.5).
+    """
+    return (pxWidth * 3) // 2
+
+
+def PixelWidth(byteWidth:int):
+    """Returns the amount of 12-bit pixels which are stored in byteWidth packed bytes.
+
+    Args:
+        byteWidth (int): Width in bytes (needs to be a multiple of 3).
+
+    Returns:
+        int: Width in pixels (byteWidth / 1.5).
+    """
+    return (byteWidth // 3) * 2
+
+
+
+
+def AllocUnpackBuffers(pxHeight:int, pxWidth:int):
+    """Allocates the reusable buffers for UnpackSRGGB12.
+
+    Args:
+        pxHeight (int): Height of the unpacked mosaic in pixels.
+        pxWidth (int): Width of the unpacked mosaic in pixels (needs to be even).
+
+    Returns:
+        (np.ndarray, np.ndarray): uint16-mosaic (pxHeight, pxWidth) and uint8-scratch (pxHeight, pxWidth/2).
+    """
+    out = np.empty((pxHeight, pxWidth), dtype=np.uint16)
+    scratch = np.empty((pxHeight, pxWidth // 2), dtype=np.uint8)
+    return out, scratch
+
+
+
+
+def UnpackSRGGB12(packed:np.ndarray, out:np.ndarray=None, scratch:np.ndarray=None):
+    """Decodes SRGGB12_CSI2P packed rows into a 16-bit bayer-mosaic.
+    All operations work on strided views and write directly into out (no astype-copy of the packed data).
+    When out and scratch are given (see AllocUnpackBuffers), nothing is allocated.
+
+    Args:
+        packed (np.ndarray): uint8 packed bayer-data (height, width*1.5). Can be a clipped view of the captured raw-array, as long as it starts on a 3-byte boundary.
+        out (np.ndarray, optional): uint16 output buffer (height, width). Defaults to None (gets allocated).
+        scratch (np.ndarray, optional): uint8 scratch buffer (height, width/2) for the low-nibbles. Defaults to None (gets allocated).
+
+    Returns:
+        np.ndarray: The unpacked mosaic (out).
+    """
+    pxHeight = packed.shape[0]
+    pxWidth = PixelWidth(packed.shape[1])
+    if out is None or scratch is None:
+        _out, _scratch = AllocUnpackBuffers(pxHeight, pxWidth)
+        out = _out if out is None else out
+        scratch = _scratch if scratch is None else scratch
+
+    lsb = packed[:, 2::3]                                                       # Shared low-nibbles of both pixels
+    for byte in range(2):
+        px = out[:, byte::2]
+        np.left_shift(packed[:, byte::3], 4, out=px, dtype=np.uint16)           # MSBs; widened by the ufunc, not by an astype-copy
+        if byte == 0:
+            np.bitwise_and(lsb, 0b1111, out=scratch)                            # P0[3:0]
+        else:
+            np.right_shift(lsb, 4, out=scratch)                                 # P1[3:0]
+        np.bitwise_or(px, scratch, out=px)
+    return out
+
+
+
+
+def UnpackSRGGB12Plane(packed:np.ndarray, iPlane:int, out:np.ndarray=None, scratch:np.ndarray=None):
+    """Decodes one colour-plane (see BAYER_PLANES) directly from SRGGB12_CSI2P packed rows, without unpacking the mosaic.
+    In a packed row the even pixels are byte 0 of every 3-byte group, the odd pixels byte 1, so a plane is a strided view.
+
+    Args:
+        packed (np.ndarray): uint8 packed bayer-data (height, width*1.5), starting on an even row and a 3-byte boundary.
+        iPlane (int): Index of the plane in BAYER_PLANES.
+        out (np.ndarray, optional): uint16 output buffer (height/2, width/2). Defaults to None (gets allocated).
+        scratch (np.ndarray, optional): uint8 scratch buffer (height/2, width/2). Defaults to None (gets allocated).
+
+    Returns:
+        np.ndarray: The unpacked plane (out).
+    """
+    _name, dy, dx = BAYER_PLANES[iPlane]
+    shape = (packed.shape[0] // 2, PixelWidth(packed.shape[1]) // 2)
+    out = np.empty(shape, dtype=np.uint16) if out is None else out
+    scratch = np.empty(shape, dtype=np.uint8) if scratch is None else scratch
+
+    rows = packed[dy::2][:shape[0]]
+    np.left_shift(rows[:, dx::3], 4, out=out, dtype=np.uint16)                 # MSBs
+    if dx == 0:
+        np.bitwise_and(rows[:, 2::3], 0b1111, out=scratch)                      # P0[3:0]
+    else:
+        np.right_shift(rows[:, 2::3], 4, out=scratch)                           # P1[3:0]
+    np.bitwise_or(out, scratch, out=out)
+    return out
+
+
+
+
+def PackSRGGB12(mosaic:np.ndarray, out:np.ndarray=None):
+    """Encodes a 16-bit bayer-mosaic (12-bit values) into SRGGB12_CSI2P packed rows (inverse of UnpackSRGGB12).
+
+    Args:
+        mosaic (np.ndarray): uint16 mosaic (height, width); width needs to be even.
+        out (np.ndarray, optional): uint8 output buffer (height, width*1.5). Defaults to None (gets allocated).
+
+    Returns:
+        np.ndarray: The packed rows (out).
+    """
+    pxHeight, pxWidth = mosaic.shape
+    out = np.empty((pxHeight, PackedWidth(pxWidth)), dtype=np.uint8) if out is None else out
+    p0 = mosaic[:, 0::2]
+    p1 = mosaic[:, 1::2]
+    np.right_shift(p0, 4, out=out[:, 0::3], casting="unsafe")                  # P0[11:4]
+    np.right_shift(p1, 4, out=out[:, 1::3], casting="unsafe")                  # P1[11:4]
+    lsb = out[:, 2::3]
+    np.left_shift(p1, 4, out=lsb, casting="unsafe")                             # P1[3:0] << 4 (upper bits are cut by uint8)
+    np.bitwise_or(lsb, p0 & 0b1111, out=lsb, casting="unsafe")                 # | P0[3:0]
+    return out
+
+
+
+
+class SRGGB12Unpacker:
+    """Holds the reusable buffers of UnpackSRGGB12 for one fixed window-size, so that a sequence can
+    unpack image by image without allocating.
+    """
+    def __init__(self, pxHeight:int, pxWidth:int):
+        self.pxHeight = pxHeight
+        self.pxWidth = pxWidth
+        self.__out__, self.__scratch__ = AllocUnpackBuffers(pxHeight, pxWidth)
+
+
+    def Unpack(self, packed:np.ndarray, out:np.ndarray=None):
+        """Unpacks the packed data. Without out, the internal buffer is returned (gets overwritten by the next call!).
+
+        Args:
+            packed (np.ndarray): uint8 packed bayer-data (pxHeight, pxWidth*1.5).
+            out (np.ndarray, optional): uint16 output buffer (pxHeight, pxWidth). Defaults to None (internal buffer).
+
+        Returns:
+            np.ndarray: The unpacked mosaic.
+        """
+        if out is None:
+            out = self.__out__
+        return UnpackSRGGB12(packed, out=out, scratch=self.__scratch__)
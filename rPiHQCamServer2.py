@@ -28,12 +28,31 @@ from time import time, sleep
 
 import socket
 import pickle
+import threading
+from itertools import count
 import numpy as np
 
 
 # Custom libs
-from _libHQCam2.archive import ArchiveFolder #, CompressFolder
+from _libHQCam2.archive import ArchiveFolder, TarArchiver, DecodeCompression #, CompressFolder
 from _libHQCam2.ramdisk import RAMDisk, CreateFolder4User
+from _libHQCam2.storage import StorageManager
+from _libHQCam2.unpack import SRGGB12Unpacker
+from _libHQCam2.pipeline import CapturePipeline, PipelineFrame, FrameSlots
+from _libHQCam2.procpool import ProcessPool, SharedArray, UnpackBinTask, POOL_SPLITS, SPLIT_ROWS
+from _libHQCam2.rawcodec import RawCodec
+from _libHQCam2.rawwriter import RawWriter, WRITE_MODES, WRITE_SYNC, WRITE_FILES, WRITE_APPEND
+from _libHQCam2.rawfile import WriteRawFrame, RawRecordBytes, RAWFILE_HEADER_SIZE, LAYOUT_PLAIN, LAYOUT_SRGGB12_PACKED, LAYOUT_BAYER_PLANES, LAYOUT_ROI_RECORD, LAYOUT_ROI_STATS
+from _libHQCam2.netframes import SendFrame, SendEndOfFrames
+from _libHQCam2.aioserver import AsyncCommandServer
+from _libHQCam2.protocol import CommandFramer, SplitCommand, FRAMING_AUTO
+from _libHQCam2.commands import CommandTable, Arg, VARARGS
+from _libHQCam2.ringbuffer import FrameRing, RingMemoryBudget
+from _libHQCam2.accumulate import FrameAccumulator, DecodeAccuProducts, ACCU_VAR
+from _libHQCam2.unpack import SATURATION_SRGGB12
+from _libHQCam2.roi import ROIList, ParseROI, ROIStats, ROIStatsWriter, ROI_STATS_FIELDS, ROI_STATS_FORMATS, ROI_STATS_BIN
+from _libHQCam2.sensormodes import SelectSensorMode, FullSensorMode, ModeBinning, ModeWindow, ModeTable
+from _libHQCam2.binning import Binner, BayerBinner, BinnedShape, BinnedBitDepth, BinDtype, BIN_SUM, BIN_MEAN, BIN_REDUCTIONS
 
 from _libHQCam2.misc import duration, how_long, DecodeBoolStr
 from _libHQCam2.Logger import StdOutLogger, LogLineLeft, LogLineLeftRight
@@ -61,6 +80,11 @@ nakStr = "nak"                                      # Standard-Response on failu
 port     = 5060                                     # Socket-Port
 servSock = None                                     # Object instance the socket
 servConn = None                                     # Object instance the client-connection
+srvr_MultiClient = False                            # True: asyncio-server for multiple concurrent clients; False: Single client with blocking socket
+asyncServer = None                                  # Object instance of the multi-client server
+srvr_CmdFraming = FRAMING_AUTO                      # Command-framing: "raw" (one recv = one command), "line" ("\n"-terminated, pipelining) or "auto" (line, or raw if the first command has no "\n"; see _libHQCam2.protocol)
+keepConnection = True                               # Set to False by SRV:CLOSE
+closeApp = False
 
 # Camera settings
 # See also into SetupCamera2
@@ -68,13 +92,42 @@ cam = None                                          # Object instance of PiCam2
 
 
 # Server settings
+srvr_SensorSize = (4056, 3040)                      # Px-Width and -Height of the raw bayer-data
+srvr_SensorModeAuto = False                         # True: A smaller raw sensor-mode (e.g. 2x2-binned) is selected per capture, when clip-window and binning allow it (see CAM:CONF:MODE)
 srvr_ClipWinBayer = [4056,3040]                     # Default Clip-Window:
                                                     #  - [width, height]            : Imagewidth and -height around the center
                                                     #  - [X1, Y1, width, height]    : Imagewidth and -height starting on the left upper corner (X1, Y1)
                                                     #  To avoid any problems, use only even numbers (0, 2, 4, ...).
                                                     #  Odd numbers lead to half-indicies (*.5) which are not exist!
+srvr_ROIs = None                                    # ROIList: Only these regions are extracted from each frame (replaces the clip-window, see SRV:IMG:ROIS)
+srvr_ROIStats = None                                # "csv"/"bin": Only statistics of the ROIs are saved per frame instead of the images (see SRV:IMG:ROISTAT)
 srvr_DemosaicClippedBayerImgs = False               # True: Server saves demosaicked images; False: Server saves RAW Bayer images
 srvr_ShrinkHalfDemosaicedIterations = 0             # 2^x pixels in X and Y are combined to one value (artificial pixel-binning)
+srvr_BinFactors = None                              # (fy, fx) pixels combined to one value (see SRV:IMG:BIN); None = 2^srvr_ShrinkHalfDemosaicedIterations
+srvr_BinReduction = BIN_SUM                         # Reduction of the binned pixels: "sum", "mean" or "max"
+srvr_BayerBinning = 0                               # >0: f x f pixels of each colour-plane (R, Gr, Gb, B) are binned directly from the packed data (see SRV:IMG:BAYBIN)
+srvr_BayerLuminance = False                         # True: The binned colour-planes are combined into one luminance-plane
+srvr_Accumulate = []                                # Products of the accumulation of nPics per SS ("sum", "mean", "var"); [] = every image is saved
+srvr_SavePickle = False                             # True: Images are saved as pickled numpy-arrays (former format); False: Raw-container (see _libHQCam2.rawfile)
+srvr_Codec = None                                   # RawCodec: Lossless compression of the saved raw-containers (see SRV:IMG:CODEC); None = uncompressed
+srvr_WriteMode = WRITE_FILES                        # "files": Frames are written in batches by a writer-thread; "append": One sequence-file per capture; "sync": Former direct writes (see SRV:IMG:WRITER)
+srvr_WriteBatchMB = 32                              # Size of a write-batch of the writer-thread
+srvr_WritePrealloc = False                          # True: The space of the files is reserved before writing (posix_fallocate)
+srvr_WriteDirect = False                            # True: Files are written with O_DIRECT (bypasses the page-cache, e.g. for the SD-card)
+srvr_PipelineWorkers = 2                            # Amount of post-processing threads of the capture-pipeline
+srvr_ProcessWorkers = 0                             # >0: Unpacking/binning is done by worker-processes on shared memory (see SRV:PROC:WORKERS); 0 = only the pipeline-threads
+srvr_ProcessSplit = SPLIT_ROWS                      # "rows": Each frame is split into row-bands over all processes; "frames": One frame per process
+procPool = None                                     # Object instance of the ProcessPool
+procInput = None                                    # Shared packed input-slots of the process-pool (one per pipeline-thread)
+seqSlots = None                                     # Preallocated result-slots of CaptureShutterspeedSequence (reused while the layout stays the same)
+liveArchive = None                                  # TarArchiver which gets every saved file right away (see SRV:ARCHV:LIVE)
+ring = None                                         # Ring-buffer of the continuous capture (see CAP:RING:START)
+ringClipWin = None                                  # Clip-window (x, y, w, h) of the frames in the ring-buffer
+srvr_RingReserveMB = 256                            # RAM which is kept free next to ring-buffer and RAM-disk
+storage = None                                      # StorageManager of the image folder (back-pressure, spilling, eviction; see SRV:STORE:CONF)
+srvr_SpillPath = SDCardPath                         # Completed sequences are spilled here when the RAM-disk fills up; None = no spilling
+srvr_StoreHighPct = 85                              # Usage of the RAM-disk in % above which space is freed (evicting archived/fetched files, spilling)
+srvr_StoreLowPct = 70                               # Usage in % down to which space is freed
 
 
 # Logger (can be used optional)
@@ -206,6 +259,58 @@ def Server_ClipWinBayerImage(ClipWinBayerByServer):
 
 
 
+def Server_ROIs(ROIArgs:list):
+    """Registers a list of regions of interest. Each frame is reduced to one compact record of these ROIs
+    (packed bytes, or 16-bit pixels with SRV:IMG:DBAY/SRV:IMG:ACCU) instead of the clip-window; binning is not applied.
+
+    Args:
+        ROIArgs (list): ROIs "x:y:w:h" in sensor-pixels (rounded down to even values) or "0"/"none" to remove the list.
+
+    Returns:
+        str: Standard "ack" or "nak"
+    """
+    global srvr_ROIs
+
+    if len(ROIArgs) == 0 or ROIArgs[0].lower() in ("0", "none", "off"):
+        srvr_ROIs = None
+        return ackStr
+    rois = [ParseROI(_roi) for _roi in ROIArgs]
+    for _x, _y, _w, _h in rois:
+        if _x + _w > srvr_SensorSize[0] or _y + _h > srvr_SensorSize[1]:
+            print(f"ROI {_x}:{_y}:{_w}:{_h} exceeds the sensor {srvr_SensorSize[0]}x{srvr_SensorSize[1]}")
+            return nakStr
+    srvr_ROIs = ROIList(rois)
+    LogLineLeftRight("ROIs:", f"{len(srvr_ROIs)} ROIs, {srvr_ROIs.nBytes} bytes per frame")
+    return ackStr
+
+
+def Server_ROIStats(Format:str):
+    """Adjusts if only statistics of the ROIs (sum, peak, centroid, saturated pixels) are saved per frame instead of the images.
+    All rows of a sequence are appended to <Prefix>_ROIStats.csv (or .raw for "bin"); streamed sequences send one
+    float64-row per frame. Accumulation is not applied.
+
+    Args:
+        Format (str): "csv", "bin" or "0" = off.
+
+    Returns:
+        str: Standard "ack" or "nak"
+    """
+    global srvr_ROIStats
+
+    Format = Format.lower()
+    if Format in ("0", "off", "none", "false", "no", "n"):
+        srvr_ROIStats = None
+        return ackStr
+    if Format not in ROI_STATS_FORMATS:
+        print(f"Unknown ROI-statistics format \"{Format}\" (supported: {ROI_STATS_FORMATS})")
+        return nakStr
+    srvr_ROIStats = Format
+    return ackStr
+
+
+
+
+
 def Server_DemosaicClippedBayerImgs(DebayerByServer:bool):
     """Adjusts the option if the PyCam2 Server should demosaick the images before save.
 
@@ -215,11 +320,13 @@ def Server_DemosaicClippedBayerImgs(DebayerByServer:bool):
     Returns:
         str: Standard "ack" or "nak"
     """
-    global srvr_DemosaicClippedBayerImgs
+    global srvr_DemosaicClippedBayerImgs, srvr_BayerBinning
 
     srvr_DemosaicClippedBayerImgs = DecodeBoolStr(DebayerByServer)
     if not srvr_DemosaicClippedBayerImgs:                # Shrinking needs debayered data
         Server_SWPixelBinning("0")
+    else:                                               # Mosaic is saved -> No colour-plane binning
+        srvr_BayerBinning = 0
     return ackStr
 
 
@@ -236,9 +343,10 @@ def Server_SWPixelBinning(pxBinIters:int):
     Returns:
         str: Standard "ack" or "nak"
     """
-    global srvr_ShrinkHalfDemosaicedIterations
+    global srvr_ShrinkHalfDemosaicedIterations, srvr_BinFactors
 
     srvr_ShrinkHalfDemosaicedIterations = int(pxBinIters)
+    srvr_BinFactors = None
 
     if srvr_ShrinkHalfDemosaicedIterations < 0:
         srvr_ShrinkHalfDemosaicedIterations = 0
@@ -249,6 +357,186 @@ def Server_SWPixelBinning(pxBinIters:int):
     return ackStr
 
 
+def Server_Binning(BinFactors:str, Reduction:str=BIN_SUM):
+    """Adjusts the software pixel-binning by arbitrary factors (generalization of SRV:IMG:SRNK).
+
+    Args:
+        BinFactors (str): "<fy>:<fx>" or "<f>" pixels in y and x which are combined to one value.
+        Reduction (str, optional): "sum" (dtype widened to uint32 when 16 bit are exceeded), "mean" or "max". Defaults to "sum".
+
+    Returns:
+        str: Standard "ack" or "nak"
+    """
+    global srvr_BinFactors, srvr_BinReduction
+
+    factors = [int(_f) for _f in BinFactors.split(":")]
+    if len(factors) == 1:
+        factors = factors * 2
+    if len(factors) != 2 or min(factors) < 1 or Reduction not in BIN_REDUCTIONS:
+        return nakStr
+    Server_SWPixelBinning("0")
+    srvr_BinFactors = tuple(factors)
+    srvr_BinReduction = Reduction
+    if max(factors) > 1:                                # For binning, data must be debayered!
+        Server_DemosaicClippedBayerImgs("1")
+    return ackStr
+
+
+def Server_BayerBinning(BinFactor:int, Luminance:str="0"):
+    """Adjusts the colour-plane binning: Each of the four bayer-planes (R, Gr, Gb, B) is binned separately, directly from
+    the packed data (no demosaic/mosaic-binning which mixes the colours). Uses the reduction of SRV:IMG:BIN.
+
+    Args:
+        BinFactor (int): f x f pixels of each plane (= 2f x 2f sensor-pixels) are combined to one value; 0 = off.
+        Luminance (str, optional): True: The binned planes are combined into one luminance-plane. Defaults to "0".
+
+    Returns:
+        str: Standard "ack" or "nak"
+    """
+    global srvr_BayerBinning, srvr_BayerLuminance
+
+    BinFactor = int(BinFactor)
+    if BinFactor < 0:
+        return nakStr
+    if BinFactor > 0:                                   # Replaces demosaic and mosaic-binning
+        Server_DemosaicClippedBayerImgs("0")
+    srvr_BayerBinning = BinFactor
+    srvr_BayerLuminance = DecodeBoolStr(Luminance)
+    return ackStr
+
+
+def BinFactors():
+    """Returns the binning-factors (fy, fx) of the current settings (SRV:IMG:BIN or SRV:IMG:SRNK)."""
+    if srvr_BinFactors is not None:
+        return srvr_BinFactors
+    return (2 ** srvr_ShrinkHalfDemosaicedIterations,) * 2
+
+
+def Server_ProcessPool(nWorkers:int, Split:str=SPLIT_ROWS):
+    """(Re-)Starts the pool of worker-processes which unpack and bin the frames on shared memory, so all cores are used
+    without the GIL. The pipeline-threads copy the packed clip-window into a shared input-slot, the processes write the
+    result directly into the shared result-slot.
+    The workers are forked (see POOL_START_METHOD), so they can only be started before the camera: A fork of the running
+    server copies the locks of the camera-, pipeline- and server-threads in whatever state they are, which can deadlock
+    the workers. Set srvr_ProcessWorkers for the start; at runtime the pool can only be stopped ("0").
+
+    Args:
+        nWorkers (int): Amount of worker-processes; 0 = off (unpacking/binning by the pipeline-threads).
+        Split (str, optional): "rows" (each frame in row-bands over all processes) or "frames" (one frame per process). Defaults to "rows".
+
+    Returns:
+        str: Standard "ack" or "nak"
+    """
+    global srvr_ProcessWorkers, srvr_ProcessSplit, procPool
+
+    nWorkers = int(nWorkers)
+    Split = Split.lower()
+    if nWorkers < 0 or Split not in POOL_SPLITS:
+        print(f"Invalid process-pool {nWorkers} {Split} (supported splits: {POOL_SPLITS})")
+        return nakStr
+    if nWorkers > 0 and cam is not None:
+        print("The process-pool can only be started before the camera (set srvr_ProcessWorkers); \"0\" stops it")
+        return nakStr
+    ProcessPoolStop()
+    srvr_ProcessWorkers = nWorkers
+    srvr_ProcessSplit = Split
+    if nWorkers > 0:
+        procPool = ProcessPool(nWorkers, Split)
+    LogLineLeftRight("Process-pool:", f"{nWorkers} workers, split by {Split}" if nWorkers > 0 else "off")
+    return ackStr
+
+
+def ProcessPoolStop():
+    """Stops the worker-processes and releases the shared input-slots."""
+    global procPool, procInput
+
+    if procPool is not None:
+        procPool.Close()
+        procPool = None
+    if procInput is not None:
+        procInput.Close()
+        procInput = None
+
+
+def Server_SavePickle(SaveAsPickle:bool):
+    """Adjusts the file-format of the captured images.
+
+    Args:
+        SaveAsPickle (bool): True: Pickled numpy-arrays (former format); False: Raw-container (header + pixel-data, readable by _libHQCam2.rawfile.ReadRawFrame)
+
+    Returns:
+        str: Standard "ack" or "nak"
+    """
+    global srvr_SavePickle
+
+    srvr_SavePickle = DecodeBoolStr(SaveAsPickle)
+    return ackStr
+
+
+def Server_Codec(Codec:str):
+    """Adjusts the lossless compression of the saved raw-containers (done by the pipeline-threads, decoded by
+    _libHQCam2.rawfile.ReadRawFrame). Streamed frames and pickled images stay uncompressed.
+
+    Args:
+        Codec (str): Transform, entropy-coder and level separated by ":", e.g. "delta:zlib:1", "shuffle:zst:3" or "pack12" (see _libHQCam2.rawcodec); "0" = off
+
+    Returns:
+        str: Standard "ack" or "nak"
+    """
+    global srvr_Codec
+
+    try:
+        srvr_Codec = RawCodec.FromStr(Codec)
+    except Exception as e:
+        print(e)
+        return nakStr
+    LogLineLeftRight("Codec:", str(srvr_Codec) if srvr_Codec is not None else "uncompressed")
+    return ackStr
+
+
+def Server_Writer(Mode:str, BatchMB:str="32", Prealloc:str="0", Direct:str="0"):
+    """Adjusts how the captured frames are written (raw-containers, see _libHQCam2.rawwriter.RawWriter): The frames are
+    copied into batches which are written by a writer-thread; the files are fsync'ed at the end of each capture.
+
+    Args:
+        Mode (str): "files" (one file per frame), "append" (one sequence-file <Prefix>_seq.raw per capture, readable by
+                    _libHQCam2.rawfile.ReadRawSequence) or "sync" (former writes by the pipeline, no batches/fsync).
+        BatchMB (str, optional): Size of a batch in MB. Defaults to "32".
+        Prealloc (str, optional): Reserve the space of the files before writing (posix_fallocate). Defaults to "0".
+        Direct (str, optional): Write with O_DIRECT (e.g. for the SD-card). Defaults to "0".
+
+    Returns:
+        str: Standard "ack" or "nak"
+    """
+    global srvr_WriteMode, srvr_WriteBatchMB, srvr_WritePrealloc, srvr_WriteDirect
+
+    Mode = Mode.lower()
+    if Mode not in WRITE_MODES:
+        print(f"Unknown write-mode \"{Mode}\" (supported: {WRITE_MODES})")
+        return nakStr
+    srvr_WriteMode = Mode
+    srvr_WriteBatchMB = max(1, int(BatchMB))
+    srvr_WritePrealloc = DecodeBoolStr(Prealloc)
+    srvr_WriteDirect = DecodeBoolStr(Direct)
+    return ackStr
+
+
+def Server_Accumulate(AccuProducts:str):
+    """Adjusts if the nPics images per SS are accumulated on the pi instead of saving every image.
+    The images are summed up as they arrive; only the products and the saturation-counts per pixel are saved.
+
+    Args:
+        AccuProducts (str): Products separated by ":" ("sum": uint32-sum, "mean": float32-mean, "var": float32-variance), e.g. "mean:var"; "0" = off
+
+    Returns:
+        str: Standard "ack" or "nak"
+    """
+    global srvr_Accumulate
+
+    srvr_Accumulate = DecodeAccuProducts(AccuProducts)
+    return ackStr
+
+
 # def Server_Compress(compressPath:str, tarGzFName:str, Multicore=True, SuppressParents=True):
 #     sCmprss = time()
 #     retVal = CompressFolder(compressPath, tarGzFName, Multicore, SuppressParents)
@@ -259,13 +547,13 @@ def Server_SWPixelBinning(pxBinIters:int):
 
 
 
-def Server_Archive(archiveFolderPath:str, archiveFName:str, compress:bool=True, multicore:bool=True, suppressParents:bool=True):
-    """Converts the given folder into archive. Optionally it can compress the archive and use multicore to speed up the compression.
+def Server_Archive(archiveFolderPath:str, archiveFName:str, compress:str="1", multicore:bool=True, suppressParents:bool=True):
+    """Converts the given folder into archive (in-process, see _libHQCam2.archive.TarArchiver). Optionally it can compress the archive and use multicore to speed up the compression.
 
     Args:
         archiveFolderPath (str): Folderpath which should be archived.
         archiveFName (str): Target archive filename.
-        compress (bool, optional): Should the *.tar get compressed to *.tar.gz. Defaults to True.
+        compress (str, optional): "1"/"0" (*.tar.gz/*.tar) or a compression with level, e.g. "gz:1" or "zst:3". Defaults to "1".
         multicore (bool, optional): Use multiple cores to compress. Defaults to True.
         suppressParents (bool, optional): Only archive the foldercontents not including the parent folder (archiveFolderPath). Defaults to True.
 
@@ -274,66 +562,133 @@ def Server_Archive(archiveFolderPath:str, archiveFName:str, compress:bool=True,
     """
     sCmprss = time()
     retVal = ArchiveFolder(archiveFolderPath, archiveFName, compress, multicore, suppressParents)
-    how_long(sCmprss, "Archiving" + ("+Compression" if compress else ""))
+    how_long(sCmprss, "Archiving" + ("+Compression" if DecodeCompression(compress)[0] else ""))
+    if retVal == 0 and storage is not None:
+        storage.MarkArchivedFolder(archiveFolderPath)       # Can be evicted when the RAM-disk fills up
     return ackStr if retVal == 0 else nakStr
 
 
-def ConfAwait(tVal, SetFunc, GetFunc, LoBnd=0.95, HiBnd=1.05, MaxTries=10):
-    """Generic waiting function if a value which was configured to the camera is in the target tolerance.
-    For that it uses the given set and get functions including tolerance-values and a maximum try-counter.
+def Server_ArchiveStream(archiveFolderPath:str, compress:str="0", StreamConn:socket.socket=None):
+    """Streams the archive of a folder over the connection (length-prefixed chunks, see _libHQCam2.netframes.RecvBytes)
+    without writing it to the (ram)disk.
 
     Args:
-        tVal (_type_): Target value or iterable object with values which should be set.
-        SetFunc (_type_): Function to set the target value.
-        GetFunc (_type_): Function to read out the current value.
-        LoBnd (float, optional): Lower tolerance in %. Defaults to 0.95.
-        HiBnd (float, optional): Upper tolernace in %. Defaults to 1.05.
-        MaxTries (int, optional): Amount of tries before returning failure. Defaults to 10.
+        archiveFolderPath (str): Folderpath which should be archived.
+        compress (str, optional): Compression, e.g. "0", "gz:1" or "zst". Defaults to "0".
+        StreamConn (socket, optional): Connection of the client.
 
     Returns:
-        _type_, bool: Returns the current value set and if a timeout-occured (more tries than MaxTries)
+        str: Standard "ack" or "nak"
     """
+    sCmprss = time()
+    archiver = TarArchiver(StreamConn, *DecodeCompression(compress))
+    archiver.AddFolder(archiveFolderPath)
+    archiver.Close()
+    if storage is not None:
+        storage.MarkArchivedFolder(archiveFolderPath)
+    how_long(sCmprss, f"Streaming archive of {archiver.nFiles} files ({archiver.nBytes / 1024**2:.1f}MB)")
+    return ackStr
+
+
+def Server_ArchiveLive(archiveFName:str, compress:str="0"):
+    """Opens an archive which gets every file right after it was saved by the captures, so archiving overlaps with
+    the capture. The archive is finished with "0".
+
+    Args:
+        archiveFName (str): Target archive filename or "0" to finish the current archive.
+        compress (str, optional): Compression, e.g. "0", "gz:1" or "zst". Defaults to "0".
+
+    Returns:
+        str: Standard "ack" or "nak"
+    """
+    global liveArchive
+
+    if liveArchive is not None:
+        archiver = liveArchive
+        liveArchive = None
+        archiver.Close()
+        LogLineLeftRight("Live-archive finished:", f"{archiver.nFiles} files ({archiver.nBytes / 1024**2:.1f}MB)")
+    if archiveFName.lower() not in ("0", "off", "none"):
+        liveArchive = TarArchiver(archiveFName, *DecodeCompression(compress), arcRoot=imFolderPath,
+                                  onArchived=storage.MarkArchived if storage is not None else None)
+    return ackStr
 
-    SetFunc(tVal)
-    try:
-        valIsList = True
-        _ = (e for e in tVal)  # Dummy if exception occures -> Then its not iterable
-    except TypeError:
-        valIsList = False
-        tVal = [tVal]
-    
-    # Do the checks
-    nVals = len(tVal)
-    vInRange = [False] * nVals
-    # start = time()
-    while MaxTries > 0:
-        cVal = GetFunc()
-        for _iVal in range(len(tVal)):
-            _tVal = tVal[_iVal]
-            lo = _tVal * LoBnd
-            hi = _tVal * HiBnd
-            
-            if valIsList:
-                _cVal = cVal[_iVal]
-            else:
-                _cVal = cVal
 
-            if _cVal >= lo and _cVal <= hi:
-                vInRange[_iVal] = True
-            # sleep(0.05) # GetFunc always gets via cam.capture_metadata() which waits for a frame
-        
-        if _iVal == (nVals-1) and all(vInRange):
-            break
-        MaxTries -= 1
-    # how_long(start, "inner loop")
+def ArchiveLiveAdd(fName:str):
+    """Hands a saved file over to the live-archive (if one is open)."""
+    if liveArchive is not None:
+        liveArchive.Add(fName)
 
-    timedout = True if MaxTries <= 0 else False
 
-    return cVal, timedout
+def FileSaved(fName:str, Prefix:str):
+    """Registers a saved file of a capture at the storage-manager and hands it over to the live-archive (if one is open)."""
+    if storage is not None:
+        storage.AddFile(fName, Prefix, archivePending=liveArchive is not None)
+    ArchiveLiveAdd(fName)
 
 
+def AwaitStorage(nBytes:int):
+    """Back-pressure: Blocks the writer until nBytes are free on the RAM-disk (see StorageManager.WaitForSpace)."""
+    if storage is not None:
+        waited = storage.WaitForSpace(nBytes)
+        if waited > 0:
+            LogLineLeftRight("Waited for storage:", f"{waited:.3f}s")
 
 
+def Server_StorageConf(SpillPath:str, HighPct:str="85", LowPct:str="70"):
+    """Adjusts the storage-manager of the image folder: Above HighPct usage, archived/fetched files are evicted and
+    completed sequences are spilled to SpillPath (in the background, down to LowPct).
+
+    Args:
+        SpillPath (str): Target-folder of spilled sequences (e.g. the SD-card) or "0" = no spilling.
+        HighPct (str, optional): Usage in % above which space is freed. Defaults to "85".
+        LowPct (str, optional): Usage in % down to which space is freed. Defaults to "70".
+
+    Returns:
+        str: Standard "ack" or "nak"
+    """
+    global srvr_SpillPath, srvr_StoreHighPct, srvr_StoreLowPct
+
+    highPct = float(HighPct)
+    lowPct = float(LowPct)
+    if not 0 < lowPct <= highPct <= 100:
+        print(f"Invalid storage-thresholds {lowPct}% / {highPct}% (0 < low <= high <= 100)")
+        return nakStr
+    srvr_SpillPath = None if SpillPath.lower() in ("0", "off", "none") else SpillPath
+    srvr_StoreHighPct = highPct
+    srvr_StoreLowPct = lowPct
+    if storage is not None:
+        storage.Configure(srvr_SpillPath, highPct, lowPct)
+        srvr_SpillPath = storage.spillPath          # None if on the filesystem of the image folder
+    return ackStr
+
+
+def Server_StorageFetched(Prefix:str):
+    """Notifies that the client fetched the files of a capture: They are removed from the RAM-disk right away.
+
+    Args:
+        Prefix (str): Prefix of the capture (CAP:SEQFET, CAP:RING:TRG).
+
+    Returns:
+        str: Standard "ack" or "nak" (unknown prefix)
+    """
+    if storage is None or not storage.MarkFetched(Prefix):
+        return nakStr
+    return ackStr
+
+
+def StorageStatus():
+    """Returns usage and throughput of the image folder "total=<bytes>;used=<bytes>;free=<bytes>;usedPct=...;writeMBps=...;spilled=...;..." or "none"."""
+    if storage is None:
+        return "none"
+    return ";".join([f"{key}={val}" for key, val in storage.Status().items()])
+
+
+def ArchiveStatus():
+    """Returns the progress of the live-archive "files=<archived>;bytes=<archived>;queued=<waiting>" or "none"."""
+    if liveArchive is None:
+        return "none"
+    return ";".join([f"{key}={val}" for key, val in liveArchive.Status().items()])
 
 
 def ConfShutterspeed(tVal:int, LoBnd:float=0.95, HiBnd:float=1.05):
@@ -371,8 +726,9 @@ def ConfShutterspeed(tVal:int, LoBnd:float=0.95, HiBnd:float=1.05):
     ### how_long(startCheck, "SS await")
     ### how_long(start, str.format("SS-Change S:{}, I:{} - Timeout:{}", tVal, cur_ss, False))
     
-    if tVal > 0:
-        cVal, TO = ConfAwait(tVal, cam.SetSS, cam.GetSS, LoBnd=LoBnd, HiBnd=HiBnd, MaxTries=15)
+    if tVal > 0:    # Returns with the first frame which has the requested exposure
+        cVals, TO = cam.SetAwait({"AeEnable": False, "ExposureTime": tVal}, checks=["ExposureTime"], LoBnd=LoBnd, HiBnd=HiBnd, MaxFrames=15)
+        cVal = cVals["ExposureTime"]
     else:
         cam.SetSS(tVal)
         cVal = cam.GetSS()
@@ -397,7 +753,8 @@ def ConfAnalogGain(tVal:str="1.0"):
     """
     start = time()
     tVal = float(tVal)
-    cVal, TO = ConfAwait(tVal, cam.SetAG, cam.GetAG)
+    cVal, TO = cam.SetAwait({"AnalogueGain": tVal})
+    cVal = cVal["AnalogueGain"]
     how_long(start, str.format("AG-Change S:{}, I:{} - Timeout:{}", tVal, cVal, TO))
     return ackStr
 
@@ -416,7 +773,8 @@ def ConfWhiteBalance(tVal="1.0:1.0"):
     """
     start = time()
     tVal = [float(v) for v in tVal.split(":")]
-    cVal, TO = ConfAwait(tVal, cam.SetAWB, cam.GetAWB)
+    cVal, TO = cam.SetAwait({"ColourGains": tuple(tVal)})
+    cVal = cVal["ColourGains"]
     how_long(start, str.format("AWB-Change S:{}, I:{} - Timeout:{}", tVal, cVal, TO))
     return ackStr
 
@@ -439,11 +797,63 @@ def ConfScalerCrop(offsetXY="0:0", sizeWH="4056:3040"):
     offsetXY = list(offsetXY.split(":"))
     sizeWH = list(sizeWH.split(":"))
     tVal = [int(v) for v in offsetXY + sizeWH]
-    cVal, TO = ConfAwait(tVal, cam.SetScalerCrop, cam.GetScalerCrop)
+    cVal, TO = cam.SetAwait({"ScalerCrop": tVal})
+    cVal = cVal["ScalerCrop"]
     how_long(start, str.format("ScalerCrop-Change S:{}, I:{} - Timeout:{}", tVal, cVal, TO))
     return ackStr
 
 
+def ConfSensorMode(Mode:str="auto"):
+    """Adjusts if the raw sensor-mode is selected automatically per capture (see ApplySensorMode).
+    In contrast to the ScalerCrop (only applied by the ISP), a smaller sensor-mode reduces the bytes which are read out
+    and transferred per frame.
+
+    Args:
+        Mode (str, optional): "auto" or "full" (always the full resolution). Defaults to "auto".
+
+    Returns:
+        str: Standard "ack" or "nak"
+    """
+    global srvr_SensorModeAuto
+
+    Mode = Mode.lower()
+    if Mode in ("auto", "1", "true", "yes", "y"):
+        srvr_SensorModeAuto = True
+    elif Mode in ("full", "0", "false", "no", "n"):
+        srvr_SensorModeAuto = False
+        if cam.GetRing() is None:                   # Else applied when the ring-buffer is (re)started
+            cam.SetSensorMode(FullSensorMode(cam.GetSensorModes()))
+    else:
+        print(f"Unknown sensor-mode \"{Mode}\" (supported: auto, full)")
+        return nakStr
+    return ackStr
+
+
+def SensorModes():
+    """Returns the table of the raw sensor-modes (size, bit-depth, binning, crop, fps, MB/frame, MB/s) and the active mode."""
+    mode = cam.GetSensorMode()
+    return ModeTable(cam.GetSensorModes()) + f"\nactive;{mode['size'][0]}x{mode['size'][1]};auto={srvr_SensorModeAuto}"
+
+
+def ApplySensorMode(binning:int=1):
+    """Selects the raw sensor-mode with the fewest bytes per frame for the current clip-window (see srvr_SensorModeAuto;
+    the full mode otherwise).
+    Binned modes are only selected when their binning is part of the requested binning per colour-plane.
+    While the ring-buffer runs, the mode is kept: Its slots and clip are laid out for the frames of the active mode.
+
+    Args:
+        binning (int, optional): Binning per colour-plane which may be done by the sensor. Defaults to 1.
+
+    Returns:
+        dict: Active sensor-mode.
+    """
+    if cam.GetRing() is None:
+        modes = cam.GetSensorModes()
+        mode = SelectSensorMode(modes, ClipWindowPx(), binning) if srvr_SensorModeAuto else None
+        cam.SetSensorMode(mode if mode is not None else FullSensorMode(modes))
+    return cam.GetSensorMode()
+
+
 
 
 
@@ -459,7 +869,8 @@ def ConfFramerate(FR="10.0"):
     """
     start = time()
     tVal = float(FR)
-    cVal, TO = ConfAwait(tVal, cam.SetFR, cam.GetFR)
+    cVal, TO = cam.SetFR(tVal)      # Live control where possible, reconfigure otherwise
+    cVal = 1e6 / cVal["FrameDurationLimits"] if cVal.get("FrameDurationLimits") else None
     how_long(start, str.format("FrameRate-Change S:{}, I:{} - Timeout:{}", tVal, cVal, TO))
     return ackStr
 
@@ -467,36 +878,64 @@ def ConfFramerate(FR="10.0"):
 
 
 
-def CaptureShutterspeedSequence(Prefix:str, StorePath:str, SS:str="1000:3150:10000:31500", nPics:str="3", tMax:str="3.0", SaveSSLog:str="True"):
-    """Captures a sequence of raw images and stores them on (ram)disk.
+# Keys of CAM:CONF:MULTI -> (Control, Converter of the value-string)
+confCtrls = {"SS":      ("ExposureTime",        lambda v: int(v)),                                  # ShutterSpeed in µs (0 = Auto)
+             "AG":      ("AnalogueGain",        lambda v: float(v)),                                # AnalogGain
+             "AWB":     ("ColourGains",         lambda v: tuple(float(_v) for _v in v.split(":"))), # R:B
+             "SCLCRP":  ("ScalerCrop",          lambda v: [int(_v) for _v in v.split(":")]),        # X:Y:W:H
+             "FR":      ("FrameDurationLimits", lambda v: (int(1e6 / float(v)),) * 2),              # FrameRate in FPS
+             }
 
-    Args:
-        Prefix (str): Image-prefix.
-        StorePath (_type_): Path where the images are stored.
-        SS (str, optional): A set of shutterspeeds separated by ":". Defaults to "1000:3150:10000:31500".
-        nPics (int, optional): Number of images per SS. Defaults to 3.
-        tMax (float, optional): Maximum time before a warning is generated (not implemented yet!). Defaults to 3.0.
-        SaveSSLog (bool, optional): Append a shutterspeed-log into the image folder. Defaults to True.
+def ConfControls(ctrlArgs:list, LoBnd:float=0.95, HiBnd:float=1.05):
+    """Adjusts several controls with a single set_controls and waits once until all of them are reflected in the metadata of the same frame.
 
-    Raises:
-        Exception: When no store-path is given, an exception is thrown.
+    Args:
+        ctrlArgs (list): "<KEY>=<value>" with KEY: SS (µs, 0 = Auto), AG, AWB (R:B), SCLCRP (X:Y:W:H), FR (FPS).
+        LoBnd (float, optional): Lower tolerance in %. Defaults to 0.95.
+        HiBnd (float, optional): Upper tolerance in %. Defaults to 1.05.
 
     Returns:
         str: Standard "ack" or "nak"
     """
-    global cam, srvr_ClipWinBayer # Used for presetting SS
+    start = time()
+    ctrls = {}
+    for _arg in ctrlArgs:
+        if "=" not in _arg:
+            print(f"Invalid control \"{_arg}\" (expected <KEY>=<value>)")
+            return nakStr
+        key, val = _arg.split("=", 1)
+        if key.upper() not in confCtrls:
+            print(f"Unknown control \"{key}\" (supported: {', '.join(confCtrls)})")
+            return nakStr
+        ctrl, conv = confCtrls[key.upper()]
+        try:
+            ctrls[ctrl] = conv(val)
+        except (ValueError, ZeroDivisionError):    # e.g. "SS=abc", "FR=0"
+            print(f"Invalid value \"{val}\" of control {key}")
+            return nakStr
+    if not ctrls:
+        return nakStr
+
+    checks = list(ctrls.keys())
+    if "ExposureTime" in ctrls:
+        ctrls["AeEnable"] = ctrls["ExposureTime"] <= 0
+        if ctrls["ExposureTime"] <= 0:      # Auto-SS can't be awaited
+            checks.remove("ExposureTime")
+
+    cVal, TO = cam.SetAwait(ctrls, checks=checks, LoBnd=LoBnd, HiBnd=HiBnd, MaxFrames=15)
+    how_long(start, str.format("Multi-Change S:{}, I:{} - Timeout:{}", ctrls, cVal, TO))
+    return ackStr
 
-    SS = [int(_ss) for _ss in SS.split(":")]    # ShutterSpeeds -> int
-    nPics = int(nPics)                          # nPics -> int
-    tMax = float(tMax)                          # TimeMax (interval) -> float
-    SaveSSLog = DecodeBoolStr(SaveSSLog)                 # SaveSSLog (True/False, 1/0, yes/no) -> bool
-    if StorePath == None or StorePath == "":
-        raise Exception("CaptureSequence() - No storage-path given.")
 
-    if SaveSSLog:
-        ssLogStr = ""
 
-    ####### Calculate crop-coordinates #######
+
+
+def ClipWindowPx():
+    """Calculates the clip-window in pixels of the raw bayer-data (see srvr_ClipWinBayer).
+
+    Returns:
+        (int, int, int, int): Offset x, offset y, width and height in pixels.
+    """
     # w32 = 4064          # Captured array-Width   aligned to 32
     # h16 = 3040          # Captured array-Height  aigned to 16
     if len(srvr_ClipWinBayer) == 2: # Only Size is given!
@@ -512,107 +951,326 @@ def CaptureShutterspeedSequence(Prefix:str, StorePath:str, SS:str="1000:3150:100
         hWin = srvr_ClipWinBayer[3]   # Is window-Px-Height when offset + size is given
         x1 = srvr_ClipWinBayer[0]     # Is offsetX          when offset + size is given
         y1 = srvr_ClipWinBayer[1]     # Is offsetY          when offset + size is given
-    
+    return x1, y1, wWin, hWin
+
+
+def ClipWindowPacked(clipWin:tuple=None):
+    """Calculates the clip-window in the packed raw-array (SRGGB12_CSI2P: 2 pixels in 3 bytes).
+
+    Args:
+        clipWin (tuple, optional): Window (x, y, w, h) in pixels of the raw-array. Defaults to None (see ClipWindowPx).
+
+    Returns:
+        (int, int, int, int): First and last (exclusive) row and first and last (exclusive) byte-column.
+    """
+    x1, y1, wWin, hWin = ClipWindowPx() if clipWin is None else clipWin
     x2 = x1 + wWin
     y2 = y1 + hWin
 
-    if srvr_ClipWinBayer:
-        cx1 = int(x1 * 1.5) # * 1.5 (12bit / 8bit)
-        cx2 = int(x2 * 1.5) # * 1.5 (12bit / 8bit)
-        cy1 = int(y1)       # / 1 = Height not affected by bit-size
-        cy2 = int(y2)       # / 1 = Height not affected by bit-size
+    cx1 = int(x1 * 1.5) # * 1.5 (12bit / 8bit)
+    cx2 = int(x2 * 1.5) # * 1.5 (12bit / 8bit)
+    cy1 = int(y1)       # / 1 = Height not affected by bit-size
+    cy2 = int(y2)       # / 1 = Height not affected by bit-size
+    return cy1, cy2, cx1, cx2
 
-    ####### Take the pictures #######
-    sSeq = time()
-    cntSS = len(SS)
-    for _iSS in range(cntSS):
-        _tSS = SS[_iSS] # Grab ss directly from list
 
-        _ack, _cSS, _TO = ConfShutterspeed(_tSS)
 
 
-        ### Build filenames ###
-        fNames = []
-        for _iPic in range(nPics): # Prepare filenames
-            fName = str.format("{}_ss={}_{}.{}", Prefix, "<SS>", str(_iPic).zfill(4), "raw" )
-            fNames.append(join(StorePath, fName))
 
+def CaptureShutterspeedSequence(Prefix:str, StorePath:str, SS:str="1000:3150:10000:31500", nPics:str="3", tMax:str="3.0", SaveSSLog:str="True", StreamConn:socket.socket=None, Bracketing:bool=False):
+    """Captures a sequence of raw images and stores them on (ram)disk or streams them to the client.
 
-        ### Raw-capture the images into a list ###
-        raws = []
-        if SaveSSLog:
-            rawMetas = []
-        dCaps = []
-        sCapAll = time()
-        for _iPic in range(nPics):
-            sCap = time()
-            raw, meta = cam.GetCamera().capture_arrays(["raw"])
-            raws.append(raw[0])
-            if SaveSSLog:
-                rawMetas.append(meta)
-            dCaps.append(duration(sCap))
-            if _tSS > 0:
-                fNames[_iPic] = fNames[_iPic].replace("<SS>", str(_tSS))
-            else:
-                fNames[_iPic] = fNames[_iPic].replace("<SS>", str(meta["ExposureTime"]))
-            print(f"Capturing {fNames[_iPic]} @Gain:{str(meta['AnalogueGain'])} took {dCaps[-1]:.3f}")
-        dCapAll = duration(sCapAll)
-        print(f"Raw Capturing of SS-Sequence took {dCapAll:.3f}")
-
-        ### Preset to next SS, so that the camera settles during the following code runs ###
-        if _iSS < (cntSS-1): # Preset only, if not already the last SS -> set back to SS[0] at the end of this method
-            LogLineLeftRight(f"Presetting SS={SS[_iSS + 1]}:", "ok")
-            cam.SetSS(SS[_iSS + 1])
-
-
-        ### Do post-processing to the images ###
-        sPostProcessingAll = time()
-        dPostProcessings = []
-        for _iPic in range(nPics):
-            sPostProcessing = time()
-            raw = raws[_iPic]               # Grab current image as numpy
-            raw = raw[cy1:cy2, cx1:cx2]     # Preclip bayer data to reduce the amount of data to handle
-            raw = raw.astype(np.uint16)     # Target-Type needs to be uint16. uint8 can clip the 4 upper MSB when shifting up
-
-            if srvr_DemosaicClippedBayerImgs:                    # Debayer residual data
-                dMosaic = np.zeros((hWin, wWin), dtype=np.uint16)
-                for byte in range(2):
-                    dMosaic[:, byte::2] = ( (raw[:, byte::3] << 4) | ((raw[:, 2::3] >> (byte * 4)) & 0b1111) )
-                raw = dMosaic
-                
-            if srvr_ShrinkHalfDemosaicedIterations > 0:
-                # raw = (raw[::2, ::2] + raw[1::2, ::2] + raw[::2, 1::2] + raw[1::2, 1::2]) # Old code without saturation detection
-                # Reduce resolution of image and mask to 507x380 by addition ( //4 für Mittelung)
-                satBright=0xFFF           # 0xFFF = (2**12)-1 = Maximum Sensor-Value = Saturation
-                satMask = (raw >= satBright) #  mark saturated pixels
-                for _iShrinkIter in range(srvr_ShrinkHalfDemosaicedIterations): # Combines 2x2 Pxls per iteration!
-                    satMask = (satMask[::2, ::2] | satMask[1::2, ::2] | satMask[::2, 1::2] | satMask[1::2, 1::2])
-                    raw = (raw[::2, ::2] + raw[1::2, ::2] + raw[::2, 1::2] + raw[1::2, 1::2]) #// 4 #jeweils halbiert
-                raw[satMask]=0xFFFF         # 0xFFFF = (2**16)-1 = Maximum uint16-value to clearly mark saturated pixels
-
-            dPostProcessings.append(duration(sPostProcessing))
-            fName = fNames[_iPic]
-            print(f"PostProcessing {fName} took {dPostProcessings[-1]:.3f}")
-
-        dPostProcessingAll = duration(sPostProcessingAll)
-        print(f"All Post-processing took {dPostProcessingAll:.3f}")
-
-        ### Saving the postprocessed images ###
-        for _iPic in range(nPics):
-            fName = fNames[_iPic]
-            sSav = time()
+    Args:
+        Prefix (str): Image-prefix.
+        StorePath (_type_): Path where the images are stored.
+        SS (str, optional): A set of shutterspeeds separated by ":". Defaults to "1000:3150:10000:31500".
+        nPics (int, optional): Number of images per SS. Defaults to 3.
+        tMax (float, optional): Maximum time before a warning is generated (not implemented yet!). Defaults to 3.0.
+        SaveSSLog (bool, optional): Append a shutterspeed-log into the image folder. Defaults to True.
+        StreamConn (socket, optional): When given, the images are sent as length-prefixed frames over this connection
+                                       instead of being saved (see _libHQCam2.netframes). Defaults to None.
+                                       With accumulation (see SRV:IMG:ACCU) only the products of each SS are saved/sent.
+        Bracketing (bool, optional): True: The SS-schedule is queued frame by frame, so the sensor cycles through the SS back-to-back
+                                     without waiting for each SS to settle; frames are assigned by their actual ExposureTime and
+                                     transient frames are dropped (see PiCam2.CaptureBracket). Defaults to False.
+
+    Raises:
+        Exception: When no store-path is given, an exception is thrown.
+
+    Returns:
+        str: Standard "ack" or "nak" (bracketing: not all frames of all SS were captured; the captured ones are kept)
+    """
+    global cam, srvr_ClipWinBayer, seqSlots, procInput # Used for presetting SS
+
+    SS = [int(_ss) for _ss in SS.split(":")]    # ShutterSpeeds -> int
+    nPics = int(nPics)                          # nPics -> int
+    tMax = float(tMax)                          # TimeMax (interval) -> float
+    SaveSSLog = DecodeBoolStr(SaveSSLog)                 # SaveSSLog (True/False, 1/0, yes/no) -> bool
+    if StorePath == None or StorePath == "":
+        raise Exception("CaptureSequence() - No storage-path given.")
+
+    if SaveSSLog:
+        ssLogStr = ""
+    if StreamConn is None and storage is not None:
+        storage.BeginSequence(Prefix)           # Files of the sequence are spilled together once it is completed
+
+    ####### Calculate crop-coordinates #######
+    x1, y1, wWin, hWin = ClipWindowPx()
+    cy1, cy2, cx1, cx2 = ClipWindowPacked()
+
+    ####### Result-layout: One preallocated slot per picture, reused for all SS (and following sequences) #######
+    rois = srvr_ROIs
+    roiStats = rois is not None and srvr_ROIStats is not None   # Only the statistics of the ROIs per frame
+    accuProducts = list(srvr_Accumulate) if not roiStats else []
+    roiUnpack = rois is not None and (srvr_DemosaicClippedBayerImgs or bool(accuProducts))
+    bayerBin = rois is None and srvr_BayerBinning > 0
+    unpackData = rois is None and not bayerBin and (srvr_DemosaicClippedBayerImgs or bool(accuProducts))  # Accumulation needs pixel-values
+    fy, fx = BinFactors()                               # fy x fx pixels are combined to one value
+    binning = rois is None and (fy > 1 or fx > 1)
+
+    ####### Sensor-mode: A binned mode averages 2x2 pixels per colour-plane, so it replaces a part of the bayer-binning ("mean") #######
+    bayerF = srvr_BayerBinning
+    bayerWin = (x1, y1, wWin, hWin)                     # Window of the bayer-binning in pixels of the raw-array
+    mode = ApplySensorMode(bayerF if bayerBin and srvr_BinReduction == BIN_MEAN else 1)
+    if ModeBinning(mode) > 1:
+        bayerWin = ModeWindow(mode, bayerWin)
+        bayerF //= ModeBinning(mode)
+        cy1, cy2, cx1, cx2 = ClipWindowPacked(bayerWin)
+
+    resDtype = np.uint16
+    if roiStats:                                        # Statistics per ROI
+        resShape = (len(rois), len(ROI_STATS_FIELDS))
+        resDtype = np.float64
+    elif rois is not None:                              # One compact record of all ROIs
+        resShape = rois.RecordShape(roiUnpack)
+        resDtype = np.uint16 if roiUnpack else np.uint8
+    elif bayerBin:
+        bayerLayout = BayerBinner((bayerWin[3], bayerWin[2]), bayerF, srvr_BinReduction, srvr_BayerLuminance)
+        resShape = bayerLayout.shape
+        resDtype = bayerLayout.dtype
+    elif unpackData:
+        resShape = BinnedShape((hWin, wWin), fy, fx)
+        if binning:
+            resDtype = BinDtype(fy, fx, srvr_BinReduction)    # Sums exceeding 16 bit get a wider dtype
+    else:
+        resShape = (cy2 - cy1, cx2 - cx1)               # Packed bytes, stored as-is (unpacked on the host, see rawfile.DecodePackedFrame)
+        resDtype = np.uint8
+    nSlots = min(nPics, srvr_PipelineWorkers + 1) if accuProducts else nPics    # Accumulated frames are released right after adding
+    usePool = procPool is not None and unpackData       # Unpacking/binning by the worker-processes (result-slots in shared memory)
+    if seqSlots is None or not seqSlots.Matches(nSlots, resShape, resDtype, shared=usePool):
+        if seqSlots is not None:
+            seqSlots.Close()
+        seqSlots = FrameSlots(nSlots, resShape, resDtype, shared=usePool)
+    if usePool:
+        inShape = (srvr_PipelineWorkers, cy2 - cy1, cx2 - cx1)
+        if procInput is None or procInput.shape != inShape:
+            if procInput is not None:
+                procInput.Close()
+            procInput = SharedArray(inShape, np.uint8)
+        poolTask = UnpackBinTask(procInput.Spec(), seqSlots.Spec(), (hWin, wWin), fy, fx, srvr_BinReduction, resDtype)
+        inputIds = count()                              # Input-slot of each pipeline-thread
+    workerBufs = threading.local()                      # Scratch-buffers of each post-processing worker
+
+
+    ####### Post-processing and saving (executed by the pipeline-stages) #######
+    def PostProcess(frame:PipelineFrame):
+        out = frame.out                     # Slot of this frame
+        if roiStats:                        # Only the statistics of the ROIs are kept
+            if not hasattr(workerBufs, "roiStats"):
+                workerBufs.roiStats = ROIStats(rois)
+            return workerBufs.roiStats.Compute(frame.raw, out=out)
+        if rois is not None:                # Only the ROIs are copied (packed-byte aware) from the entire frame
+            return rois.Extract(frame.raw, out=out, unpack=roiUnpack)
+
+        raw = frame.raw[cy1:cy2, cx1:cx2]   # Preclip bayer data to reduce the amount of data to handle
+
+        if bayerBin:                        # Colour-planes binned directly from the packed data
+            if not hasattr(workerBufs, "bayerBinner"):
+                workerBufs.bayerBinner = BayerBinner((bayerWin[3], bayerWin[2]), bayerF, srvr_BinReduction, srvr_BayerLuminance)
+            return workerBufs.bayerBinner.Bin(raw, out=out)
+
+        if not unpackData:
+            np.copyto(out, raw)             # Packed bytes without conversion (plain copy out of the camera-buffer)
+            return out
+
+        if usePool:                         # Packed data into the shared input-slot of this thread, result directly into the shared slot
+            if not hasattr(workerBufs, "iInput"):
+                workerBufs.iInput = next(inputIds)
+            np.copyto(procInput.Array[workerBufs.iInput], raw)
+            procPool.Run(poolTask, resShape[0], workerBufs.iInput, frame.iSlot)
+            return out
+
+        if not hasattr(workerBufs, "unpacker"):
+            workerBufs.unpacker = SRGGB12Unpacker(hWin, wWin)
+            workerBufs.binner = Binner((hWin, wWin), fy, fx, srvr_BinReduction, dtype=resDtype) if binning else None
+
+        if not binning:                                     # Debayer residual data
+            return workerBufs.unpacker.Unpack(raw, out=out) # Unpacks the uint8-view directly into the slot
+
+        # Pixel-binning: Blocks containing saturated pixels are marked with the maximum of the dtype (0xFFFF for uint16)
+        return workerBufs.binner.Bin(workerBufs.unpacker.Unpack(raw), out=out)
+
+    if roiStats:
+        hdrFields = dict(bitDepth=64, layout=LAYOUT_ROI_STATS, clipWin=rois.BoundingBox())
+    elif rois is not None:
+        hdrFields = dict(bitDepth=12, layout=LAYOUT_ROI_RECORD, clipWin=rois.BoundingBox())
+    elif bayerBin:
+        hdrFields = dict(bitDepth=bayerLayout.bitDepth, layout=LAYOUT_PLAIN if srvr_BayerLuminance else LAYOUT_BAYER_PLANES,
+                         binning=(2*srvr_BayerBinning, 2*srvr_BayerBinning))
+    elif unpackData:
+        hdrFields = dict(bitDepth=BinnedBitDepth(fy, fx, srvr_BinReduction), layout=LAYOUT_PLAIN, binning=(fy, fx))
+    else:
+        hdrFields = dict(bitDepth=12, layout=LAYOUT_SRGGB12_PACKED)
+    if rois is None:
+        hdrFields["clipWin"] = (x1, y1, wWin, hWin)
+    elif StreamConn is None:                # ROI-table of the records (the client knows it via SRV:IMG:ROIS?)
+        f = open(join(StorePath, f"{Prefix}_ROIs.txt"), "w")
+        f.write(rois.Table(roiUnpack))
+        f.close()
+        FileSaved(f.name, Prefix)
+    statsWriter = None
+    if roiStats:                            # One file with a row per frame (streamed: one float64-row per frame)
+        ext = "raw" if srvr_ROIStats == ROI_STATS_BIN else "csv"
+        statsWriter = ROIStatsWriter(join(StorePath, f"{Prefix}_ROIStats.{ext}") if StreamConn is None else None, rois, srvr_ROIStats)
+
+    codec = srvr_Codec                      # Fixed for the whole sequence
+    writer = None
+    if StreamConn is None and not srvr_SavePickle and not roiStats and srvr_WriteMode != WRITE_SYNC:
+        nFiles = len(SS) * (len(accuProducts) + 1 if accuProducts else nPics)
+        itemSize = max(np.dtype(resDtype).itemsize, 4) if accuProducts else np.dtype(resDtype).itemsize
+        seqBytes = nFiles * RawRecordBytes(RAWFILE_HEADER_SIZE + int(np.prod(resShape)) * itemSize)  # Upper bound (uncompressed)
+        if srvr_WriteMode == WRITE_APPEND:
+            # The sequence-file is registered at the storage-manager only when it is complete, so it can't be spilled
+            # while it grows: The space of the whole sequence is awaited upfront instead of per frame
+            AwaitStorage(seqBytes)
+        writer = RawWriter(srvr_WriteMode, srvr_WriteBatchMB, srvr_WritePrealloc, srvr_WriteDirect, onWritten=lambda _f: FileSaved(_f, Prefix))
+        writer.BeginSequence(join(StorePath, f"{Prefix}_seq.raw"), seqBytes)
+
+    def Store(fName:str, arr:np.ndarray, meta:dict, **fields):
+        if StreamConn is not None:          # Send from the slot-buffer directly to the client
+            SendFrame(StreamConn, arr, meta, **fields)
+        elif srvr_SavePickle:                 # Former format
+            AwaitStorage(arr.nbytes)
             f = open(fName, "wb")
-            pickle.dump(raw, f)
+            pickle.dump(arr, f)
             f.close()
-            dSav = duration(sSav)
-            print(f"Saving {fName} took {dSav:.3f}")
+            FileSaved(fName, Prefix)
+        elif writer is not None:            # Copied into a batch (slot free right after), written by the writer-thread
+            if writer.mode != WRITE_APPEND: # Append: Awaited for the whole sequence-file (see above)
+                AwaitStorage(arr.nbytes)    # Back-pressure: The pipeline-queues fill up and the capture pauses
+            writer.Write(fName, arr, meta, codec=codec, **fields)
+        else:
+            AwaitStorage(arr.nbytes)
+            WriteRawFrame(fName, arr, meta, codec=codec, **fields)
+            FileSaved(fName, Prefix)
+
+    ####### Accumulation: One accumulator per SS in progress, reused for the following SS #######
+    accus = {}                              # iSS: (tSS, FrameAccumulator)
+    freeAccus = []
+    satLevel = np.iinfo(resDtype).max if binning or bayerBin else SATURATION_SRGGB12   # Saturated binned pixels are marked with the maximum of the dtype
+
+    def StoreProducts(iSS:int):
+        _tSS, acc = accus.pop(iSS)
+        for _product, _arr in acc.Products(accuProducts).items():
+            fName = str.format("{}_ss={}_{}.{}", Prefix, _tSS if _tSS > 0 else acc.Meta["ExposureTime"], _product, "raw")
+            Store(join(StorePath, fName), _arr, acc.Meta, nAccumulated=acc.Count, iSS=iSS, product=_product, **hdrFields)
+        LogLineLeftRight(f"Stored accumulation SS={_tSS}:", f"{acc.Count} images -> {', '.join(accuProducts)}, sat")
+        freeAccus.append(acc)
+
+    def Save(frame:PipelineFrame):
+        if roiStats:
+            if StreamConn is not None:
+                SendFrame(StreamConn, statsWriter.Row(frame.result, frame.meta, frame.iSS, frame.iPic), frame.meta, **hdrFields)
+            else:
+                statsWriter.Write(frame.result, frame.meta, frame.iSS, frame.iPic)
+            return
+        if not accuProducts:
+            Store(frame.fName, frame.result, frame.meta, iSS=frame.iSS, iPic=frame.iPic, **hdrFields)
+            return
+        if frame.iSS not in accus:
+            acc = freeAccus.pop() if freeAccus else FrameAccumulator(resShape, variance=ACCU_VAR in accuProducts, satLevel=satLevel, frameDtype=resDtype)
+            acc.Reset()
+            accus[frame.iSS] = (frame.tSS, acc)
+        acc = accus[frame.iSS][1]
+        acc.Add(frame.result, frame.meta)   # The slot is released right after
+        if acc.Count >= nPics:
+            StoreProducts(frame.iSS)
+
+
+    ####### Take the pictures #######
+    # Frames flow from the capture (this thread) through the post-processing workers to the writer,
+    #  so that the camera already settles on the next SS while the previous frames are processed and saved.
+    pipeline = CapturePipeline(PostProcess, Save, nWorkers=srvr_PipelineWorkers, Slots=seqSlots).Start()
+
+    def SubmitFrame(raw, meta, _iSS:int, _iPic:int, _tSS:int, dCap:float):
+        fName = str.format("{}_ss={}_{}.{}", Prefix, _tSS if _tSS > 0 else meta["ExposureTime"], str(_iPic).zfill(4), "raw")
+        fName = join(StorePath, fName)
+        print(f"Capturing {fName} @SS:{meta['ExposureTime']} @Gain:{str(meta['AnalogueGain'])} took {dCap:.3f}")
+        pipeline.Submit(PipelineFrame(raw, meta, fName, iSS=_iSS, iPic=_iPic, tSS=_tSS, dCap=dCap)) # Blocks when the pipeline is full
 
-            if SaveSSLog:
-                _cSS  = rawMetas[_iPic]["ExposureTime"]
-                _fd   = rawMetas[_iPic]["FrameDuration"]
-                _dCap = dCaps[_iPic]
-                ssLogStr += str.format("fName:{};tCap:{:.3f};tSav{:.3f};sSS:{};iSS:{};FD:{}\n", fName, _dCap, dSav, _tSS, _cSS, _fd)
-    how_long(sSeq, "Entire CaptureShutterspeedSequence")
+    sSeq = time()
+    cntSS = len(SS)
+    try:
+        if Bracketing:
+            ### The sensor cycles through all SS back-to-back; frames are tagged by their actual ExposureTime ###
+            sCap = time()
+            for raw, meta, _iSS, _iPic in cam.CaptureBracket(SS, nPics):
+                SubmitFrame(raw, meta, _iSS, _iPic, SS[_iSS], duration(sCap))
+                sCap = time()
+            print(f"Raw Capturing of bracketed SS-Sequence took {duration(sSeq):.3f}")
+
+        else:
+            for _iSS in range(cntSS):
+                _tSS = SS[_iSS] # Grab ss directly from list
+
+                _ack, _cSS, _TO = ConfShutterspeed(_tSS)
+
+
+                ### Raw-capture the images and hand them over to the pipeline ###
+                sCapAll = time()
+                for _iPic in range(nPics):
+                    sCap = time()
+                    raw, meta = cam.GetCamera().capture_arrays(["raw"])
+                    SubmitFrame(raw[0], meta, _iSS, _iPic, _tSS, duration(sCap))
+                dCapAll = duration(sCapAll)
+                print(f"Raw Capturing of SS-Sequence took {dCapAll:.3f}")
+
+                ### Preset to next SS, so that the camera settles while the pipeline works ###
+                if _iSS < (cntSS-1): # Preset only, if not already the last SS -> set back to SS[0] at the end of this method
+                    LogLineLeftRight(f"Presetting SS={SS[_iSS + 1]}:", "ok")
+                    cam.SetSS(SS[_iSS + 1])
+    finally:
+        try:
+            frames = pipeline.Join()    # Wait for the remaining frames to be saved
+            for _iSS in sorted(accus):  # Incomplete accumulations (e.g. bracketing)
+                StoreProducts(_iSS)
+        finally:
+            try:
+                if statsWriter is not None: # File closed (binary: header with the rows written) also on failure
+                    statsWriter.Close()
+                    if StreamConn is None:
+                        FileSaved(join(StorePath, f"{Prefix}_ROIStats.{ext}"), Prefix)
+                if writer is not None:      # Remaining batches written, files fsync'ed
+                    writer.Close()
+                    LogLineLeftRight("Writer:", ";".join([f"{key}={val}" for key, val in writer.Status().items()]))
+            finally:
+                if StreamConn is not None:
+                    SendEndOfFrames(StreamConn) # Client stops reading frames (also on failure)
+                elif storage is not None:
+                    storage.EndSequence(Prefix)
+    dSeq = how_long(sSeq, "Entire CaptureShutterspeedSequence")
+
+    # Sum of the single stages vs. the entire sequence shows the overlap of the stages
+    frames.sort(key=lambda _f: (_f.iSS, _f.iPic))
+    dCaps = [_f.dCap for _f in frames]
+    dPostProcessings = [_f.dPostProcessing for _f in frames]
+    dSavs = [_f.dSav for _f in frames]
+    dStages = sum(dCaps) + sum(dPostProcessings) + sum(dSavs)
+    print(f"Stages Capture:{sum(dCaps):.3f}s + PostProcessing:{sum(dPostProcessings):.3f}s + Saving:{sum(dSavs):.3f}s = {dStages:.3f}s (overlapped to {dSeq:.3f}s)")
+
+    if SaveSSLog:
+        for _f in frames:
+            ssLogStr += str.format("fName:{};tCap:{:.3f};tSav{:.3f};sSS:{};iSS:{};FD:{}\n", _f.fName, _f.dCap, _f.dSav, _f.tSS, _f.meta["ExposureTime"], _f.meta["FrameDuration"])
 
     LogLineLeftRight(f"Presetting SS={SS[0]}:", "ok")
     cam.SetSS(SS[0]) # Preset the fastest SS for next call
@@ -621,9 +1279,232 @@ def CaptureShutterspeedSequence(Prefix:str, StorePath:str, SS:str="1000:3150:100
         f = open(join(StorePath, f"{Prefix}_SSCapture.log"), "w")
         f.writelines(ssLogStr)
         f.close()
+        FileSaved(f.name, Prefix)
+    if Bracketing and not cam.BracketComplete:
+        return nakStr
+    return ackStr
+
+
+
+
+def Capture_RingStart(nFrames:int):
+    """Starts the continuous capture of every frame into a ring-buffer in shared memory (packed raw-data of the current clip-window).
+    The ring-buffer and the residual free space of the RAM-disk must fit into the available RAM.
+
+    Args:
+        nFrames (int): Capacity of the ring-buffer in frames.
+
+    Raises:
+        Exception: When the ring-buffer doesn't fit into the RAM.
+
+    Returns:
+        str: Standard "ack" or "nak"
+    """
+    global ring, ringClipWin
+
+    Capture_RingStop()
+    nFrames = int(nFrames)
+    ApplySensorMode()                   # The ring holds full-resolution frames of the clip-window
+    cy1, cy2, cx1, cx2 = ClipWindowPacked()
+    shape = (cy2 - cy1, cx2 - cx1)
+    fits, budget = RingMemoryBudget(nFrames * shape[0] * shape[1], ramdisk, ReserveMB=srvr_RingReserveMB)
+    LogLineLeftRight("Ring-buffer memory:", ", ".join([f"{key}={val / 1024**2:.0f}MB" for key, val in budget.items()]))
+    if not fits:
+        raise Exception(f"Capture_RingStart() - {nFrames} frames ({budget['ring'] / 1024**2:.0f}MB) don't fit into the RAM.")
+
+    ring = FrameRing(nFrames, shape, np.uint8)
+    ringClipWin = ClipWindowPx()
+    cam.AttachRing(ring, "raw", (slice(cy1, cy2), slice(cx1, cx2)))
+    LogLineLeftRight("Ring-buffer started:", f"{nFrames} frames {shape} in {ring.Name}")
     return ackStr
 
 
+def Capture_RingStop():
+    """Stops the continuous capture and releases the ring-buffer.
+
+    Returns:
+        str: Standard "ack"
+    """
+    global ring
+
+    if ring is not None:
+        cam.AttachRing(None)
+        LogLineLeftRight("Ring-buffer stopped:", RingStatus())
+        ring.Close()
+        ring = None
+    return ackStr
+
+
+def Capture_RingTrigger(Prefix:str, nBefore:int, nAfter:int, StorePath:str, StreamConn:socket.socket=None):
+    """Snapshots the last nBefore and the next nAfter frames of the ring-buffer to the storage or the client.
+    The frames are held in the ring-buffer until they are saved; meanwhile frames which would overwrite them are dropped.
+
+    Args:
+        Prefix (str): Image-prefix.
+        nBefore (int): Frames before the trigger.
+        nAfter (int): Frames after the trigger.
+        StorePath (str): Path where the images are stored.
+        StreamConn (socket, optional): When given, the frames are sent as length-prefixed frames over this connection
+                                       instead of being saved (see _libHQCam2.netframes). Defaults to None.
+
+    Raises:
+        Exception: When the ring-buffer is not started.
+
+    Returns:
+        str: Standard "ack" or "nak" (not all nAfter frames captured in time)
+    """
+    if ring is None:
+        raise Exception("Capture_RingTrigger() - Ring-buffer not started (CAP:RING:START).")
+    nBefore = int(nBefore)
+    nAfter = int(nAfter)
+
+    sTrg = time()
+    timeout = (nAfter + cam.CtrlLatency + 10) * cam.GetFD() * 1e-6
+    slots, nPre, timedout = ring.Trigger(nBefore, nAfter, timeout=timeout)
+    how_long(sTrg, f"Ring-trigger ({len(slots)} frames)")
+    hdrFields = dict(bitDepth=12, layout=LAYOUT_SRGGB12_PACKED, clipWin=ringClipWin)
+    if StreamConn is None and storage is not None:
+        storage.BeginSequence(Prefix)
+    try:
+        for _i, _iSlot in enumerate(slots):
+            frame, meta, _seq = ring[_iSlot]
+            if StreamConn is not None:
+                SendFrame(StreamConn, frame, meta, **hdrFields)
+            else:
+                fName = join(StorePath, str.format("{}_trg{:+05d}.raw", Prefix, _i - nPre))
+                AwaitStorage(frame.nbytes)
+                WriteRawFrame(fName, frame, meta, codec=srvr_Codec, **hdrFields)
+                FileSaved(fName, Prefix)
+    finally:
+        ring.Release()
+        if StreamConn is not None:
+            SendEndOfFrames(StreamConn)
+        elif storage is not None:
+            storage.EndSequence(Prefix)
+    how_long(sTrg, "Entire Capture_RingTrigger")
+    return nakStr if timedout else ackStr
+
+
+def RingStatus():
+    """Builds a status-string of the ring-buffer.
+
+    Returns:
+        str: "frames=<capacity>;bytes=<size>;written=<frames>;dropped=<frames>;held=<frames>" or "off"
+    """
+    if ring is None:
+        return "off"
+    return ";".join([f"{key}={val}" for key, val in ring.Status().items()])
+
+
+
+
+
+def ServerStatus():
+    """Builds a status-string of the server.
+
+    Returns:
+        str: "busy=<command executed by the camera>;queued=<waiting camera-commands>;clients=<connected clients>"
+    """
+    if asyncServer is not None:
+        status = asyncServer.Status()
+    else:
+        status = {"busy": "", "queued": 0, "clients": 1} # Single-client mode: Answering this query means the server is not busy
+    return ";".join([f"{key}={val}" for key, val in status.items()])
+
+
+
+
+
+def Server_Close():
+    """Closes the connection and shuts down the pycam-server.
+
+    Returns:
+        str: Standard "ack"
+    """
+    global keepConnection, closeApp
+
+    keepConnection = False
+    closeApp = True
+    return ackStr
+
+
+
+
+
+### Command table ###
+# Every command is registered with its handler, the positional arguments of the payload and if it is read-only
+#  (read-only commands don't touch camera or server-settings and are answered immediately by the multi-client server).
+cmdTable = CommandTable(UnknownReply="Unknown Command")
+
+####### Capture (most used) #######
+cmdTable.Register("CAP:SEQFET",      CaptureShutterspeedSequence, ["Prefix", "SS", "nPics", "tMax", "SaveSSLog"], fixed={"StorePath": imFolderPath})
+cmdTable.Register("CAP:SEQSTR",      CaptureShutterspeedSequence, ["Prefix", "SS", "nPics", "tMax", "SaveSSLog"], fixed={"StorePath": imFolderPath}, connArg="StreamConn") # Like CAP:SEQFET, but the images are streamed over the connection
+cmdTable.Register("CAP:SEQBRK",      CaptureShutterspeedSequence, ["Prefix", "SS", "nPics", "tMax", "SaveSSLog"], fixed={"StorePath": imFolderPath, "Bracketing": True}) # Like CAP:SEQFET, but exposure-bracketing
+cmdTable.Register("CAP:RING:START",  Capture_RingStart,           ["nFrames"])                           # Continuous capture into a ring-buffer
+cmdTable.Register("CAP:RING:TRG",    Capture_RingTrigger,         ["Prefix", "nBefore", "nAfter"], fixed={"StorePath": imFolderPath})
+cmdTable.Register("CAP:RING:TRGSTR", Capture_RingTrigger,         ["Prefix", "nBefore", "nAfter"], fixed={"StorePath": imFolderPath}, connArg="StreamConn")
+cmdTable.Register("CAP:RING:STOP",   Capture_RingStop)
+cmdTable.Register("CAP:RING:STAT?",  RingStatus,                  readOnly=True)
+cmdTable.Register("SRV:ARCHV",       Server_Archive,              ["archiveFolderPath", "archiveFName", "compress", Arg("multicore", DecodeBoolStr), Arg("suppressParents", DecodeBoolStr)])
+cmdTable.Register("SRV:ARCHV:STR",   Server_ArchiveStream,        ["archiveFolderPath", Arg("compress", default="0")], connArg="StreamConn")    # Archive streamed over the connection
+cmdTable.Register("SRV:ARCHV:LIVE",  Server_ArchiveLive,          ["archiveFName", Arg("compress", default="0")])                               # Every saved file is appended to this archive; "0" = finish
+cmdTable.Register("SRV:ARCHV:STAT?", ArchiveStatus,               readOnly=True)
+
+####### Camera Conf #######
+cmdTable.Register("CAM:CONF:SS",     ConfShutterspeed,            ["tVal"], replyFunc=lambda r: r[0])  # ShutterSpeed (SS); Only get Ack-String (index: 0)
+cmdTable.Register("CAM:CONF:FR",     ConfFramerate,               ["FR"])                               # FrameRate (FR)
+cmdTable.Register("CAM:CONF:AG",     ConfAnalogGain,              ["tVal"])                             # AnalogGain
+cmdTable.Register("CAM:CONF:AWB",    ConfWhiteBalance,            ["tVal"])                             # AutoWhiteBalance
+cmdTable.Register("CAM:CONF:SCLCRP", ConfScalerCrop,              ["offsetXY", "sizeWH"])               # SCaLerCRoP (Camera-Internal precrop of the image!)
+cmdTable.Register("CAM:CONF:MODE",   ConfSensorMode,              ["Mode"])                             # Raw sensor-mode: "auto" (smaller/binned mode when possible) or "full"
+cmdTable.Register("CAM:CONF:MODES?", SensorModes,                 readOnly=True)                        # Table of the sensor-modes with frame-sizes and rates
+cmdTable.Register("CAM:CONF:MULTI",  ConfControls,                [VARARGS])                            # Several controls at once, e.g. "SS=1000 AG=1.0 AWB=1.0:1.0"
+
+####### Server Image Commands #######
+cmdTable.Register("SRV:IMG:BCLP",    Server_ClipWinBayerImage,        ["ClipWinBayerByServer"])         # Clip of bayer-data by server
+cmdTable.Register("SRV:IMG:DBAY",    Server_DemosaicClippedBayerImgs, ["DebayerByServer"])              # Do a debayer of the image
+cmdTable.Register("SRV:IMG:SRNK",    Server_SWPixelBinning,           ["pxBinIters"])                   # Shrink size by half after debayer
+cmdTable.Register("SRV:IMG:BIN",     Server_Binning,                  ["BinFactors", Arg("Reduction", default=BIN_SUM)])    # Binning by arbitrary factors, e.g. "3:3 mean"
+cmdTable.Register("SRV:IMG:ROIS",    Server_ROIs,                     [VARARGS])                        # Regions of interest, e.g. "100:200:16:16 4000:3000:32:20"
+cmdTable.Register("SRV:IMG:ROISTAT", Server_ROIStats,                 ["Format"])                       # Only statistics of the ROIs per frame ("csv"/"bin") instead of the images
+cmdTable.Register("SRV:IMG:ROIS?",   lambda: str(srvr_ROIs) if srvr_ROIs is not None else "none", readOnly=True)
+cmdTable.Register("SRV:IMG:BAYBIN",  Server_BayerBinning,             ["BinFactor", Arg("Luminance", default="0")])         # Binning per colour-plane from the packed data, e.g. "2" or "2 1" (luminance)
+cmdTable.Register("SRV:IMG:ACCU",    Server_Accumulate,               ["AccuProducts"])                 # Accumulate the images per SS (e.g. "mean:var") instead of saving every image
+cmdTable.Register("SRV:PROC:WORKERS", Server_ProcessPool,            ["nWorkers", Arg("Split", default=SPLIT_ROWS)])      # Worker-processes for unpacking/binning, e.g. "4 rows" or "3 frames"; "0" = off
+cmdTable.Register("SRV:IMG:CODEC",   Server_Codec,                    ["Codec"])                        # Lossless compression of the raw-containers, e.g. "delta:zlib:1"; "0" = off
+cmdTable.Register("SRV:IMG:CODEC?",  lambda: str(srvr_Codec) if srvr_Codec is not None else "none", readOnly=True)
+cmdTable.Register("SRV:IMG:WRITER",  Server_Writer,                   ["Mode", Arg("BatchMB", default="32"), Arg("Prealloc", default="0"), Arg("Direct", default="0")])  # Batched writer-thread, e.g. "append 64 1 1"; "sync" = former writes
+cmdTable.Register("SRV:IMG:PKL",     Server_SavePickle,               ["SaveAsPickle"])                 # Save images as pickle (former format) instead of raw-container
+
+####### Server Common Commands #######
+cmdTable.Register("IDN?",            IDN,                         readOnly=True)
+cmdTable.Register("SRV:ECHO",        ECHO,                        [VARARGS], readOnly=True)
+cmdTable.Register("SRV:PATH:RDDIR?", lambda: mntPnt_RAMDisk,      readOnly=True)
+cmdTable.Register("SRV:PATH:SDDIR?", lambda: SDCardPath,          readOnly=True)
+cmdTable.Register("SRV:PATH:IMDIR?", lambda: imFolderPath,        readOnly=True)
+cmdTable.Register("SRV:STORE:CONF",  Server_StorageConf,          ["SpillPath", Arg("HighPct", default="85"), Arg("LowPct", default="70")])   # Spilling/eviction of the RAM-disk, e.g. "/home/pi/Pictures/Captures 85 70"; "0" = no spilling
+cmdTable.Register("SRV:STORE:FETCHED", Server_StorageFetched,     ["Prefix"])                           # The client fetched a capture: Its files are removed from the RAM-disk
+cmdTable.Register("SRV:STORE:STAT?", StorageStatus,               readOnly=True)                        # Usage and throughput of the RAM-disk
+cmdTable.Register("SRV:STAT?",       ServerStatus,                readOnly=True)
+cmdTable.Register("SRV:STATS?",      cmdTable.Stats,              readOnly=True)                        # Count, errors and latency per command
+cmdTable.Register("SRV:CLOSE",       Server_Close)
+
+
+
+def ExecuteCommand(cmd:str, payload:list, conn):
+    """Executes a received command via the command table.
+
+    Args:
+        cmd (str): Command (first word of the received message).
+        payload (list): Arguments of the command (residual words of the received message).
+        conn (socket): Client-connection (used by commands which stream data back, e.g. CAP:SEQSTR).
+
+    Returns:
+        str: Response for the client.
+    """
+    return cmdTable.Dispatch(cmd, payload, conn)
+
+
 
 
 ### Start script ###
@@ -642,8 +1523,16 @@ if "mntPnt_RAMDisk" in locals() and mntPnt_RAMDisk != None:
 
     LogLineLeftRight("Setup RAMDisk took", f"{duration(sRAMDisk):.3f}s")
 
+# Storage-manager of the image folder (back-pressure, spilling to the SD-card, eviction)
+CreateFolder4User(imFolderPath)
+storage = StorageManager(imFolderPath, ramdisk, srvr_SpillPath, srvr_StoreHighPct, srvr_StoreLowPct)
 
 
+
+# Start the process-pool before the camera, so the workers are forked without the camera-threads
+if srvr_ProcessWorkers > 0:
+    Server_ProcessPool(srvr_ProcessWorkers, srvr_ProcessSplit)
+
 # Create Camera
 SetupCamera2(10.0)
 
@@ -653,93 +1542,73 @@ SetupCamera2(10.0)
 
 
 # (Re-)Create Server
-sServer = time()
-servSock = SetupServer()
-LogLineLeftRight("Server set up in: ", f"{duration(sServer):.3f}s")
-servConn = AwaitIncomingConnection(servSock)
-
-
-# Run main server-loop
-LogLineLeftRight("Starting main server-loop", "ok")
-keepConnection = True
-closeApp = False
-excptnCnt = 0
-while keepConnection:   # as long the connection is active, iterate infinite
-    try:
-        # Receive the data
-        waited4Msg = time()
-        LogLineLeft("Receive data")
-        rcvd = servConn.recv(1024)  # receive the data
-        rcvd = rcvd.decode('utf-8')
-        print("ok")
-        LogLineLeftRight("Received: ", rcvd)
-
-        LogLineLeftRight("Waited for Receive:", f"{(time() - waited4Msg):.3f} s")
-
-
-        dataMessage = rcvd.split(' ')   # Split the incomming message
-        cmd = dataMessage[0]            #  Get command and
-        payload = dataMessage[1:]       #  the arguments separately
-
-
-        ############## If-Elif-Else command structure ##############
-        ####### Capture (most used) #######
-        # print(cmd)
-        if cmd == 'CAP:SEQFET':
-            reply = CaptureShutterspeedSequence(Prefix=payload[0], StorePath=imFolderPath, SS=payload[1], nPics=payload[2], tMax=payload[3], SaveSSLog=payload[4])
-        elif cmd == "SRV:ARCHV":
-            reply = Server_Archive(archiveFolderPath=payload[0], archiveFName=payload[1], compress=DecodeBoolStr(payload[2]), multicore=DecodeBoolStr(payload[3]), suppressParents=DecodeBoolStr(payload[4]))
-
-        ####### Camera Conf #######
-        elif cmd == "CAM:CONF:SS":                                          # ShutterSpeed (SS)
-            reply = ConfShutterspeed(payload[0])[0] # Only get Ack-String (index: 0)
-        elif cmd == "CAM:CONF:FR":                                          # FrameRate (FR)
-            reply = ConfFramerate(payload[0])
-        elif cmd == "CAM:CONF:AG":                                          # AnalogGain
-            reply = ConfAnalogGain(payload[0])                              
-        elif cmd == "CAM:CONF:AWB":                                         # AutoWhiteBalance
-            reply = ConfWhiteBalance(payload[0])
-        elif cmd == "CAM:CONF:SCLCRP":                                      # SCaLerCRoP (Camera-Internal precrop of the image!)
-            reply = ConfScalerCrop(payload[0], payload[1])
-
-        ####### Server Image Commands #######
-        elif cmd == "SRV:IMG:BCLP":                                         # Clip of bayer-data by server
-            reply = Server_ClipWinBayerImage(payload[0])
-        elif cmd == "SRV:IMG:DBAY":                                         # Do a debayer of the image
-            reply = Server_DemosaicClippedBayerImgs(payload[0])
-        elif cmd == "SRV:IMG:SRNK":                                         # Shrink size by half after debayer
-            reply = Server_SWPixelBinning(payload[0])
-
-        ####### Server Common Commands #######
-        elif cmd == "IDN?":
-            reply = IDN()
-        elif cmd == "SRV:ECHO":
-            reply = ECHO(payload)
-        elif cmd == "SRV:PATH:RDDIR?":
-            reply = mntPnt_RAMDisk
-        elif cmd == "SRV:PATH:SDDIR?":
-            reply = SDCardPath
-        elif cmd == "SRV:PATH:IMDIR?":
-            reply = imFolderPath
-        elif cmd == "SRV:CLOSE":
-            keepConnection = False
-            closeApp = True
-            reply = ackStr
-        else:
-            reply = 'Unknown Command'
-        ####### Command Tree finished #######
-
-        # Response
-        servConn.sendall(str.encode(reply))
-        LogLineLeftRight("Sent response", reply)
-    except Exception as e:
-        LogLineLeftRight("Exception occured:", e)
-        excptnCnt += 1
-        if excptnCnt > 3:  # 3 attemps ok!
-            keepConnection = False
-        continue
-# conn.close()
+if srvr_MultiClient:
+    # Multiple concurrent clients; camera-commands are serialized, read-only commands answered immediately
+    asyncServer = AsyncCommandServer(port, ExecuteCommand, cmdTable.ReadOnlyCmds(), KeepRunningFunc=lambda: keepConnection, ErrorReply=nakStr, Framing=srvr_CmdFraming)
+    LogLineLeftRight("Starting multi-client server", "ok")
+    asyncServer.Run()
+
+else:
+    sServer = time()
+    servSock = SetupServer()
+    LogLineLeftRight("Server set up in: ", f"{duration(sServer):.3f}s")
+    servConn = AwaitIncomingConnection(servSock)
+
+
+    # Run main server-loop
+    LogLineLeftRight("Starting main server-loop", "ok")
+    excptnCnt = 0
+    framer = CommandFramer(srvr_CmdFraming)
+    while keepConnection:   # as long the connection is active, iterate infinite
+        try:
+            # Receive the data
+            waited4Msg = time()
+            LogLineLeft("Receive data")
+            servConn.settimeout(framer.IdleTimeout)     # Limited only while auto-framing has an undecided command
+            try:
+                rcvd = servConn.recv(4096)  # receive the data
+            except socket.timeout:
+                rcvd = None
+            finally:
+                servConn.settimeout(None)               # Responses and streamed frames are sent without timeout
+            if rcvd is not None and not rcvd:
+                raise ConnectionError("Client disconnected")
+            print("ok")
+
+            LogLineLeftRight("Waited for Receive:", f"{(time() - waited4Msg):.3f} s")
+
+            # The framer buffers partial commands and splits pipelined ones -> Execute and respond in order
+            for rcvd in (framer.Idle() if rcvd is None else framer.Feed(rcvd)):
+                LogLineLeftRight("Received: ", rcvd)
+                cmd, payload = SplitCommand(rcvd)   # Get command and the arguments separately
+
+                try:
+                    reply = ExecuteCommand(cmd, payload, servConn)
+                except Exception as e:      # Every framed command gets exactly one response (also the pipelined ones)
+                    LogLineLeftRight("Exception occured:", e)
+                    excptnCnt += 1
+                    if excptnCnt > 3:
+                        keepConnection = False
+                    reply = nakStr
+
+                # Response
+                servConn.sendall(framer.FrameReply(reply))
+                LogLineLeftRight("Sent response", reply)
+                if not keepConnection:
+                    break
+        except Exception as e:
+            LogLineLeftRight("Exception occured:", e)
+            excptnCnt += 1
+            if excptnCnt > 3:  # 3 attemps ok!
+                keepConnection = False
+            continue
+    # conn.close()
 LogLineLeftRight("Closed connection", "ok")
+Capture_RingStop()
+ProcessPoolStop()
+Server_ArchiveLive("0")
+storage.Close()
+cmdTable.LogStats()
 
 
 if logger != None: